@@ -1,13 +1,16 @@
 import os
 import json
+import time
+import threading
 import requests
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Iterator, Optional, Union
 import logging
 from dataclasses import dataclass
 from dotenv import load_dotenv
 
 # Import the generation parameters configuration
 from app.utils.generation_config import get_config_manager, get_generation_params
+from app.api.resilience import RetryPolicy, CircuitBreaker, RequestMetrics, RETRYABLE_STATUS_CODES, parse_retry_after
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -38,18 +41,67 @@ class ChatCompletion:
     created: int
     object: str = "chat.completion"
 
+@dataclass
+class ChatCompletionDelta:
+    """Class to represent the incremental content of a streamed chunk similar to OpenAI's format."""
+    content: Optional[str] = None
+    role: Optional[str] = None
+
+@dataclass
+class ChatCompletionChunkChoice:
+    """Class to represent a streamed choice similar to OpenAI's format."""
+    delta: ChatCompletionDelta
+    finish_reason: Optional[str] = None
+    index: int = 0
+
+@dataclass
+class ChatCompletionChunk:
+    """Class to represent a streamed chat completion chunk similar to OpenAI's format."""
+    id: str
+    choices: List[ChatCompletionChunkChoice]
+    model: str
+    created: int
+    object: str = "chat.completion.chunk"
+
+# Finish reasons of the text-generation-inference server mapped to OpenAI's
+FINISH_REASONS = {
+    "eos_token": "stop",
+    "stop_sequence": "stop",
+    "length": "length",
+}
+
+class HuggingFaceAPIError(Exception):
+    """Raised when a HuggingFace Inference API call fails."""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None, model: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.model = model
+
 class HuggingFaceClient:
     """Client for accessing HuggingFace models via the Inference API.
     
     This class is designed to mimic the OpenAI client interface for easy integration.
     """
     
-    def __init__(self, api_key: Optional[str] = None, base_url: str = "https://api-inference.huggingface.co/models"):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = "https://api-inference.huggingface.co/models",
+        retry_policy: Optional[RetryPolicy] = None,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None,
+        pool_size: Optional[int] = None
+    ):
         """Initialize the HuggingFace client.
         
         Args:
             api_key: HuggingFace API token
             base_url: Base URL for the HuggingFace Inference API
+            retry_policy: Retry and backoff settings. Defaults to HF_MAX_RETRIES, HF_BACKOFF_BASE and HF_BACKOFF_MAX
+            failure_threshold: Consecutive failures that open a model's circuit. Defaults to HF_CIRCUIT_FAILURE_THRESHOLD or 5
+            reset_timeout: Seconds a model's circuit stays open. Defaults to HF_CIRCUIT_RESET_SECONDS or 30
+            pool_size: Keep-alive connections kept per host. Defaults to HF_POOL_SIZE or 10
         """
         self.api_key = api_key or os.getenv("HUGGINGFACE_API_TOKEN") or os.getenv("HUGGINGFACE_API_KEY")
         if not self.api_key:
@@ -60,6 +112,134 @@ class HuggingFaceClient:
         
         # Get the configuration manager
         self.config_manager = get_config_manager()
+        
+        # Retry, circuit breaking and metrics shared by all calls of this client
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+        self.failure_threshold = failure_threshold or int(os.getenv("HF_CIRCUIT_FAILURE_THRESHOLD", "5"))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(os.getenv("HF_CIRCUIT_RESET_SECONDS", "30"))
+        self.metrics = RequestMetrics()
+        self._circuit_breakers: Dict[str, CircuitBreaker] = {}
+        self._circuit_breakers_lock = threading.Lock()
+        
+        # Pooled session, so consecutive questions reuse the TCP/TLS connection
+        pool_size = pool_size or int(os.getenv("HF_POOL_SIZE", "10"))
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+    
+    def circuit_breaker(self, model: str) -> CircuitBreaker:
+        """Get the circuit breaker of a model, creating it on first use."""
+        with self._circuit_breakers_lock:
+            breaker = self._circuit_breakers.get(model)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._circuit_breakers[model] = breaker
+            return breaker
+    
+    def post(self, model: str, payload: Dict[str, Any], timeout: int = 120, stream: bool = False) -> requests.Response:
+        """Send a request to a model with retries and circuit breaking.
+        
+        429, 503 ("model is loading") and gateway errors are retried with jittered
+        exponential backoff, waiting at least as long as the server asks through
+        Retry-After or the model loading estimate. Connection errors and timeouts
+        are retried the same way. Other errors are raised immediately; a request
+        that fails without a response counts against the circuit either way, so
+        a trial call of a half-open circuit always reports its outcome.
+        
+        Args:
+            model: HuggingFace model ID
+            payload: JSON payload
+            timeout: Request timeout in seconds
+            stream: Whether to stream the response body
+            
+        Returns:
+            The successful response
+            
+        Raises:
+            HuggingFaceAPIError: If the request failed or the model's circuit is open
+        """
+        breaker = self.circuit_breaker(model)
+        if not breaker.allow_request():
+            self.metrics.increment(model, "rejected")
+            raise HuggingFaceAPIError(
+                f"HuggingFace API for {model} is unavailable after repeated failures, "
+                f"retrying in {breaker.retry_in():.0f}s",
+                model=model
+            )
+        
+        self.metrics.increment(model, "requests")
+        headers = {"Accept": "text/event-stream"} if stream else None
+        for attempt in range(self.retry_policy.max_retries + 1):
+            self.metrics.increment(model, "attempts")
+            start_time = time.monotonic()
+            server_delay = None
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/{model}",
+                    headers=headers,
+                    json=payload,
+                    timeout=timeout,
+                    stream=stream
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = HuggingFaceAPIError(f"HuggingFace API error: {str(e)}", model=model)
+            except Exception as e:
+                # Invalid URLs, too many redirects and the like are not worth retrying
+                self.metrics.increment(model, "failures")
+                breaker.record_failure()
+                logger.error(f"Error calling HuggingFace API: {str(e)}")
+                if isinstance(e, requests.exceptions.RequestException):
+                    raise HuggingFaceAPIError(f"HuggingFace API error: {str(e)}", model=model) from e
+                raise
+            else:
+                if response.status_code < 400:
+                    # For streams this is the time to the first byte
+                    self.metrics.record_latency(model, time.monotonic() - start_time)
+                    breaker.record_success()
+                    return response
+                
+                error_body = self._error_body(response)
+                error = HuggingFaceAPIError(
+                    f"HuggingFace API error {response.status_code}: {error_body.get('error', response.reason)}",
+                    status_code=response.status_code,
+                    model=model
+                )
+                server_delay = parse_retry_after(response.headers.get("Retry-After"))
+                if server_delay is None and isinstance(error_body.get("estimated_time"), (int, float)):
+                    server_delay = float(error_body["estimated_time"])
+                response.close()
+                
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # The endpoint answered, so a client error does not count against the circuit
+                    breaker.record_success()
+                    self.metrics.increment(model, "failures")
+                    raise error
+            
+            if attempt == self.retry_policy.max_retries:
+                break
+            delay = self.retry_policy.delay(attempt, server_delay)
+            self.metrics.increment(model, "retries")
+            logger.warning(f"{str(error)}. Retrying in {delay:.1f}s (attempt {attempt + 1} of {self.retry_policy.max_retries})")
+            time.sleep(delay)
+        
+        self.metrics.increment(model, "failures")
+        breaker.record_failure()
+        logger.error(f"Error calling HuggingFace API: {str(error)}")
+        raise error
+    
+    @staticmethod
+    def _error_body(response: requests.Response) -> Dict[str, Any]:
+        """Parse the JSON error body of a response, e.g. {"error": ..., "estimated_time": ...}."""
+        try:
+            body = response.json()
+        except ValueError:
+            return {"error": response.text[:200]} if response.text else {}
+        return body if isinstance(body, dict) else {}
     
     def _load_config(self) -> Dict:
         """Load model configuration from the config file."""
@@ -91,9 +271,10 @@ class HuggingFaceClient:
             frequency_penalty: float = None,
             presence_penalty: float = None,
             stop: Optional[Union[str, List[str]]] = None,
+            stream: bool = False,
             timeout: int = 120,
             **kwargs
-        ) -> ChatCompletion:
+        ) -> Union[ChatCompletion, Iterator[ChatCompletionChunk]]:
             """Create a chat completion using HuggingFace models.
             
             Args:
@@ -105,11 +286,16 @@ class HuggingFaceClient:
                 frequency_penalty: Not directly used by HuggingFace but included for compatibility
                 presence_penalty: Not directly used by HuggingFace but included for compatibility
                 stop: Optional string or list of strings where the model should stop generating
+                stream: Whether to stream the response token by token
                 timeout: Request timeout in seconds
                 **kwargs: Additional parameters to pass to the model
                 
             Returns:
-                ChatCompletion object with response
+                ChatCompletion object with response, or an iterator of ChatCompletionChunk
+                objects if stream is True
+                
+            Raises:
+                HuggingFaceAPIError: If the API call failed after retries
             """
             # Get the current LLM model if not specified
             if model is None:
@@ -123,12 +309,6 @@ class HuggingFaceClient:
             max_tokens = max_tokens if max_tokens is not None else params.get("max_tokens", 4000)
             top_p = top_p if top_p is not None else params.get("top_p", 0.85)
             
-            # Prepare headers with API token
-            headers = {
-                "Authorization": f"Bearer {self.client.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             # Process the messages and create prompt according to model's expected format
             prompt = self._format_prompt(messages, model)
             
@@ -162,70 +342,114 @@ class HuggingFaceClient:
             # Log debugging information (more detailed payload)
             logger.debug(f"Sending request to {model} with payload: {payload}")
             
-            try:
-                # Make the API request
-                response = requests.post(
-                    f"{self.client.base_url}/{model}",
-                    headers=headers,
-                    json=payload,
-                    timeout=timeout
-                )
-                
-                # Check for errors
-                response.raise_for_status()
-                
-                # Parse the response
-                result = response.json()
-                logger.debug(f"Received response: {result}")
-                
-                # Extract the generated text
-                if isinstance(result, list) and len(result) > 0:
-                    if "generated_text" in result[0]:
-                        generated_text = result[0]["generated_text"]
-                    else:
-                        # Some models might return a different format
-                        generated_text = result[0]
+            
+            if stream:
+                payload["stream"] = True
+                return self._create_stream(model, payload, timeout)
+            
+            # Make the API request
+            response = self.client.post(model, payload, timeout=timeout)
+            
+            # Parse the response
+            result = response.json()
+            logger.debug(f"Received response: {result}")
+            
+            # Extract the generated text
+            if isinstance(result, list) and len(result) > 0:
+                if "generated_text" in result[0]:
+                    generated_text = result[0]["generated_text"]
                 else:
-                    # Handle unexpected response format
-                    logger.warning(f"Unexpected response format: {result}")
-                    generated_text = str(result)
-                
-                # Log successful response
-                logger.info(f"Successfully received response from model: {model}")
-                
-                # Create a ChatCompletion object
-                return ChatCompletion(
-                    id=f"hf-{model.replace('/', '-')}-{id(result)}",
-                    choices=[
-                        ChatCompletionChoice(
-                            message=ChatCompletionMessage(
-                                content=generated_text,
-                                role="assistant"
-                            )
+                    # Some models might return a different format
+                    generated_text = result[0]
+            else:
+                # Handle unexpected response format
+                logger.warning(f"Unexpected response format: {result}")
+                generated_text = str(result)
+            
+            # Log successful response
+            logger.info(f"Successfully received response from model: {model}")
+            
+            # Create a ChatCompletion object
+            return ChatCompletion(
+                id=f"hf-{model.replace('/', '-')}-{id(result)}",
+                choices=[
+                    ChatCompletionChoice(
+                        message=ChatCompletionMessage(
+                            content=generated_text,
+                            role="assistant"
                         )
-                    ],
-                    model=model,
-                    created=int(response.headers.get("Date-Created", 0))
-                )
+                    )
+                ],
+                model=model,
+                created=int(response.headers.get("Date-Created", 0))
+            )
+        
+        def _create_stream(
+            self,
+            model: str,
+            payload: Dict[str, Any],
+            timeout: int
+        ) -> Iterator[ChatCompletionChunk]:
+            """Stream a chat completion from the server-sent events of the Inference API.
+            
+            Each event carries one generated token; the last one also carries the
+            full generated text and the finish reason. Only establishing the stream
+            is retried; an error after tokens were yielded ends the stream.
+            
+            Args:
+                model: HuggingFace model ID to use
+                payload: Request payload with "stream" set
+                timeout: Request timeout in seconds
                 
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error calling HuggingFace API: {str(e)}")
-                # Create an error response
-                error_msg = f"HuggingFace API error: {str(e)}"
-                return ChatCompletion(
-                    id=f"error-{id(e)}",
+            Yields:
+                ChatCompletionChunk objects with the generated tokens
+                
+            Raises:
+                HuggingFaceAPIError: If the request failed or the stream reported an error
+            """
+            completion_id = f"hf-{model.replace('/', '-')}-{id(payload)}"
+            
+            def chunk(content: Optional[str] = None, finish_reason: Optional[str] = None, role: Optional[str] = None):
+                return ChatCompletionChunk(
+                    id=completion_id,
                     choices=[
-                        ChatCompletionChoice(
-                            message=ChatCompletionMessage(
-                                content=error_msg,
-                                role="assistant"
-                            ),
-                            finish_reason="error"
+                        ChatCompletionChunkChoice(
+                            delta=ChatCompletionDelta(content=content, role=role),
+                            finish_reason=finish_reason
                         )
                     ],
                     model=model,
                     created=0
                 )
+            
+            with self.client.post(model, payload, timeout=timeout, stream=True) as response:
+                yield chunk(role="assistant")
+                
+                try:
+                    for line in response.iter_lines(decode_unicode=True):
+                        # Events are "data:{json}" lines separated by blank lines
+                        if not line or not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        event = json.loads(data)
+                        
+                        if "error" in event:
+                            raise HuggingFaceAPIError(f"HuggingFace API error: {event['error']}", model=model)
+                        
+                        token = event.get("token") or {}
+                        if token.get("text") and not token.get("special", False):
+                            yield chunk(token["text"])
+                        
+                        if event.get("generated_text") is not None:
+                            details = event.get("details") or {}
+                            finish_reason = FINISH_REASONS.get(details.get("finish_reason"), "stop")
+                            logger.info(f"Successfully streamed response from model: {model}")
+                            yield chunk(finish_reason=finish_reason)
+                            return
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    raise HuggingFaceAPIError(f"HuggingFace API error: {str(e)}", model=model) from e
         
         def _format_prompt(self, messages: List[Dict[str, str]], model: str) -> str:
             """Format messages into a prompt suitable for the specified model.
@@ -377,9 +601,27 @@ class HuggingFaceClient:
             prompt += "Assistant: "
             return prompt
 
+def iter_stream_text(stream: Iterator[ChatCompletionChunk]) -> Iterator[str]:
+    """Yield the text content of streamed chunks, e.g. for st.write_stream.
+    
+    Args:
+        stream: Iterator of ChatCompletionChunk objects
+        
+    Returns:
+        Iterator of text fragments
+    """
+    for chunk in stream:
+        for choice in chunk.choices:
+            if choice.delta.content:
+                yield choice.delta.content
+
+# Clients by API key, so connection pools, circuit breakers and metrics outlive a single question
+_clients: Dict[Optional[str], HuggingFaceClient] = {}
+_clients_lock = threading.Lock()
+
 # Create a function to get the client with default parameters
 def get_huggingface_client(api_key: Optional[str] = None) -> HuggingFaceClient:
-    """Create a HuggingFace client with the provided or environment API key.
+    """Get the shared HuggingFace client for the provided or environment API key.
     
     Args:
         api_key: Optional API key (if not provided, will use HUGGINGFACE_API_TOKEN from env)
@@ -387,4 +629,11 @@ def get_huggingface_client(api_key: Optional[str] = None) -> HuggingFaceClient:
     Returns:
         HuggingFaceClient instance
     """
-    return HuggingFaceClient(api_key=api_key) 
\ No newline at end of file
+    api_key = api_key or os.getenv("HUGGINGFACE_API_TOKEN") or os.getenv("HUGGINGFACE_API_KEY")
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = HuggingFaceClient(api_key=api_key)
+            _clients[api_key] = client
+        return client
+ 
\ No newline at end of file
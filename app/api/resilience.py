@@ -0,0 +1,159 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional
+
+# HTTP status codes worth retrying: rate limiting, model loading and gateway errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Number of latencies kept per model for the percentile metrics
+LATENCY_WINDOW = 500
+
+
+@dataclass
+class RetryPolicy:
+    """Retry settings with exponential backoff and full jitter."""
+    max_retries: int = 3
+    backoff_base: float = 1.0
+    backoff_max: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """Create a policy from HF_MAX_RETRIES, HF_BACKOFF_BASE and HF_BACKOFF_MAX."""
+        return cls(
+            max_retries=int(os.getenv("HF_MAX_RETRIES", cls.max_retries)),
+            backoff_base=float(os.getenv("HF_BACKOFF_BASE", cls.backoff_base)),
+            backoff_max=float(os.getenv("HF_BACKOFF_MAX", cls.backoff_max))
+        )
+
+    def delay(self, attempt: int, server_delay: Optional[float] = None) -> float:
+        """Get the wait before the next attempt.
+
+        A delay requested by the server (Retry-After or the model loading
+        estimate) is honoured with a little jitter added, so that clients told
+        the same time do not retry together. Otherwise the wait is drawn
+        uniformly between zero and the exponential backoff.
+
+        Args:
+            attempt: Number of the failed attempt, starting at 0
+            server_delay: Seconds the server asked us to wait, if any
+
+        Returns:
+            Seconds to wait, at most backoff_max
+        """
+        if server_delay is not None:
+            return min(self.backoff_max, server_delay + random.uniform(0, self.backoff_base))
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Stops calling a failing endpoint for a while.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected without a request. Once reset_timeout has passed one trial
+    call is let through (half-open); its success closes the circuit and its
+    failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Initialize the circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Check whether a call may be made now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let exactly one trial call through
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until the circuit lets a trial call through."""
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        """Count a failed call, opening the circuit at the threshold or after a failed trial."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class RequestMetrics:
+    """Thread-safe counters and latencies of API calls, per model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    def increment(self, model: str, name: str, amount: int = 1):
+        """Increase a counter of a model (e.g. "requests", "attempts", "retries", "failures")."""
+        with self._lock:
+            counters = self._counters.setdefault(model, {})
+            counters[name] = counters.get(name, 0) + amount
+
+    def record_latency(self, model: str, seconds: float):
+        """Record the latency of a successful call."""
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Get the counters and latency percentiles of every model.
+
+        Returns:
+            Dictionary mapping model IDs to their counters and p50/p95/max latency in seconds
+        """
+        with self._lock:
+            result = {}
+            for model in set(self._counters) | set(self._latencies):
+                stats: Dict[str, Any] = dict(self._counters.get(model, {}))
+                latencies = sorted(self._latencies.get(model, ()))
+                if latencies:
+                    stats["latency_p50"] = latencies[len(latencies) // 2]
+                    stats["latency_p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                    stats["latency_max"] = latencies[-1]
+                result[model] = stats
+            return result
@@ -0,0 +1,218 @@
+import os
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from langchain_core.documents.base import Document
+from openai import OpenAI
+from pydantic import BaseModel, Field
+
+from app.embeddings import DBManager, get_batcher_stats
+from app.retrieval.engine import RetrievalEngine
+from app.retrieval.reranker import get_reranker, warmup_reranker
+from app.retrieval.answer_cache import get_answer_cache, chunk_id
+from app.api.huggingface_client import get_huggingface_client, iter_stream_text
+from app.utils.model_config import get_model_config
+from app.utils.generation_config import get_generation_params
+from app.utils.prompt_builder import build_context, build_prompt
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Same database directory as the Streamlit app
+DEFAULT_PERSIST_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chroma_db")
+
+
+class SearchRequest(BaseModel):
+    """Body of a /search request."""
+    query: str = Field(..., min_length=1)
+    k: int = Field(20, ge=1, le=100)
+    domain: Optional[str] = None
+
+
+class AnswerRequest(SearchRequest):
+    """Body of an /answer request."""
+    stream: bool = False
+
+
+class AssistantService:
+    """Retrieval and generation state shared by all requests of the server process."""
+
+    def __init__(self, persist_directory: Optional[str] = None):
+        """Load the database and model configuration.
+
+        Args:
+            persist_directory: Chroma directory. Defaults to CHROMA_DB_DIR or the Streamlit app's database
+        """
+        model_config = get_model_config()
+        self.llm_provider = model_config["llm_provider"]
+        self.llm_model = model_config["llm_model"]
+        self.db_manager = DBManager(
+            persist_directory=persist_directory or os.getenv("CHROMA_DB_DIR") or DEFAULT_PERSIST_DIRECTORY,
+            embedding_provider=model_config["embedding_provider"],
+            embedding_model=model_config["embedding_model"]
+        )
+        self.db_manager.warmup_embeddings()
+        warmup_reranker()
+        self.vector_db = self.db_manager.initialize_db()
+        self.retrieval_engine = RetrievalEngine.from_db_manager(self.db_manager, reranker=get_reranker())
+        self._openai_client = None
+        if self.llm_provider == "openai" and os.getenv("OPENAI_API_KEY"):
+            self._openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def health(self) -> Dict[str, Any]:
+        """Report whether the database is loaded and which models are used."""
+        documents = self.vector_db._collection.count() if self.vector_db else 0
+        return {
+            "status": "ok" if self.vector_db else "no_database",
+            "documents": documents,
+            "embedding_model": self.db_manager.embedding_model,
+            "llm_provider": self.llm_provider,
+            "llm_model": self.llm_model,
+            "embedding_batches": get_batcher_stats()
+        }
+
+    def search(self, query: str, k: int = 20, domain: Optional[str] = None) -> List[Document]:
+        """Retrieve chunks for a query with the same hybrid search as the chat UI."""
+        return self.retrieval_engine.search(query, k=k, domain_filter=domain)
+
+    def prepare_answer(self, question: str, k: int = 20, domain: Optional[str] = None) -> Dict[str, Any]:
+        """Retrieve the context of a question and build its prompt.
+
+        Returns:
+            Dictionary with the prompt, source info, chunk IDs and the cached answer, if any
+        """
+        retrieved_docs = self.search(question, k=k, domain=domain)
+        context_text, source_info, context_docs = build_context(retrieved_docs, model=self.llm_model)
+        chunk_ids = [chunk_id(doc) for doc in context_docs]
+        cached_answer = None
+        if chunk_ids:
+            cached_answer = get_answer_cache().get(question, chunk_ids, *self._answer_settings())
+        return {
+            "prompt": build_prompt(question, context_text, source_info),
+            "sources": source_info,
+            "chunk_ids": chunk_ids,
+            "cached_answer": cached_answer
+        }
+
+    def generate(self, prompt: str) -> Iterator[str]:
+        """Stream the LLM answer to a prompt as text fragments."""
+        messages = [{'role': 'user', 'content': prompt}]
+        if self.llm_provider == "openai":
+            if self._openai_client is None:
+                raise RuntimeError("OpenAI API key not found")
+            params = dict(get_generation_params("openai"), stream=True)
+            stream = self._openai_client.chat.completions.create(
+                model=self.llm_model, messages=messages, **params, timeout=120
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        elif self.llm_provider == "huggingface":
+            client = get_huggingface_client()
+            yield from iter_stream_text(client.chat.create(messages=messages, model=self.llm_model, stream=True, timeout=120))
+        else:
+            raise RuntimeError(f"Unsupported LLM provider: {self.llm_provider}")
+
+    def cache_answer(self, question: str, chunk_ids: List[str], answer: str):
+        """Store a generated answer in the answer cache shared with the chat UI."""
+        if chunk_ids and answer:
+            get_answer_cache().put(question, chunk_ids, *self._answer_settings(), answer)
+
+    def _answer_settings(self) -> Tuple[str, Dict[str, Any]]:
+        """Model key and generation parameters the answer cache is keyed on."""
+        return f"{self.llm_provider}:{self.llm_model}", get_generation_params(self.llm_provider)
+
+
+def document_to_dict(document: Document) -> Dict[str, Any]:
+    """Convert a retrieved chunk to its JSON representation."""
+    return {"id": chunk_id(document), "content": document.page_content, "metadata": document.metadata}
+
+
+def sse_event(data: Dict[str, Any]) -> str:
+    """Format a server-sent event."""
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def create_app(service: Optional[AssistantService] = None) -> FastAPI:
+    """Create the API application.
+
+    Args:
+        service: Service to serve. Created when the application starts if not given
+
+    Returns:
+        FastAPI application
+    """
+    @asynccontextmanager
+    async def lifespan(api: FastAPI):
+        # Load the database and models once, not per request
+        if getattr(api.state, "service", None) is None:
+            api.state.service = await run_in_threadpool(AssistantService)
+        yield
+
+    api = FastAPI(title="Auto-Dev Assistant API", lifespan=lifespan)
+    api.state.service = service
+
+    @api.get("/health")
+    async def health():
+        return api.state.service.health()
+
+    @api.post("/search")
+    async def search(request: SearchRequest):
+        # Retrieval is blocking, run it on the thread pool so requests are served concurrently
+        documents = await run_in_threadpool(api.state.service.search, request.query, request.k, request.domain)
+        return {"query": request.query, "results": [document_to_dict(doc) for doc in documents]}
+
+    @api.post("/answer")
+    async def answer(request: AnswerRequest):
+        service = api.state.service
+        prepared = await run_in_threadpool(service.prepare_answer, request.query, request.k, request.domain)
+
+        if not request.stream:
+            if prepared["cached_answer"] is not None:
+                return {"answer": prepared["cached_answer"], "sources": prepared["sources"], "cached": True}
+            try:
+                text = await run_in_threadpool(lambda: "".join(service.generate(prepared["prompt"])))
+            except Exception as e:
+                logger.error(f"Error generating answer: {str(e)}")
+                raise HTTPException(status_code=502, detail=f"Error generating response: {str(e)}")
+            service.cache_answer(request.query, prepared["chunk_ids"], text)
+            return {"answer": text, "sources": prepared["sources"], "cached": False}
+
+        def events() -> Iterator[str]:
+            # Starlette iterates synchronous generators on the thread pool
+            yield sse_event({"type": "sources", "sources": prepared["sources"], "cached": prepared["cached_answer"] is not None})
+            if prepared["cached_answer"] is not None:
+                yield sse_event({"type": "delta", "content": prepared["cached_answer"]})
+            else:
+                fragments = []
+                try:
+                    for fragment in service.generate(prepared["prompt"]):
+                        fragments.append(fragment)
+                        yield sse_event({"type": "delta", "content": fragment})
+                except Exception as e:
+                    logger.error(f"Error streaming answer: {str(e)}")
+                    yield sse_event({"type": "error", "error": str(e)})
+                    return
+                service.cache_answer(request.query, prepared["chunk_ids"], "".join(fragments))
+            yield sse_event({"type": "done"})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return api
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("app.api.server:app", host=os.getenv("API_HOST", "0.0.0.0"), port=int(os.getenv("API_PORT", "8000")))
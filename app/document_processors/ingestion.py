@@ -0,0 +1,271 @@
+import os
+import time
+import pickle
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.documents.base import Document
+
+from .pdf_processor import PDFProcessor
+from .json_processor import JSONProcessor
+from .markdown_processor import MarkdownProcessor
+from .excel_processor import ExcelProcessor
+from .csv_processor import CSVProcessor
+from .fmea_processor import FMEAProcessor
+from .tara_processor import TARAProcessor
+
+# Optional processors, mirroring the package __init__
+try:
+    from .signal_processor import SignalDatabaseProcessor
+except ImportError:
+    SignalDatabaseProcessor = None
+
+try:
+    from .arxml_processor import ARXMLProcessor
+except ImportError:
+    ARXMLProcessor = None
+
+try:
+    from .odx_processor import ODXProcessor
+except ImportError:
+    ODXProcessor = None
+
+# Environment variable controlling the number of ingestion worker processes
+INGESTION_WORKERS_ENV = "INGESTION_WORKERS"
+
+
+@dataclass
+class FileProcessingResult:
+    """Outcome of processing one source file."""
+    
+    file_path: str
+    domain: str
+    documents: Optional[List[Document]]  # None if no processor handles the file type
+    error: Optional[str] = None          # Error message if processing failed
+    error_traceback: Optional[str] = None
+    duration: float = 0.0                # Processing time in seconds
+
+
+def collect_source_files(directory_path: str, domain: str) -> List[Tuple[str, str]]:
+    """Collect all indexable files in a directory and its subdirectories.
+
+    Args:
+        directory_path: Path to the directory to walk
+        domain: The semantic domain of the directory
+
+    Returns:
+        List of (file_path, domain) tuples in a stable, sorted order
+    """
+    source_files = []
+
+    for root, dirs, files in os.walk(directory_path):
+        # Sort in place so the walk order does not depend on the filesystem
+        dirs.sort()
+        for file in sorted(files):
+            # Skip backup files
+            if file.endswith('.bak'):
+                continue
+            source_files.append((os.path.join(root, file), domain))
+
+    return source_files
+
+
+def get_processor_for_file(file_path, domain):
+    """Determine the appropriate processor for a given file.
+    
+    This function examines the file path and optionally file content
+    to determine which document processor to use.
+    
+    Args:
+        file_path: Path to the file
+        domain: The semantic domain of the file
+        
+    Returns:
+        An instance of the appropriate processor
+    """
+    file_name = os.path.basename(file_path).lower()
+    file_ext = os.path.splitext(file_name)[1].lower()
+    
+    # First, handle by extension
+    if file_ext == '.pdf':
+        return PDFProcessor(domain=domain)
+    elif file_ext in ['.xlsx', '.xls']:
+        return ExcelProcessor(domain=domain)
+    elif file_ext == '.csv':
+        return CSVProcessor(domain=domain)
+    elif file_ext in ['.md', '.markdown']:
+        return MarkdownProcessor(domain=domain)
+    elif file_ext == '.arxml' and ARXMLProcessor is not None:
+        return ARXMLProcessor(domain=domain)
+    elif file_ext in ['.odx', '.odx-c'] and ODXProcessor is not None:
+        return ODXProcessor(domain=domain)
+    elif file_ext == '.json':
+        # Check for signal database files
+        is_signal_db = ('signal' in file_name and 'database' in file_name)
+        
+        # For JSON files, check content patterns to determine type
+        # Use standardized naming pattern for FMEA files (starts with 'fmea-')
+        is_fmea = file_name.startswith('fmea-')
+        
+        # Check for TARA files (starts with 'tara-')
+        is_tara = file_name.startswith('tara-')
+        
+        # If not clear from filename, peek at content
+        if not (is_fmea or is_signal_db or is_tara):
+            try:
+                with open(file_path, 'r') as f:
+                    content_peek = f.read(1000)  # Read just the beginning to check
+                    
+                    # Check for signal database pattern
+                    if '"database_info"' in content_peek and '"signals"' in content_peek:
+                        is_signal_db = True
+                        print(f"DEBUG: Detected signal database by content inspection")
+                    elif any(marker in content_peek for marker in ['"fmeaType"', '"failureModes"', '"systemInformation"', '"severity"', '"occurrence"']):
+                        is_fmea = True
+                        print(f"DEBUG: Detected FMEA document by content inspection")
+                    elif any(marker in content_peek for marker in ['"taraPhase"', '"damageScenarios"', '"threatScenarios"', '"riskAssessment"']):
+                        is_tara = True
+                        print(f"DEBUG: Detected TARA document by content inspection")
+            except Exception as peek_error:
+                print(f"DEBUG: Error peeking into file content for {file_name}: {str(peek_error)}")
+        
+        # Use the appropriate processor based on content type
+        if is_signal_db:
+            print(f"DEBUG: Using SignalDatabaseProcessor for {file_name}")
+            return SignalDatabaseProcessor(domain=domain)
+        elif is_fmea:
+            print(f"DEBUG: Using FMEAProcessor for {file_name}")
+            return FMEAProcessor(domain=domain)
+        elif is_tara:
+            print(f"DEBUG: Using TARAProcessor for {file_name}")
+            return TARAProcessor(domain=domain)
+        else:
+            return JSONProcessor(domain=domain)
+            
+    # Default to None if no appropriate processor found
+    return None
+
+def process_file(file_path, domain):
+    """Process a single file and validate the documents it produces.
+    
+    Args:
+        file_path: Path to the file to process
+        domain: The semantic domain of the file
+        
+    Returns:
+        List of valid documents, or None if no processor handles this file type
+    """
+    file = os.path.basename(file_path)
+    
+    # Get the appropriate processor for this file
+    processor = get_processor_for_file(file_path, domain)
+    if not processor:
+        return None
+    
+    print(f"DEBUG: Processing file: {file}")
+    documents = processor.process_file(file_path)
+    
+    # Validate returned documents
+    valid_docs = []
+    for i, doc in enumerate(documents):
+        if doc is None:
+            print(f"WARNING: Processor for {file} returned None document at index {i}")
+            continue
+            
+        # Convert string documents to Document objects
+        if isinstance(doc, str):
+            print(f"WARNING: Processor for {file} returned string instead of Document at index {i}, converting")
+            doc = Document(page_content=doc, metadata={"source": file, "domain": domain})
+        
+        # Ensure metadata exists
+        if not hasattr(doc, 'metadata') or doc.metadata is None:
+            print(f"WARNING: Document from {file} at index {i} has no metadata, adding default metadata")
+            doc.metadata = {"source": file, "domain": domain}
+        
+        # Ensure source and domain are set in metadata
+        if "source" not in doc.metadata:
+            doc.metadata["source"] = file
+        if "domain" not in doc.metadata:
+            doc.metadata["domain"] = domain
+        # "source" is often just the file name; the path tells same-named files in different domains apart
+        doc.metadata["source_file"] = os.path.abspath(file_path)
+            
+        valid_docs.append(doc)
+    
+    print(f"DEBUG: File {file} produced {len(documents)} documents, {len(valid_docs)} valid after checking")
+    return valid_docs
+
+
+def _process_file_job(process_file: Callable[[str, str], Optional[List[Document]]], file_path: str, domain: str) -> FileProcessingResult:
+    """Run one file through process_file, capturing errors instead of raising.
+    
+    Module-level so it can be pickled and executed in worker processes.
+    """
+    start_time = time.time()
+    try:
+        documents = process_file(file_path, domain)
+        return FileProcessingResult(file_path, domain, documents, duration=time.time() - start_time)
+    except Exception as e:
+        return FileProcessingResult(
+            file_path, domain, None,
+            error=str(e),
+            error_traceback=traceback.format_exc(),
+            duration=time.time() - start_time
+        )
+
+
+class IngestionEngine:
+    """Fans source files out to a pool of worker processes.
+    
+    Document processing (XML parsing, FMEA/TARA chunk building, PDF extraction)
+    is CPU-bound, so files are processed in separate processes. Results come
+    back in the order of the input files, and a failing file is reported in its
+    result without aborting the run.
+    """
+    
+    def __init__(self, process_file: Callable[[str, str], Optional[List[Document]]] = process_file, max_workers: Optional[int] = None):
+        """Initialize the ingestion engine.
+        
+        Args:
+            process_file: Module-level function (path, domain) -> documents, must be picklable
+            max_workers: Number of worker processes. Defaults to the INGESTION_WORKERS
+                environment variable, or the number of CPUs
+        """
+        if max_workers is None:
+            env_workers = os.getenv(INGESTION_WORKERS_ENV)
+            max_workers = int(env_workers) if env_workers else (os.cpu_count() or 1)
+        
+        self.process_file = process_file
+        self.max_workers = max(1, max_workers)
+    
+    def process_files(self, source_files: List[Tuple[str, str]]) -> List[FileProcessingResult]:
+        """Process files in parallel.
+        
+        Args:
+            source_files: List of (file_path, domain) tuples
+            
+        Returns:
+            One FileProcessingResult per input file, in input order
+        """
+        if not source_files:
+            return []
+        
+        workers = min(self.max_workers, len(source_files))
+        if workers > 1:
+            print(f"DEBUG: Processing {len(source_files)} files with {workers} worker processes")
+            file_paths = [file_path for file_path, _ in source_files]
+            domains = [domain for _, domain in source_files]
+            try:
+                # Spawn instead of fork: the Streamlit server is multi-threaded
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    return list(executor.map(_process_file_job, repeat(self.process_file), file_paths, domains))
+            except (BrokenProcessPool, pickle.PicklingError, OSError, AttributeError, TypeError) as e:
+                # Unpicklable process_file or a pool that could not start: fall back to serial
+                print(f"WARNING: Parallel ingestion failed ({str(e)}). Falling back to serial processing.")
+        
+        return [_process_file_job(self.process_file, file_path, domain) for file_path, domain in source_files]
@@ -1,7 +1,21 @@
 from .db_manager import DBManager
 from .huggingface_embeddings import HuggingFaceEmbeddings
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .query_cache import QueryEmbeddingCache, get_query_cache, embed_query_cached
+from .model_registry import ModelRegistry, get_model_registry
+from .embedding_batcher import EmbeddingBatcher, get_embedding_batcher, get_batcher_stats
 
 __all__ = [
     'DBManager',
-    'HuggingFaceEmbeddings'
+    'HuggingFaceEmbeddings',
+    'EmbeddingCache',
+    'get_embedding_cache',
+    'QueryEmbeddingCache',
+    'get_query_cache',
+    'embed_query_cached',
+    'ModelRegistry',
+    'get_model_registry',
+    'EmbeddingBatcher',
+    'get_embedding_batcher',
+    'get_batcher_stats'
 ]
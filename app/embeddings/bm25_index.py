@@ -0,0 +1,206 @@
+import os
+import math
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents.base import Document
+
+from .identifier_index import TOKEN_PATTERN
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms, keeping identifiers such as "b1a2f-11" or "0x22" whole."""
+    return [token.lower() for token in TOKEN_PATTERN.findall(text) if len(token) > 1]
+
+
+class BM25Index:
+    """Sparse BM25 index over chunk text.
+
+    Chunks are stored in integer slots, and each term maps to the slots it occurs
+    in with its term frequency, so memory grows with the number of distinct
+    (term, chunk) pairs. The index is updated incrementally as chunks are added
+    and removed.
+
+    Searches run on retrieval worker threads while the database is synced, so
+    loading, updates and searches all hold the same lock.
+    """
+
+    def __init__(self, index_path: str):
+        """Initialize the BM25 index.
+
+        Args:
+            index_path: JSON file the index is persisted to
+        """
+        self.index_path = index_path
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._chunk_ids: List[Optional[str]] = []   # slot -> chunk ID, None for removed chunks
+        self._slots: Dict[str, int] = {}            # chunk ID -> slot
+        self._lengths: List[int] = []               # slot -> number of terms
+        self._postings: Dict[str, Dict[int, int]] = {}  # term -> {slot: term frequency}
+        self._total_length = 0
+
+    def _ensure_loaded(self):
+        """Load the index from disk on first use.
+
+        A query arriving during the load waits for it; _loaded is only set once
+        the data is in place.
+        """
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.index_path):
+                try:
+                    with open(self.index_path, 'r') as f:
+                        data = json.load(f)
+                    chunk_ids = data["chunk_ids"]
+                    lengths = data["lengths"]
+                    slots = {chunk_id: slot for slot, chunk_id in enumerate(chunk_ids) if chunk_id is not None}
+                    # Postings are stored as flat [slot, tf, slot, tf, ...] lists
+                    self._postings = {
+                        term: dict(zip(flat[0::2], flat[1::2])) for term, flat in data["postings"].items()
+                    }
+                    self._chunk_ids = chunk_ids
+                    self._lengths = lengths
+                    self._slots = slots
+                    self._total_length = sum(lengths[slot] for slot in slots.values())
+                except Exception as e:
+                    logger.warning(f"Error loading BM25 index {self.index_path}: {str(e)}. Starting empty.")
+                    self.clear()
+            self._loaded = True
+
+    def save(self):
+        """Persist the index, compacting away the slots of removed chunks."""
+        if not self._loaded:
+            return
+        with self._lock:
+            self._compact()
+            data = {
+                "chunk_ids": list(self._chunk_ids),
+                "lengths": list(self._lengths),
+                "postings": {
+                    term: [value for slot, tf in slots.items() for value in (slot, tf)]
+                    for term, slots in self._postings.items()
+                }
+            }
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, self.index_path)
+
+    def _compact(self):
+        """Renumber slots so removed chunks no longer take space."""
+        if len(self._slots) == len(self._chunk_ids):
+            return
+        new_slots = {}
+        chunk_ids, lengths = [], []
+        for slot, chunk_id in enumerate(self._chunk_ids):
+            if chunk_id is not None:
+                new_slots[slot] = len(chunk_ids)
+                chunk_ids.append(chunk_id)
+                lengths.append(self._lengths[slot])
+        self._postings = {
+            term: {new_slots[slot]: tf for slot, tf in slots.items()}
+            for term, slots in self._postings.items()
+        }
+        self._chunk_ids = chunk_ids
+        self._lengths = lengths
+        self._slots = {chunk_id: slot for slot, chunk_id in enumerate(chunk_ids)}
+
+    def clear(self):
+        """Remove all chunks."""
+        with self._lock:
+            self._loaded = True
+            self._chunk_ids = []
+            self._slots = {}
+            self._lengths = []
+            self._postings = {}
+            self._total_length = 0
+
+    def add_documents(self, ids: List[str], documents: List[Document]):
+        """Index chunks under their vector IDs. Re-adding an ID replaces its entry.
+
+        Args:
+            ids: Vector IDs, one per document
+            documents: Chunks to index
+        """
+        self._ensure_loaded()
+        # Tokenize outside the lock, so searches only wait for the index update
+        terms_per_chunk = [tokenize(document.page_content) for document in documents]
+        with self._lock:
+            self.remove_ids([chunk_id for chunk_id in ids if chunk_id in self._slots])
+            for chunk_id, terms in zip(ids, terms_per_chunk):
+                slot = len(self._chunk_ids)
+                self._chunk_ids.append(chunk_id)
+                self._lengths.append(len(terms))
+                self._slots[chunk_id] = slot
+                self._total_length += len(terms)
+                for term in terms:
+                    slots = self._postings.setdefault(term, {})
+                    slots[slot] = slots.get(slot, 0) + 1
+
+    def remove_ids(self, ids: Iterable[str]):
+        """Remove chunks from the index."""
+        self._ensure_loaded()
+        with self._lock:
+            removed_slots = set()
+            for chunk_id in ids:
+                slot = self._slots.pop(chunk_id, None)
+                if slot is not None:
+                    removed_slots.add(slot)
+                    self._chunk_ids[slot] = None
+                    self._total_length -= self._lengths[slot]
+            if not removed_slots:
+                return
+            for term in list(self._postings.keys()):
+                slots = self._postings[term]
+                for slot in removed_slots.intersection(slots):
+                    del slots[slot]
+                if not slots:
+                    del self._postings[term]
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        """Score chunks against a query with BM25.
+
+        Args:
+            query: Query text
+            k: Number of results to return
+
+        Returns:
+            (chunk ID, score) tuples, best first
+        """
+        self._ensure_loaded()
+        terms = set(tokenize(query))
+        with self._lock:
+            chunk_count = len(self._slots)
+            if chunk_count == 0:
+                return []
+            average_length = self._total_length / chunk_count or 1.0
+
+            scores: Dict[int, float] = {}
+            for term in terms:
+                slots = self._postings.get(term)
+                if not slots:
+                    continue
+                idf = math.log(1 + (chunk_count - len(slots) + 0.5) / (len(slots) + 0.5))
+                for slot, tf in slots.items():
+                    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[slot] / average_length)
+                    scores[slot] = scores.get(slot, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + length_norm)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+            return [(self._chunk_ids[slot], score) for slot, score in ranked]
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._slots)
@@ -1,9 +1,6 @@
 import os
 import shutil
-import streamlit as st
-import sys
-import subprocess
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from langchain_core.documents.base import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
@@ -13,20 +10,121 @@ from dotenv import load_dotenv
 import traceback
 import json
 import datetime
-from .document_tracking import DocumentTraceability
+from .document_tracking import DocumentTraceability, SourceFingerprint, SourceChangeSet, SOURCE_FILE_KEY, assign_chunk_ids
 import hashlib
 import re # Added for filename sanitization
 import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Add new imports for HuggingFace support
 from .huggingface_embeddings import HuggingFaceEmbeddings
+from .embedding_cache import get_embedding_cache
+from .identifier_index import IdentifierIndex
+from .bm25_index import BM25Index
+from .tracking_store import TrackingStore
+from .dimension_reduction import VectorProjection, ProjectedEmbeddings, get_projection_settings, DEFAULT_FIT_SAMPLE
 from ..utils.model_config import get_model_config
+from ..utils.event_sink import EventSink, LoggingSink
 
 # --- Define Log Directory --- 
 # Define log directory globally for reuse
 log_directory = os.path.join(os.path.dirname(__file__), "log")
 # --- END Log Directory --- 
 
+# Embedding batch limits: a batch is closed once it reaches either limit
+EMBEDDING_BATCH_CHARS = int(os.getenv("EMBEDDING_BATCH_CHARS", "100000"))  # ~25k tokens
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "128"))
+
+# Incremented whenever stored chunks change, so caches built over them can tell they are stale
+_index_generation = 0
+_index_generation_lock = threading.Lock()
+
+# Rewritten in the database directory whenever its chunks change, so other processes
+# serving the same database (startup.py, the HTTP API, the Streamlit app) notice as well
+INDEX_GENERATION_FILE = "index_generation"
+
+# Database directories opened by this process, whose generation files are watched
+_watched_directories: Dict[str, None] = {}
+
+
+def _generation_stamp(persist_directory: str) -> Optional[Tuple[int, int]]:
+    """Identify the current generation file of a database, None if there is none."""
+    try:
+        stat = os.stat(os.path.join(persist_directory, INDEX_GENERATION_FILE))
+        # The file is replaced on every change, so its inode changes even within one mtime tick
+        return stat.st_ino, stat.st_mtime_ns
+    except OSError:
+        return None
+
+
+def watch_index_generation(persist_directory: str):
+    """Include changes made to a database by other processes in get_index_generation()."""
+    _watched_directories[os.path.abspath(persist_directory)] = None
+
+
+def get_index_generation() -> Tuple:
+    """Get a value that changes whenever the stored chunks of a database used by this process change.
+
+    Changes made in this process and, through the generation file, in other
+    processes sharing a database directory are both reflected.
+    """
+    return (_index_generation,) + tuple(_generation_stamp(directory) for directory in list(_watched_directories))
+
+
+def bump_index_generation(persist_directory: Optional[str] = None):
+    """Record that chunks were added to or removed from the database.
+
+    Args:
+        persist_directory: Database directory whose generation file is rewritten (optional)
+    """
+    global _index_generation
+    with _index_generation_lock:
+        _index_generation += 1
+    if persist_directory is None:
+        return
+    try:
+        os.makedirs(persist_directory, exist_ok=True)
+        path = os.path.join(persist_directory, INDEX_GENERATION_FILE)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(f"{datetime.datetime.now().isoformat()}\n")
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"WARNING: Could not write index generation file in {persist_directory}: {str(e)}")
+
+
+def batch_documents_by_size(documents: List[Document], max_chars: int = EMBEDDING_BATCH_CHARS, max_documents: int = EMBEDDING_BATCH_SIZE) -> List[List[int]]:
+    """Split documents into consecutive batches bounded by total characters and count.
+    
+    Args:
+        documents: Documents to batch, in insertion order
+        max_chars: Maximum total page_content length per batch. A single larger
+            document forms a batch of its own
+        max_documents: Maximum number of documents per batch
+        
+    Returns:
+        List of batches, each a list of indices into documents
+    """
+    batches = []
+    current_batch = []
+    current_chars = 0
+    
+    for i, doc in enumerate(documents):
+        doc_chars = len(doc.page_content)
+        if current_batch and (current_chars + doc_chars > max_chars or len(current_batch) >= max_documents):
+            batches.append(current_batch)
+            current_batch = []
+            current_chars = 0
+        current_batch.append(i)
+        current_chars += doc_chars
+    
+    if current_batch:
+        batches.append(current_batch)
+    
+    return batches
+
 
 class DBManager:
     """Manager for vector database operations.
@@ -34,29 +132,36 @@ class DBManager:
     Handles initialization, persistence, and querying of the vector database.
     """
     
-    def __init__(self, persist_directory: str, embedding_model: str = None, embedding_provider: str = None):
+    def __init__(self, persist_directory: str, embedding_model: str = None, embedding_provider: str = None,
+                 sink: Optional[EventSink] = None):
         """Initialize the database manager.
         
         Args:
             persist_directory: Directory to persist the database
             embedding_model: Name of the embedding model to use (optional)
             embedding_provider: Provider for embeddings ('openai' or 'huggingface') (optional)
+            sink: Receiver of user-facing messages (optional, defaults to logging them)
         """
         # Load environment variables if not already done
         load_dotenv()
         
+        # Where status and error messages go; the Streamlit app passes a StreamlitSink
+        self.sink = sink or LoggingSink()
+        
         # Get model configuration
         model_config = get_model_config()
         
         # Use provided values or fall back to configuration
         self.embedding_provider = embedding_provider or model_config.get("embedding_provider", "openai")
         self.embedding_model = embedding_model or model_config.get("embedding_model", "text-embedding-3-large")
+        # Inference backend of local models ('torch', 'onnx', 'int8' or 'torch-fp16-weights')
+        self.embedding_backend = model_config.get("embedding_backend", "torch")
         
         # Set up API keys based on provider
         if self.embedding_provider == "openai":
             self.api_key = os.getenv("OPENAI_API_KEY")
             if not self.api_key:
-                st.error("❌ OpenAI API key not found in environment variables.")
+                self.sink.error("❌ OpenAI API key not found in environment variables.")
         elif self.embedding_provider == "huggingface":
             # Get HuggingFace cache folder
             self.hf_cache_folder = os.getenv("HUGGINGFACE_HUB_CACHE")
@@ -65,14 +170,26 @@ class DBManager:
             
         self.persist_directory = persist_directory
         self.db = None
+        # Answers cached over this database become stale when any process changes it
+        watch_index_generation(persist_directory)
         
         # Add tracking directory
         self.tracking_directory = os.path.join(persist_directory, "document_tracking")
         os.makedirs(self.tracking_directory, exist_ok=True)
         
-        # Document tracking index
+        # Document tracking index (snapshot plus append-only journal, loaded on first access)
         self.tracking_index_path = os.path.join(self.tracking_directory, "tracking_index.json")
         self.tracking_index = self._load_tracking_index()
+        
+        # Projection of the stored vectors to fewer dimensions, fitted on the corpus by a full build
+        self.projection_path = os.path.join(self.tracking_directory, "projection.npz")
+        
+        # Progress of an embedding build, removed once the build completes
+        self.build_checkpoint_path = os.path.join(self.tracking_directory, "build_checkpoint.json")
+        
+        # Lexical indexes over the stored chunks: exact identifier matches and BM25 keyword search
+        self.identifier_index = IdentifierIndex(os.path.join(self.tracking_directory, "identifier_index.json"))
+        self.bm25_index = BM25Index(os.path.join(self.tracking_directory, "bm25_index.json"))
     
     def _get_embeddings_function(self):
         """Get the appropriate embeddings function based on provider."""
@@ -80,102 +197,59 @@ class DBManager:
             print(f"DEBUG: Using OpenAI embeddings with model: {self.embedding_model}")
             return OpenAIEmbeddings(model=self.embedding_model, openai_api_key=self.api_key)
         elif self.embedding_provider == "huggingface":
-            print(f"DEBUG: Using HuggingFace embeddings with model: {self.embedding_model}")
+            print(f"DEBUG: Using HuggingFace embeddings with model: {self.embedding_model} ({self.embedding_backend} backend)")
             return HuggingFaceEmbeddings(
                 model_name=self.embedding_model,
-                cache_folder=self.hf_cache_folder
+                cache_folder=self.hf_cache_folder,
+                backend=self.embedding_backend
             )
         else:
             raise ValueError(f"Unsupported embedding provider: {self.embedding_provider}")
     
-    def _load_tracking_index(self) -> Dict[str, Any]:
-        """Load document tracking index or create if not exists."""
-        if os.path.exists(self.tracking_index_path):
-            try:
-                with open(self.tracking_index_path, 'r') as f:
-                    loaded_index = json.load(f)
-                return loaded_index
-            except Exception as e:
-                print(f"WARNING: Error loading tracking index: {str(e)}. Creating new index.")
-                # If error loading, create new
-        
-        # Create new index structure
-        index = {
-            "documents": {},  # doc_id -> traceability info
-            "sources": {},    # source_path -> [doc_ids]
-            "domains": {},    # domain -> [doc_ids]
-            "file_types": {}, # file_type -> [doc_ids]
-            "total_documents": 0, # Initialize count
-            "created": datetime.datetime.now().isoformat()
-        }
+    def warmup_embeddings(self):
+        """Start loading the local embedding model in the background.
         
-        # Save the newly created index immediately
+        The model is shared by all sessions through the model registry, so only the
+        first DBManager of a process loads it. Set EMBEDDING_WARMUP=false to load
+        it on the first query instead.
+        """
+        if self.embedding_provider != "huggingface" or os.getenv("EMBEDDING_WARMUP", "true").lower() == "false":
+            return
         try:
-            with open(self.tracking_index_path, 'w') as f:
-                json.dump(index, f, indent=2)
+            self._get_embeddings_function().warmup()
         except Exception as e:
-            print(f"ERROR: Failed to save newly created tracking index: {str(e)}")
-            # If saving the new index fails, things are bad, but return the in-memory version
-        
-        return index
+            print(f"ERROR: Could not start embedding model warmup: {str(e)}")
+    
+    def _load_tracking_index(self) -> TrackingStore:
+        """Open the document tracking index. It is read from disk on first access."""
+        return TrackingStore(self.tracking_index_path)
     
     def _save_tracking_index(self):
-        """Save tracking index to disk, ensuring the document count is accurate."""
-        # Ensure the main keys exist
-        for key in ["documents", "sources", "domains", "file_types"]:
-            if key not in self.tracking_index:
-                self.tracking_index[key] = {}
-        
-        # Explicitly calculate count JUST before saving
-        current_doc_count = len(self.tracking_index.get("documents", {}))
-        self.tracking_index["total_documents"] = current_doc_count
-        print(f"DEBUG: Saving tracking index with total_documents = {current_doc_count}")
+        """Save the changes to the tracking index made since the last save."""
+        print(f"DEBUG: Saving tracking index with total_documents = {len(self.tracking_index)}")
         
         try:
-            with open(self.tracking_index_path, 'w') as f:
-                json.dump(self.tracking_index, f, indent=2)
+            self.tracking_index.save()
             print(f"DEBUG: Successfully wrote tracking index to {self.tracking_index_path}")
         except Exception as e:
             print(f"ERROR: Failed to write tracking index to {self.tracking_index_path}: {str(e)}")
             # Raise the exception to signal the failure upstream if needed
             raise e
     
-    def _track_document(self, document: Document) -> str:
-        """Track a document and return its ID."""
+    def _track_document(self, document: Document, doc_id: str) -> str:
+        """Track a document under its chunk ID and return the ID."""
         # Create traceability info with provider information
         trace_info = DocumentTraceability.from_document(
             doc=document, 
             embedding_model=self.embedding_model,
             embedding_provider=self.embedding_provider,
-            source_path=document.metadata.get("source", None)
+            source_path=document.metadata.get("source", None),
+            doc_id=doc_id
         )
         
-        # Store in tracking index
-        doc_id = trace_info.doc_id
-        self.tracking_index["documents"][doc_id] = trace_info.to_dict()
-        
-        # Update source index
-        source_path = trace_info.source_path or "unknown_source" # Handle None source
-        if source_path not in self.tracking_index["sources"]:
-            self.tracking_index["sources"][source_path] = []
-        if doc_id not in self.tracking_index["sources"][source_path]:
-            self.tracking_index["sources"][source_path].append(doc_id)
-        
-        # Update domain index
-        domain = trace_info.domain or "unknown_domain" # Handle None domain
-        if domain not in self.tracking_index["domains"]:
-            self.tracking_index["domains"][domain] = []
-        if doc_id not in self.tracking_index["domains"][domain]:
-            self.tracking_index["domains"][domain].append(doc_id)
-        
-        # Update file type index
-        file_type = trace_info.file_type or "unknown_type" # Handle None type
-        if file_type not in self.tracking_index["file_types"]:
-            self.tracking_index["file_types"][file_type] = []
-        if doc_id not in self.tracking_index["file_types"][file_type]:
-            self.tracking_index["file_types"][file_type].append(doc_id)
-        
-        return doc_id
+        # Store in tracking index, which also updates the source, domain and file type indexes
+        self.tracking_index.track(trace_info.doc_id, trace_info.to_dict())
+        return trace_info.doc_id
     
     def initialize_db(self) -> Optional[Chroma]:
         """Initialize the vector database.
@@ -186,6 +260,13 @@ class DBManager:
         Returns:
             Initialized Chroma database or None if initialization fails
         """
+        # An interrupted build is resumed by create_db_from_documents, keep its vectors
+        if os.path.exists(self.build_checkpoint_path):
+            print(f"DEBUG: Found incomplete build checkpoint at {self.build_checkpoint_path}")
+            self.sink.info("⏯️ A previous database build was interrupted. Resuming it...")
+            self.db = None
+            return None
+        
         # Try to load existing database
         try:
             if os.path.exists(self.persist_directory):
@@ -205,41 +286,13 @@ class DBManager:
                         print(f"DEBUG: Original error: {str(ve)}")
                         
                         # Suggest app restart
-                        st.error(error_msg)
-                        st.warning("The application needs to be restarted completely to fix this issue. Please close this window and restart the app, or click the 'Clear DB' button which will restart the app for you.")
-                        
-                        # Provide a button to trigger restart if main.py has restart_app function
-                        if st.button("🔄 Restart Application"):
-                            # Get the path to the current Python executable
-                            python_executable = sys.executable
-                            
-                            # Get the full path to the main.py file
-                            main_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "main.py"))
-                            
-                            # Start a new process to run the Streamlit app
-                            print(f"Restarting app using: {python_executable} -m streamlit run {main_path}")
-                            
-                            try:
-                                # Start a new process directly with the current Python executable
-                                # which already has the conda environment activated
-                                subprocess.Popen([python_executable, "-m", "streamlit", "run", main_path])
-                                
-                                # Add a sleep to ensure the new process has time to start
-                                print("Waiting for new process to start...")
-                                time.sleep(2)
-                                
-                                # Exit the current process with success code
-                                print("Exiting current process...")
-                                os._exit(0)
-                            except Exception as e:
-                                print(f"Error in restart process: {str(e)}")
-                                # If something goes wrong, we should still exit
-                                os._exit(1)
+                        self.sink.error(error_msg)
+                        self.sink.restart_required("The application needs to be restarted completely to fix this issue. Please close this window and restart the app, or click the 'Clear DB' button which will restart the app for you.")
                     
                     # Re-raise for broader exception handling
                     raise ve
                 
-                embeddings = self._get_embeddings_function()
+                embeddings = self._with_stored_projection(self._get_embeddings_function())
                 self.db = Chroma(
                     persist_directory=self.persist_directory,
                     embedding_function=embeddings,
@@ -258,21 +311,21 @@ class DBManager:
                     print(f"DEBUG: Actual document count from DB collection: {actual_count}")
                     
                     if actual_count == expected_count and actual_count > 0:
-                        st.success(f"✅ Successfully loaded existing vector database with {actual_count} documents.")
+                        self.sink.success(f"✅ Successfully loaded existing vector database with {actual_count} documents.")
                     elif actual_count > 0 and actual_count != expected_count:
-                        st.warning(f"⚠️ Loaded existing database, but document count ({actual_count}) differs from expected ({expected_count}). Consider rebuilding.")
+                        self.sink.warning(f"⚠️ Loaded existing database, but document count ({actual_count}) differs from expected ({expected_count}). Consider rebuilding.")
                     elif actual_count == 0 and expected_count == 0:
-                        st.info("Empty database, proceeding with initialization...")
+                        self.sink.info("Empty database, proceeding with initialization...")
                     elif actual_count == 0 and expected_count > 0:
-                        st.error(f"❌ Loaded database is empty, but {expected_count} documents were expected. Database may be corrupt. Please rebuild.")
+                        self.sink.error(f"❌ Loaded database is empty, but {expected_count} documents were expected. Database may be corrupt. Please rebuild.")
                         # Treat as failure, force rebuild
                         raise ValueError(f"DB empty but expected {expected_count} docs")
                     else: # actual_count > 0 and expected_count == 0 (shouldn't happen if tracking is correct)
-                        st.warning(f"⚠️ Loaded database has {actual_count} documents, but tracking index expected 0. Tracking might be out of sync.")
+                        self.sink.warning(f"⚠️ Loaded database has {actual_count} documents, but tracking index expected 0. Tracking might be out of sync.")
                 except Exception as count_err:
                     # If counting fails after load, it's suspicious
                     print(f"ERROR: Error getting collection count: {str(count_err)}")
-                    st.error(f"❌ Failed to verify document count in loaded database: {str(count_err)}. Database might be corrupt. Please rebuild.")
+                    self.sink.error(f"❌ Failed to verify document count in loaded database: {str(count_err)}. Database might be corrupt. Please rebuild.")
                     raise count_err # Treat as failure to force rebuild
                 # End FIX
                 
@@ -282,7 +335,7 @@ class DBManager:
             traceback_info = traceback.format_exc()
             print(f"DEBUG: Failed to load, query, or verify existing database. Error: {str(e)}")
             print(f"DEBUG: Traceback: {traceback_info}")
-            st.error(f"❌ Could not load existing database. Attempting to rebuild index... Error: {str(e)}")
+            self.sink.error(f"❌ Could not load existing database. Attempting to rebuild index... Error: {str(e)}")
             
             # Only delete if there was an error accessing the existing DB
             if os.path.exists(self.persist_directory):
@@ -292,25 +345,27 @@ class DBManager:
                     print(f"DEBUG: Successfully removed directory: {self.persist_directory}")
                 except Exception as rm_err:
                     print(f"ERROR: Error removing directory {self.persist_directory}: {str(rm_err)}")
-                    st.error(f"❌ Failed to remove corrupted database directory: {str(rm_err)}")
+                    self.sink.error(f"❌ Failed to remove corrupted database directory: {str(rm_err)}")
         
         # If we get here, loading failed or directory didn't exist.
         print("DEBUG: Setting self.db to None and returning None from initialize_db.")
         self.db = None
         return None
     
-    def create_db_from_documents(self, documents: List[Document]) -> Tuple[Optional[Chroma], int]:
+    def create_db_from_documents(self, documents: List[Document], source_fingerprints: Optional[List[SourceFingerprint]] = None) -> Tuple[Optional[Chroma], int]:
         """Create a new vector database from documents.
         
         Args:
             documents: List of documents to add to the database
+            source_fingerprints: Fingerprints of the files the documents were produced from,
+                recorded so later syncs only re-process changed files (optional)
             
         Returns:
             A tuple containing the created Chroma database (or None if creation fails)
             and the number of unique documents added.
         """
         if not documents:
-            st.error("❌ No documents provided to create database.")
+            self.sink.error("❌ No documents provided to create database.")
             return None, 0
         
         try:
@@ -323,54 +378,29 @@ class DBManager:
             if len(valid_documents) < len(documents):
                 print(f"WARNING: Filtered out {len(documents) - len(valid_documents)} invalid documents")
                 if not valid_documents:
-                    st.error("❌ No valid Document objects found in the provided documents.")
+                    self.sink.error("❌ No valid Document objects found in the provided documents.")
                     return None, 0
             
-            # Deduplicate documents based on content hash
-            unique_documents_dict = {}
-            processed_count = 0
-            skipped_due_to_error = 0
-
-            for i, doc in enumerate(valid_documents):
-                try:
-                    # Ensure page_content exists and is hashable
-                    if not hasattr(doc, 'page_content') or not isinstance(doc.page_content, str):
-                        print(f"WARNING: Document at index {i} lacks valid string page_content. Skipping deduplication, adding by object ID.")
-                        unique_documents_dict[id(doc)] = doc
-                        skipped_due_to_error += 1
-                        continue # Move to next document
-
-                    # Hash the content
-                    doc_hash = hashlib.md5(doc.page_content.encode()).hexdigest()
-
-                    # Add to dict if hash is new
-                    if doc_hash not in unique_documents_dict:
-                        unique_documents_dict[doc_hash] = doc
-                    
-                    processed_count += 1
-
-                except Exception as e:
-                    # Catch any unexpected error during processing this specific document
-                    print(f"ERROR: Unexpected error deduplicating document at index {i}: {str(e)}. Skipping deduplication, adding by object ID.")
-                    # Use object ID as fallback key
-                    unique_documents_dict[id(doc)] = doc 
-                    skipped_due_to_error += 1
-                      
+            # Assign deterministic chunk IDs, dropping chunks repeated within a source
             original_count = len(valid_documents)
-            processed_documents = list(unique_documents_dict.values())
+            processed_documents, doc_ids = assign_chunk_ids(valid_documents)
             final_unique_count = len(processed_documents)
-            print(f"INFO: Deduplication finished. Input: {original_count}, Final unique count: {final_unique_count}, Skipped due to error: {skipped_due_to_error}")
+            print(f"INFO: Deduplication finished. Input: {original_count}, Final unique count: {final_unique_count}")
 
             # Track documents before creating embeddings (use the deduplicated list)
             print(f"DEBUG: Tracking {final_unique_count} unique documents for traceability")
-            self.tracking_index["documents"] = {} # Clear just the documents part for this run
+            # A full build replaces everything, so start from empty tracking maps
+            self.tracking_index.reset()
+            for fingerprint in source_fingerprints or []:
+                self.tracking_index["source_fingerprints"][fingerprint.path] = fingerprint.to_dict()
             
-            for doc in processed_documents:
-                self._track_document(doc)
+            # The chunk ID doubles as the vector ID, which makes re-upserting a batch idempotent
+            for doc, doc_id in zip(processed_documents, doc_ids):
+                self._track_document(doc, doc_id)
             
             # --- START NEW LOGGING STRATEGY ---
             print(f"DEBUG: Starting new logging strategy for {final_unique_count} processed documents (Creation).")
-            self._log_processed_chunks(processed_documents, "creation")
+            self._log_processed_chunks(processed_documents, doc_ids, "creation")
             print("DEBUG: Finished new logging strategy (Creation).")
             # --- END NEW LOGGING STRATEGY ---
 
@@ -389,36 +419,8 @@ class DBManager:
                     print(f"DEBUG: Original error: {str(ve)}")
                     
                     # Suggest app restart
-                    st.error(error_msg)
-                    st.warning("The application needs to be restarted completely to fix this issue. Please close this window and restart the app, or click the 'Clear DB' button which will restart the app for you.")
-                    
-                    # Provide a button to trigger restart if main.py has restart_app function
-                    if st.button("🔄 Restart Application"):
-                        # Get the path to the current Python executable
-                        python_executable = sys.executable
-                        
-                        # Get the full path to the main.py file
-                        main_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "main.py"))
-                        
-                        # Start a new process to run the Streamlit app
-                        print(f"Restarting app using: {python_executable} -m streamlit run {main_path}")
-                        
-                        try:
-                            # Start a new process directly with the current Python executable
-                            # which already has the conda environment activated
-                            subprocess.Popen([python_executable, "-m", "streamlit", "run", main_path])
-                            
-                            # Add a sleep to ensure the new process has time to start
-                            print("Waiting for new process to start...")
-                            time.sleep(2)
-                            
-                            # Exit the current process with success code
-                            print("Exiting current process...")
-                            os._exit(0)
-                        except Exception as e:
-                            print(f"Error in restart process: {str(e)}")
-                            # If something goes wrong, we should still exit
-                            os._exit(1)
+                    self.sink.error(error_msg)
+                    self.sink.restart_required("The application needs to be restarted completely to fix this issue. Please close this window and restart the app, or click the 'Clear DB' button which will restart the app for you.")
                 
                 # Re-raise for broader exception handling
                 raise ve
@@ -446,13 +448,38 @@ class DBManager:
                                     pass  # Skip if can't convert
                     doc.metadata = filtered_metadata
                 
+                # Resume an interrupted build of the same documents, otherwise start from an empty collection
+                signature = self._build_signature(doc_ids)
+                checkpoint = self._load_build_checkpoint()
+                resuming = bool(checkpoint and checkpoint.get("signature") == signature)
+                
+                # A resumed build keeps the projection its stored batches were reduced with
+                if resuming:
+                    embeddings = self._with_stored_projection(embeddings)
+                else:
+                    embeddings = self._fit_projection(embeddings, processed_documents)
+                
                 # Actually create the database (use the deduplicated list)
-                self.db = Chroma.from_documents(
-                    documents=processed_documents, # Use deduplicated list
-                    embedding=embeddings,
+                self.db = Chroma(
                     persist_directory=self.persist_directory,
+                    embedding_function=embeddings,
                     client=client
                 )
+                
+                start_batch = 0
+                if resuming:
+                    start_batch = checkpoint.get("completed_batches", 0)
+                    print(f"DEBUG: Resuming build from batch {start_batch} of {checkpoint.get('total_batches')}")
+                elif self.db._collection.count() > 0:
+                    print("DEBUG: Clearing vectors of a previous build before creating the database")
+                    self.db.delete_collection()
+                    self.db = Chroma(
+                        persist_directory=self.persist_directory,
+                        embedding_function=embeddings,
+                        client=client
+                    )
+                
+                self._embed_and_upsert(processed_documents, doc_ids, signature=signature, start_batch=start_batch)
                 print("DEBUG: Successfully created Chroma database")
                 
                 # Save tracking index AFTER successful creation
@@ -463,20 +490,26 @@ class DBManager:
                      print(f"ERROR: DB created successfully, but failed to save tracking index: {str(index_save_err)}")
                      # Proceed, but inconsistency might occur later
                 # End move
+                
+                try:
+                    self._update_lexical_indexes(doc_ids, processed_documents, rebuild=True)
+                except Exception as lexical_err:
+                    print(f"ERROR: DB created successfully, but failed to build lexical indexes: {str(lexical_err)}")
+                self._clear_build_checkpoint()
 
-                st.success("✅ Successfully created vector embeddings and built the database.")
+                self.sink.success("✅ Successfully created vector embeddings and built the database.")
                 return self.db, final_unique_count
             except Exception as e:
-                print(f"DEBUG: Exception in Chroma.from_documents: {str(e)}")
+                print(f"DEBUG: Exception while building Chroma database: {str(e)}")
                 traceback_info = traceback.format_exc()
                 print(f"DEBUG: Traceback: {traceback_info}")
-                st.error(f"❌ Failed to create embeddings: {str(e)}")
+                self.sink.error(f"❌ Failed to create embeddings: {str(e)}")
                 return None, 0
         except Exception as e:
             traceback_info = traceback.format_exc()
             print(f"DEBUG: Exception in create_db_from_documents: {str(e)}")
             print(f"DEBUG: Traceback: {traceback_info}")
-            st.error(f"❌ Failed to create embeddings: {str(e)}")
+            self.sink.error(f"❌ Failed to create embeddings: {str(e)}")
             return None, 0
     
     def get_db(self) -> Optional[Chroma]:
@@ -497,7 +530,7 @@ class DBManager:
             True if documents were added successfully, False otherwise
         """
         if not self.db:
-            st.error("❌ Database not initialized. Cannot add documents.")
+            self.sink.error("❌ Database not initialized. Cannot add documents.")
             return False
         
         try:
@@ -529,77 +562,63 @@ class DBManager:
                 )
                 cleaned_documents.append(cleaned_doc)
             
-            # --- FIX: Deduplicate added documents relative to existing AND new ones ---
-            # 1. Get existing tracked *content* hashes (doc_id is derived from content)
-            existing_hashes = set()
-            for info in self.tracking_index.get("documents", {}).values():
-                if 'content_hash' in info:
-                    try:
-                        # Use embedding provider from tracking if available, otherwise default to current
-                        provider = info.get('embedding_provider', self.embedding_provider)
-                        doc_id = DocumentTraceability.from_document(
-                            Document(page_content=info['content_hash'], metadata={}), 
-                            embedding_model=self.embedding_model,
-                            embedding_provider=provider
-                        ).doc_id
-                        existing_hashes.add(doc_id)
-                    except Exception as e:
-                        print(f"ERROR: Error computing doc_id from existing hash: {str(e)}")
-
-            # 2. Deduplicate new batch internally and against existing
-            unique_new_docs_dict = {}
-            skipped_new_duplicates = 0
-            skipped_new_error = 0
+            # Chunk IDs are deterministic, so adding a source again upserts it: unchanged chunks
+            # keep their vectors, new chunks are embedded and chunks it no longer has are deleted
+            unique_docs, chunk_ids = assign_chunk_ids(cleaned_documents)
+            # Group by file path where known, "source" alone may be shared by files of other domains
+            ids_by_source: Dict[Tuple[str, Optional[str]], set] = {}
+            for doc, doc_id in zip(unique_docs, chunk_ids):
+                if doc.metadata.get(SOURCE_FILE_KEY):
+                    source_filter = (SOURCE_FILE_KEY, doc.metadata[SOURCE_FILE_KEY])
+                else:
+                    source_filter = ("source", doc.metadata.get("source"))
+                ids_by_source.setdefault(source_filter, set()).add(doc_id)
             
-            for i, doc in enumerate(cleaned_documents):
-                try:
-                    if not hasattr(doc, 'page_content') or not isinstance(doc.page_content, str):
-                        # Use object ID if no content - won't match existing but keeps it
-                        doc_id = f"objid_{id(doc)}"
-                        print(f"WARNING: Add doc {i}: invalid content, using object ID for uniqueness.")
-                        skipped_new_error += 1
-                    else:
-                        # Generate doc_id (which is based on hash)
-                        doc_id = DocumentTraceability.from_document(
-                            doc=doc, 
-                            embedding_model=self.embedding_model,
-                            embedding_provider=self.embedding_provider
-                        ).doc_id
-
-                    # Check against existing AND current batch dict keys (which are doc_ids)
-                    if doc_id not in existing_hashes and doc_id not in unique_new_docs_dict:
-                        unique_new_docs_dict[doc_id] = doc # Store by doc_id
-                    else:
-                        skipped_new_duplicates += 1
-                except Exception as e:
-                     print(f"ERROR: Add doc {i}: error during deduplication hash/check: {str(e)}")
-                     doc_id = f"objid_{id(doc)}" # Fallback ID
-                     unique_new_docs_dict[doc_id] = doc # Add with fallback ID
-                     skipped_new_error += 1
-
-            final_docs_to_add = list(unique_new_docs_dict.values())
+            existing_ids = set()
+            stale_ids = []
+            for (field, source), source_ids in ids_by_source.items():
+                if source is None:
+                    # Chunks without a source cannot be replaced, only skipped if already stored
+                    existing_ids.update(self.db.get(ids=list(source_ids), include=[]).get("ids", []))
+                    continue
+                stored_ids = set(self.db.get(where={field: source}, include=[]).get("ids", []))
+                existing_ids.update(stored_ids & source_ids)
+                stale_ids.extend(sorted(stored_ids - source_ids))
+            
+            if stale_ids:
+                print(f"DEBUG: Deleting {len(stale_ids)} outdated chunks of re-added sources")
+                self._delete_vectors(stale_ids)
+            
+            final_docs_to_add = []
+            final_doc_ids = []
+            for doc, doc_id in zip(unique_docs, chunk_ids):
+                if doc_id not in existing_ids:
+                    final_docs_to_add.append(doc)
+                    final_doc_ids.append(doc_id)
             final_add_count = len(final_docs_to_add)
+            skipped_new_duplicates = len(cleaned_documents) - final_add_count
             
             if final_add_count == 0:
-                 st.info(f"ℹ️ No new unique documents to add (skipped {skipped_new_duplicates} duplicates, {skipped_new_error} errors).")
-                 return True # Nothing to add, technically successful
+                if stale_ids:
+                    self._save_indexes()
+                self.sink.info(f"ℹ️ No new or changed documents to add (skipped {skipped_new_duplicates} unchanged or duplicate chunks, removed {len(stale_ids)} outdated chunks).")
+                return True # Nothing to add, technically successful
 
-            print(f"INFO: Adding {final_add_count} new unique documents (skipped {skipped_new_duplicates} duplicates, {skipped_new_error} errors).")
-            # --- End FIX ---
+            print(f"INFO: Adding {final_add_count} new or changed documents (skipped {skipped_new_duplicates} unchanged or duplicate chunks, removed {len(stale_ids)} outdated chunks).")
 
             # Track documents before adding (use the unique list)
-            for doc in final_docs_to_add:
-                self._track_document(doc)
+            for doc, doc_id in zip(final_docs_to_add, final_doc_ids):
+                self._track_document(doc, doc_id)
 
             # --- START NEW LOGGING STRATEGY ---
             print(f"DEBUG: Starting new logging strategy for {final_add_count} documents to add (Addition).")
-            self._log_processed_chunks(final_docs_to_add, "addition")
+            self._log_processed_chunks(final_docs_to_add, final_doc_ids, "addition")
             print("DEBUG: Finished new logging strategy (Addition).")
             # --- END NEW LOGGING STRATEGY ---
 
             # Add documents to database (use the unique list)
             print(f"DEBUG: Adding {len(final_docs_to_add)} cleaned documents to ChromaDB.")
-            self.db.add_documents(final_docs_to_add)
+            self._embed_and_upsert(final_docs_to_add, final_doc_ids)
             print(f"DEBUG: Successfully added documents to ChromaDB collection.")
 
             # Save tracking index AFTER successful addition
@@ -610,13 +629,400 @@ class DBManager:
                  print(f"ERROR: Documents added successfully, but failed to save tracking index: {str(index_save_err)}")
                  # Proceed, but inconsistency might occur later
             # End move
+            
+            try:
+                self._update_lexical_indexes(final_doc_ids, final_docs_to_add)
+            except Exception as lexical_err:
+                print(f"ERROR: Documents added successfully, but failed to update lexical indexes: {str(lexical_err)}")
 
-            st.success(f"✅ Successfully added {final_add_count} new unique documents to the database.")
+            self.sink.success(f"✅ Successfully added {final_add_count} new or changed documents to the database.")
             return True
         except Exception as e:
-            st.error(f"❌ Failed to add documents: {str(e)}")
+            self.sink.error(f"❌ Failed to add documents: {str(e)}")
             return False
     
+    def _embed_and_upsert(self, documents: List[Document], ids: List[str], signature: Optional[str] = None, start_batch: int = 0):
+        """Embed documents in size-bounded batches and upsert them into the collection.
+        
+        Embedding of batch N+1 runs while batch N is written to Chroma on a
+        background thread, so neither the embedding model nor the database waits
+        for the other. Only one batch of vectors is held in memory at a time.
+        
+        Args:
+            documents: Documents with cleaned metadata
+            ids: Vector IDs, one per document
+            signature: Build signature. If given, progress is checkpointed after
+                every written batch so an interrupted build can resume
+            start_batch: Index of the first batch to embed (batches before it are already stored)
+        """
+        embeddings = self.db.embeddings
+        collection = self.db._collection
+        
+        # The embedding cache holds full vectors, the projection is applied after it
+        if isinstance(embeddings, ProjectedEmbeddings):
+            embed_full = self._cached_embed_documents(embeddings.base)
+            embed_documents = lambda texts: embeddings.projection.transform(embed_full(texts))
+        else:
+            embed_documents = self._cached_embed_documents(embeddings)
+        # Batch chunks of similar length together, so no embedding call pads short CSV rows to long ODX chunks
+        order = sorted(range(len(documents)), key=lambda i: len(documents[i].page_content))
+        batches = [
+            [order[position] for position in batch]
+            for batch in batch_documents_by_size([documents[i] for i in order], EMBEDDING_BATCH_CHARS, EMBEDDING_BATCH_SIZE)
+        ]
+        print(f"DEBUG: Embedding {len(documents)} documents in {len(batches)} batches (starting at batch {start_batch})")
+        
+        def upsert_batch(batch_ids, batch_vectors, batch_metadatas, batch_texts):
+            collection.upsert(ids=batch_ids, embeddings=batch_vectors, metadatas=batch_metadatas, documents=batch_texts)
+        
+        self._save_build_checkpoint(signature, start_batch, len(batches))
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pending_write = None
+            for batch_index in range(start_batch, len(batches)):
+                batch = batches[batch_index]
+                batch_texts = [documents[i].page_content for i in batch]
+                batch_vectors = embed_documents(batch_texts)
+                
+                # Wait for the previous batch before queueing the next, so at most one write is in flight
+                if pending_write:
+                    pending_write.result()
+                    self._save_build_checkpoint(signature, batch_index, len(batches))
+                
+                pending_write = writer.submit(
+                    upsert_batch,
+                    [ids[i] for i in batch],
+                    batch_vectors,
+                    # Keep the vector ID in the metadata, LangChain's search results do not return IDs
+                    [{**documents[i].metadata, "doc_id": ids[i]} for i in batch],
+                    batch_texts
+                )
+                print(f"DEBUG: Embedded batch {batch_index + 1}/{len(batches)} ({len(batch)} documents)")
+            
+            if pending_write:
+                pending_write.result()
+                self._save_build_checkpoint(signature, len(batches), len(batches))
+        bump_index_generation(self.persist_directory)
+        
+        # Persist the cache index now rather than at exit, the vectors are the expensive part of a build
+        get_embedding_cache(self.embedding_provider, self.embedding_model).flush()
+    
+    def _cached_embed_documents(self, embeddings) -> Callable[[List[str]], List[List[float]]]:
+        """Get a function embedding texts through the embedding cache."""
+        # HuggingFaceEmbeddings consults the embedding cache itself, other providers go through it here
+        if isinstance(embeddings, HuggingFaceEmbeddings):
+            return embeddings.embed_documents
+        embedding_cache = get_embedding_cache(self.embedding_provider, self.embedding_model)
+        return lambda texts: embedding_cache.embed_documents(texts, embeddings.embed_documents)
+    
+    def _fit_projection(self, embeddings, documents: List[Document]):
+        """Fit the configured projection on a sample of the corpus and save it.
+        
+        The sampled vectors land in the embedding cache, so the build does not
+        embed them again.
+        
+        Args:
+            embeddings: Embeddings producing full-size vectors
+            documents: Chunks of the build
+            
+        Returns:
+            ProjectedEmbeddings with the new projection, or embeddings if vectors are
+            stored at full size
+        """
+        if os.path.exists(self.projection_path):
+            os.remove(self.projection_path)
+        settings = get_projection_settings()
+        if settings is None:
+            return embeddings
+        
+        method, dimensions = settings
+        fit_sample = int(os.getenv("EMBEDDING_PROJECTION_FIT_SAMPLE", DEFAULT_FIT_SAMPLE))
+        sample = random.Random(0).sample(documents, min(fit_sample, len(documents)))
+        print(f"DEBUG: Fitting {method} projection to {dimensions} dimensions on {len(sample)} chunks")
+        try:
+            vectors = self._cached_embed_documents(embeddings)([doc.page_content for doc in sample])
+            projection = VectorProjection(method, dimensions).fit(vectors)
+        except ValueError as e:
+            self.sink.warning(f"⚠️ Storing full-size vectors, the {method} projection could not be fitted: {str(e)}")
+            return embeddings
+        projection.save(self.projection_path)
+        return ProjectedEmbeddings(embeddings, projection)
+    
+    def _with_stored_projection(self, embeddings):
+        """Apply the projection the stored vectors were reduced with, if any."""
+        projection = VectorProjection.load(self.projection_path)
+        settings = get_projection_settings()
+        stored = (projection.method, projection.dimensions) if projection else None
+        if stored != settings:
+            print(f"WARNING: Stored vectors use projection {stored}, configuration asks for {settings}. Rebuild the database to apply it.")
+        return ProjectedEmbeddings(embeddings, projection) if projection else embeddings
+    
+    def _update_lexical_indexes(self, ids: List[str], documents: List[Document], rebuild: bool = False):
+        """Add stored chunks to the identifier and BM25 indexes and persist both.
+        
+        Args:
+            ids: Vector IDs, one per document
+            documents: Chunks stored under these IDs
+            rebuild: Clear the indexes first (full database build)
+        """
+        if rebuild:
+            self.identifier_index.clear()
+            self.bm25_index.clear()
+        self.identifier_index.add_documents(ids, documents)
+        self.bm25_index.add_documents(ids, documents)
+        self.identifier_index.save()
+        self.bm25_index.save()
+        # Readers that loaded the index files since the vectors changed load them again
+        bump_index_generation(self.persist_directory)
+        print(f"DEBUG: Lexical indexes updated: {len(self.identifier_index)} identifiers, {len(self.bm25_index)} BM25 chunks")
+    
+    def _build_signature(self, doc_ids: List[str]) -> str:
+        """Identify a build by its documents, embedding model and batching."""
+        signature = hashlib.md5()
+        signature.update(f"{self.embedding_provider}:{self.embedding_model}:{self.embedding_backend}:{get_projection_settings()}:{EMBEDDING_BATCH_CHARS}:{EMBEDDING_BATCH_SIZE}:length-sorted".encode())
+        for doc_id in doc_ids:
+            signature.update(doc_id.encode())
+        return signature.hexdigest()
+    
+    def _load_build_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """Load the checkpoint of an interrupted build, if any."""
+        if not os.path.exists(self.build_checkpoint_path):
+            return None
+        try:
+            with open(self.build_checkpoint_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"WARNING: Error loading build checkpoint: {str(e)}. Starting a fresh build.")
+            return None
+    
+    def _save_build_checkpoint(self, signature: Optional[str], completed_batches: int, total_batches: int):
+        """Record how many batches of the current build are stored."""
+        if signature is None:
+            return
+        checkpoint = {
+            "signature": signature,
+            "completed_batches": completed_batches,
+            "total_batches": total_batches,
+            "updated": datetime.datetime.now().isoformat()
+        }
+        # Write to a temporary file first so a crash never leaves a truncated checkpoint
+        temp_path = f"{self.build_checkpoint_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(temp_path, self.build_checkpoint_path)
+    
+    def _clear_build_checkpoint(self):
+        """Remove the build checkpoint once the build is complete."""
+        if os.path.exists(self.build_checkpoint_path):
+            os.remove(self.build_checkpoint_path)
+
+    def detect_source_changes(self, source_files: List[Tuple[str, str]]) -> SourceChangeSet:
+        """Compare the source files on disk with the fingerprints of the last build or sync.
+
+        Only files whose size or mtime changed are re-hashed, so detecting changes
+        on an unchanged corpus costs one stat call per file.
+
+        Args:
+            source_files: List of (file_path, domain) tuples currently on disk
+
+        Returns:
+            SourceChangeSet with added, changed, removed and unchanged sources
+        """
+        known_fingerprints = self.tracking_index.get("source_fingerprints", {})
+        changes = SourceChangeSet()
+        seen_paths = set()
+
+        for file_path, domain in source_files:
+            path = os.path.abspath(file_path)
+            seen_paths.add(path)
+            previous = SourceFingerprint.from_dict(known_fingerprints[path]) if path in known_fingerprints else None
+
+            try:
+                fingerprint = SourceFingerprint.from_file(path, domain=domain, previous=previous)
+            except OSError as e:
+                print(f"WARNING: Could not fingerprint source file {path}: {str(e)}. Leaving it untouched.")
+                if previous:
+                    changes.unchanged.append(previous)
+                continue
+
+            if previous is None:
+                changes.added.append(fingerprint)
+            elif previous.content_hash != fingerprint.content_hash or previous.domain != domain:
+                changes.changed.append(fingerprint)
+            else:
+                changes.unchanged.append(fingerprint)
+
+        for path, fingerprint_data in known_fingerprints.items():
+            if path not in seen_paths:
+                changes.removed.append(SourceFingerprint.from_dict(fingerprint_data))
+
+        print(f"DEBUG: Source changes - added: {len(changes.added)}, changed: {len(changes.changed)}, "
+              f"removed: {len(changes.removed)}, unchanged: {len(changes.unchanged)}")
+        return changes
+
+    def sync_sources(self, changes: SourceChangeSet, documents_by_path: Dict[str, List[Document]]) -> Tuple[int, int]:
+        """Incrementally bring the database in line with the source files on disk.
+
+        Vectors of changed and removed sources are deleted, and only the documents of
+        added and changed sources are embedded, so the cost is proportional to the
+        files that changed rather than to the whole corpus.
+
+        Args:
+            changes: Result of detect_source_changes()
+            documents_by_path: Processed documents for every source in changes.to_process,
+                keyed by fingerprint path
+
+        Returns:
+            A tuple with the number of documents submitted for embedding and the number
+            of vectors removed
+        """
+        if not self.db:
+            self.sink.error("❌ Database not initialized. Cannot sync sources.")
+            return 0, 0
+
+        known_fingerprints = self.tracking_index["source_fingerprints"]
+
+        # Collect the files whose previous version has to be removed, with the "source"
+        # values their chunks carried
+        stale_files: Dict[str, set] = {}
+        for fingerprint in changes.changed + changes.removed:
+            previous = known_fingerprints.pop(fingerprint.path, None)
+            stale_files.setdefault(fingerprint.path, set()).update(previous.get("sources", []) if previous else fingerprint.sources)
+
+        # Record fingerprints of the files that are (re-)indexed now. Their chunks are
+        # replaced as well, which also covers indexes built before fingerprints existed.
+        new_documents = []
+        for fingerprint in changes.to_process:
+            documents = documents_by_path.get(fingerprint.path, [])
+            fingerprint.attach_documents(documents)
+            known_fingerprints[fingerprint.path] = fingerprint.to_dict()
+            stale_files.setdefault(fingerprint.path, set()).update(fingerprint.sources)
+            new_documents.extend(documents)
+
+        removed_count = sum(self._remove_file_documents(path, sorted(sources)) for path, sources in sorted(stale_files.items()))
+        try:
+            self.identifier_index.save()
+            self.bm25_index.save()
+        except Exception as lexical_err:
+            print(f"ERROR: Failed to save lexical indexes after removing sources: {str(lexical_err)}")
+
+        # Unchanged files may still have a new mtime, keep it so they are not re-hashed next time
+        for fingerprint in changes.unchanged:
+            known_fingerprints[fingerprint.path] = fingerprint.to_dict()
+
+        if new_documents:
+            self.add_documents(new_documents)
+
+        try:
+            self._save_tracking_index()
+        except Exception as index_save_err:
+            print(f"ERROR: Sources synced, but failed to save tracking index: {str(index_save_err)}")
+
+        print(f"INFO: Source sync finished. Submitted {len(new_documents)} documents, removed {removed_count} vectors.")
+        return len(new_documents), removed_count
+
+    def _remove_file_documents(self, path: str, sources: List[str]) -> int:
+        """Delete the vectors and tracking entries of the chunks of one source file.
+
+        Chunks are matched by the file path in their "source_file" metadata. Chunks
+        indexed before the path was recorded are matched by their "source" value,
+        unless the path of another file is recorded on them.
+
+        Args:
+            path: Absolute path of the source file, as in its fingerprint
+            sources: "source" metadata values the file's chunks carried
+
+        Returns:
+            Number of vectors deleted from the database
+        """
+        try:
+            ids = set(self.db.get(where={SOURCE_FILE_KEY: path}, include=[]).get("ids", []))
+            for source in sources:
+                stored = self.db.get(where={"source": source}, include=["metadatas"])
+                for doc_id, metadata in zip(stored.get("ids", []), stored.get("metadatas") or []):
+                    if (metadata or {}).get(SOURCE_FILE_KEY) in (None, path):
+                        ids.add(doc_id)
+            self._delete_vectors(sorted(ids))
+            print(f"DEBUG: Removed {len(ids)} vectors for source file '{path}'")
+            return len(ids)
+        except Exception as e:
+            print(f"ERROR: Failed to remove vectors for source file '{path}': {str(e)}")
+            return 0
+
+    def _remove_source_documents(self, sources: List[str]) -> int:
+        """Delete the vectors and tracking entries of the given source metadata values.
+
+        Args:
+            sources: Values of the "source" metadata field to remove
+
+        Returns:
+            Number of vectors deleted from the database
+        """
+        removed_count = 0
+        for source in sources:
+            try:
+                ids = self.db.get(where={"source": source}, include=[]).get("ids", [])
+                self._delete_vectors(ids)
+                removed_count += len(ids)
+                print(f"DEBUG: Removed {len(ids)} vectors for source '{source}'")
+            except Exception as e:
+                print(f"ERROR: Failed to remove vectors for source '{source}': {str(e)}")
+
+            # Remove the tracking entries of this source from all secondary indexes
+            self.tracking_index.remove_source(source)
+
+        return removed_count
+
+    def _delete_vectors(self, ids: List[str]):
+        """Delete vectors from the database, the lexical indexes and the tracking index (not persisted)."""
+        if not ids:
+            return
+        self.db.delete(ids=ids)
+        self.identifier_index.remove_ids(ids)
+        self.bm25_index.remove_ids(ids)
+        self.tracking_index.remove(ids)
+        bump_index_generation(self.persist_directory)
+
+    def _save_indexes(self):
+        """Persist the lexical indexes and the tracking index after vectors were deleted."""
+        try:
+            self.identifier_index.save()
+            self.bm25_index.save()
+            self._save_tracking_index()
+            bump_index_generation(self.persist_directory)
+        except Exception as e:
+            print(f"ERROR: Failed to save indexes after deleting vectors: {str(e)}")
+
+    def delete_source(self, source: str) -> int:
+        """Delete every chunk of a source from the database and all indexes.
+
+        The fingerprints of files that produced the source are dropped as well, so
+        the next source sync indexes such a file again instead of skipping it.
+
+        Args:
+            source: Path of an indexed source file, which removes only that file's
+                chunks, or a value of the "source" metadata field, which removes the
+                chunks of every file carrying it
+
+        Returns:
+            Number of vectors deleted from the database
+        """
+        if not self.db:
+            self.sink.error("❌ Database not initialized. Cannot delete documents.")
+            return 0
+
+        fingerprints = self.tracking_index["source_fingerprints"]
+        path = os.path.abspath(source)
+        if path in fingerprints:
+            removed_count = self._remove_file_documents(path, fingerprints.pop(path).get("sources", []))
+        else:
+            removed_count = self._remove_source_documents([source])
+            for path in [path for path, fingerprint in fingerprints.items() if source in fingerprint.get("sources", [])]:
+                del fingerprints[path]
+        self._save_indexes()
+
+        print(f"INFO: Deleted {removed_count} vectors of source '{source}'")
+        return removed_count
+
     def similarity_search(self, query: str, k: int = 5, filter_dict: Optional[dict] = None):
         """Perform similarity search in the database.
         
@@ -629,7 +1035,7 @@ class DBManager:
             List of documents similar to the query
         """
         if not self.db:
-            st.error("❌ Database not initialized. Cannot perform search.")
+            self.sink.error("❌ Database not initialized. Cannot perform search.")
             print("DEBUG: similarity_search called but self.db is None.")
             return []
         
@@ -646,38 +1052,23 @@ class DBManager:
             
             print(f"DEBUG: ChromaDB search returned {len(raw_results)} results.")
             
-            # Enhance results with traceability information
-            enhanced_results = []
+            # Enhance results with traceability information. The results are fresh
+            # objects built for this query, so the trace info is attached in place.
+            documents = self.tracking_index["documents"]
             for doc in raw_results:
-                try:
-                    # Generate a document ID from content hash
-                    doc_id = DocumentTraceability.from_document(
-                        doc=doc, 
-                        embedding_model=self.embedding_model,
-                        embedding_provider=self.embedding_provider
-                    ).doc_id
-                    
-                    # Try to get trace info from tracking index
-                    trace_info = self.get_document_trace(doc_id)
-                    if trace_info:
-                        # Add trace info to metadata for client use
-                        # Make a copy to avoid modifying original results directly if needed elsewhere
-                        enhanced_doc = Document(page_content=doc.page_content, metadata=doc.metadata.copy()) 
-                        enhanced_doc.metadata["trace_info"] = trace_info
-                        enhanced_results.append(enhanced_doc)
-                    else:
-                        enhanced_results.append(doc) # Append original doc if no trace info
-                except Exception as enhance_err:
-                    print(f"DEBUG: Error enhancing document metadata: {str(enhance_err)}. Skipping enhancement for this doc.")
-                    enhanced_results.append(doc) # Append original doc on error
-
-            print(f"DEBUG: Returning {len(enhanced_results)} results after enhancement.")
-            return enhanced_results
+                # Vectors stored before doc_id was kept in the metadata fall back to the content hash
+                doc_id = doc.metadata.get("doc_id") or hashlib.md5(doc.page_content.encode()).hexdigest()
+                trace_info = documents.get(doc_id)
+                if trace_info:
+                    doc.metadata["trace_info"] = trace_info
+
+            print(f"DEBUG: Returning {len(raw_results)} results after enhancement.")
+            return raw_results
         except Exception as e:
             traceback_info = traceback.format_exc()
             print(f"DEBUG: Exception during ChromaDB search: {str(e)}")
             print(f"DEBUG: Traceback: {traceback_info}")
-            st.error(f"❌ Search error: {str(e)}")
+            self.sink.error(f"❌ Search error: {str(e)}")
             return []
     
     # Document traceability query methods
@@ -688,41 +1079,30 @@ class DBManager:
     
     def get_documents_by_source(self, source_path: str) -> List[Dict[str, Any]]:
         """Get all document traces for a specific source."""
-        if source_path not in self.tracking_index["sources"]:
-            return []
-        
-        doc_ids = self.tracking_index["sources"][source_path]
-        # Ensure doc_id exists in documents index before trying to access
-        return [self.tracking_index["documents"][doc_id] for doc_id in doc_ids if doc_id in self.tracking_index["documents"]]
+        doc_ids = self.tracking_index.ids_for("sources", source_path)
+        return [self.tracking_index["documents"][doc_id] for doc_id in doc_ids]
     
     def get_documents_by_domain(self, domain: str) -> List[Dict[str, Any]]:
         """Get all document traces for a specific domain."""
-        if domain not in self.tracking_index["domains"]:
-            return []
-        
-        doc_ids = self.tracking_index["domains"][domain]
-        # Ensure doc_id exists in documents index before trying to access
-        return [self.tracking_index["documents"][doc_id] for doc_id in doc_ids if doc_id in self.tracking_index["documents"]]
+        doc_ids = self.tracking_index.ids_for("domains", domain)
+        return [self.tracking_index["documents"][doc_id] for doc_id in doc_ids]
     
     def get_documents_by_type(self, file_type: str) -> List[Dict[str, Any]]:
         """Get all document traces for a specific file type."""
-        if file_type not in self.tracking_index["file_types"]:
-            return []
-        
-        doc_ids = self.tracking_index["file_types"][file_type]
-        # Ensure doc_id exists in documents index before trying to access
-        return [self.tracking_index["documents"][doc_id] for doc_id in doc_ids if doc_id in self.tracking_index["documents"]]
+        doc_ids = self.tracking_index.ids_for("file_types", file_type)
+        return [self.tracking_index["documents"][doc_id] for doc_id in doc_ids]
     
     def get_document_trace(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """Get trace info for a specific document ID."""
         return self.tracking_index["documents"].get(doc_id)
 
     # --- START NEW HELPER METHOD for Logging ---
-    def _log_processed_chunks(self, documents_to_log: List[Document], process_type: str):
+    def _log_processed_chunks(self, documents_to_log: List[Document], doc_ids: List[str], process_type: str):
         """Logs processed document chunks to domain-specific files based on source.
 
         Args:
             documents_to_log: List of Document objects (chunks) to log.
+            doc_ids: Chunk IDs the documents are stored under, one per document.
             process_type: String indicating the process ("creation" or "addition").
         """
         print(f"DEBUG: Logging {len(documents_to_log)} chunks for process type: {process_type}")
@@ -776,15 +1156,7 @@ class DBManager:
 
                     # Write each chunk's details
                     for i, doc in doc_tuples: # Use the stored index and doc
-                        try:
-                            doc_id = DocumentTraceability.from_document(
-                                doc=doc, 
-                                embedding_model=self.embedding_model,
-                                embedding_provider=self.embedding_provider
-                            ).doc_id
-                        except Exception:
-                            doc_id = "error_generating_id"
-
+                        doc_id = doc_ids[i]
                         f.write(f"--- Chunk Start (Index in Batch: {i}, ID: {doc_id}) ---\n")
 
                         # Write Metadata
@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .embedding_backends import normalize_rows, top_k_neighbours, recall_at_k, default_queries, sample_corpus
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+PROJECTION_METHODS = ("pca", "truncate")
+DEFAULT_PROJECTION_DIMS = 256
+
+# Chunks embedded to fit a PCA projection
+DEFAULT_FIT_SAMPLE = 5000
+
+
+def get_projection_settings() -> Optional[Tuple[str, int]]:
+    """Projection configured by EMBEDDING_PROJECTION and EMBEDDING_PROJECTION_DIMS.
+
+    Returns:
+        (method, dimensions), or None if vectors are stored at full size
+    """
+    method = os.getenv("EMBEDDING_PROJECTION", "").strip().lower()
+    if not method:
+        return None
+    if method not in PROJECTION_METHODS:
+        logger.warning(f"Unknown EMBEDDING_PROJECTION '{method}', storing full vectors")
+        return None
+    return method, int(os.getenv("EMBEDDING_PROJECTION_DIMS", DEFAULT_PROJECTION_DIMS))
+
+
+class VectorProjection:
+    """Linear reduction of embedding vectors to fewer dimensions.
+
+    "pca" projects onto the principal components of a corpus sample and works for
+    any model. "truncate" keeps the leading dimensions, which only preserves
+    quality for Matryoshka-trained models such as OpenAI's text-embedding-3.
+    Projected vectors are normalized to unit length, so cosine and L2 rankings
+    agree as they do for the full vectors.
+    """
+
+    def __init__(self, method: str, dimensions: int, mean: Optional[np.ndarray] = None,
+                 components: Optional[np.ndarray] = None):
+        """Initialize the projection.
+
+        Args:
+            method: "pca" or "truncate"
+            dimensions: Dimensions of the projected vectors
+            mean: Mean of the fitted vectors (pca)
+            components: Principal components, one row per output dimension (pca)
+        """
+        if method not in PROJECTION_METHODS:
+            raise ValueError(f"Unsupported projection method: {method}")
+        self.method = method
+        self.dimensions = dimensions
+        self.mean = mean
+        self.components = components
+
+    @property
+    def name(self) -> str:
+        """Short name of the projection, e.g. pca256."""
+        return f"{self.method}{self.dimensions}"
+
+    @property
+    def fingerprint(self) -> str:
+        """Name of the projection plus a short hash of its fitted parameters, e.g. pca256-1a2b3c4d.
+
+        A refit on a different sample changes it, so vectors projected before the refit
+        are not mistaken for current ones.
+        """
+        if self.method != "pca" or self.components is None:
+            return self.name
+        digest = hashlib.md5()
+        digest.update(np.ascontiguousarray(self.mean, dtype=np.float32).tobytes())
+        digest.update(np.ascontiguousarray(self.components, dtype=np.float32).tobytes())
+        return f"{self.name}-{digest.hexdigest()[:8]}"
+
+    def fit(self, vectors: List[List[float]]) -> "VectorProjection":
+        """Fit the projection to a sample of corpus vectors.
+
+        Args:
+            vectors: Full-size vectors of corpus chunks
+
+        Returns:
+            The projection itself
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.dimensions > matrix.shape[1]:
+            raise ValueError(f"Cannot project {matrix.shape[1]}-dimensional vectors to {self.dimensions} dimensions")
+        if self.method == "pca":
+            if matrix.shape[0] < self.dimensions:
+                raise ValueError(f"PCA to {self.dimensions} dimensions needs at least as many vectors, got {matrix.shape[0]}")
+            self.mean = matrix.mean(axis=0)
+            _, _, vt = np.linalg.svd(matrix - self.mean, full_matrices=False)
+            self.components = vt[:self.dimensions].astype(np.float32)
+        return self
+
+    def transform(self, vectors: List[List[float]]) -> List[List[float]]:
+        """Project full-size vectors.
+
+        Args:
+            vectors: Vectors of the embedding model
+
+        Returns:
+            Projected unit-length vectors
+        """
+        if not vectors:
+            return []
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.method == "pca":
+            matrix = (matrix - self.mean) @ self.components.T
+        else:
+            matrix = matrix[:, :self.dimensions]
+        return normalize_rows(matrix).tolist()
+
+    def save(self, path: str):
+        """Write the projection to an .npz file."""
+        arrays = {"settings": np.array(json.dumps({"method": self.method, "dimensions": self.dimensions}))}
+        if self.method == "pca":
+            arrays.update(mean=self.mean, components=self.components)
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["VectorProjection"]:
+        """Read a projection written by save(), or None if there is none."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            settings = json.loads(str(data["settings"]))
+            return cls(
+                settings["method"],
+                settings["dimensions"],
+                mean=data["mean"] if "mean" in data else None,
+                components=data["components"] if "components" in data else None
+            )
+
+
+class ProjectedEmbeddings(Embeddings):
+    """Embeddings whose document and query vectors pass through a projection.
+
+    Used as the embedding function of the vector database, so stored chunks and
+    queries are always reduced the same way.
+    """
+
+    def __init__(self, base: Embeddings, projection: VectorProjection):
+        """Initialize the projected embeddings.
+
+        Args:
+            base: Embeddings producing the full-size vectors
+            projection: Fitted projection
+        """
+        self.base = base
+        self.projection = projection
+        base_name = getattr(base, "model_name", None) or getattr(base, "model", None)
+        # Keeps reduced query vectors apart from full ones, and from those of an earlier fit, in the query cache
+        self.model_name = f"{base_name}@{projection.fingerprint}"
+        self.backend = getattr(base, "backend", None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed and project document texts."""
+        return self.projection.transform(self.base.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed and project a query text."""
+        return self.projection.transform([self.base.embed_query(text)])[0]
+
+
+@dataclass
+class ProjectionRecall:
+    """Neighbour recall of reduced vectors relative to the full vectors."""
+    name: str
+    dimensions: int
+    full_dimensions: int
+    recall: float
+    k: int
+
+    def report(self) -> str:
+        """Format the result as a line of the recall table."""
+        return f"  {self.name:>12}  {self.dimensions:>5} dims  {self.dimensions / self.full_dimensions:>6.1%} of the storage  recall@{self.k} {self.recall:.3f}"
+
+
+def projection_recall(corpus_vectors: List[List[float]], query_vectors: List[List[float]],
+                      projections: List[VectorProjection], k: int = 10) -> List[ProjectionRecall]:
+    """Compare the nearest neighbours of reduced and full vectors.
+
+    Args:
+        corpus_vectors: Full vectors of the corpus chunks
+        query_vectors: Full vectors of the queries
+        projections: Projections to evaluate, fitted on the corpus vectors
+        k: Number of neighbours compared per query
+
+    Returns:
+        One ProjectionRecall per projection
+    """
+    corpus = normalize_rows(corpus_vectors)
+    queries = normalize_rows(query_vectors)
+    expected = top_k_neighbours(queries, corpus, k)
+    results = []
+    for projection in projections:
+        reduced_corpus = np.asarray(projection.transform(corpus_vectors))
+        reduced_queries = np.asarray(projection.transform(query_vectors))
+        found = top_k_neighbours(reduced_queries, reduced_corpus, k)
+        results.append(ProjectionRecall(projection.name, projection.dimensions, corpus.shape[1], recall_at_k(expected, found), k))
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    """Report the recall@k of reduced vectors on the chunks of the database."""
+    from app.embeddings.db_manager import DBManager
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--method", choices=PROJECTION_METHODS, default="pca")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 512])
+    parser.add_argument("--persist-directory", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "chroma_db"))
+    parser.add_argument("--sample", type=int, default=2000, help="Chunks the projections are fitted and evaluated on")
+    parser.add_argument("--queries", type=int, default=200, help="Queries built from chunk headings")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours compared per query")
+    args = parser.parse_args(argv)
+
+    texts = sample_corpus(args.persist_directory, args.sample)
+    if not texts:
+        print(f"❌ No chunks found in {args.persist_directory}. Build the database first.")
+        sys.exit(1)
+
+    # Full vectors of the configured embedding model, whatever the database stores
+    embeddings = DBManager(persist_directory=args.persist_directory)._get_embeddings_function()
+    corpus_vectors = embeddings.embed_documents(texts)
+    query_vectors = [embeddings.embed_query(query) for query in default_queries(texts, args.queries)]
+
+    projections = []
+    for dims in sorted(args.dims):
+        try:
+            projections.append(VectorProjection(args.method, dims).fit(corpus_vectors))
+        except ValueError as e:
+            print(f"⚠️ Skipping {dims} dimensions: {str(e)}")
+
+    print(f"Recall@{args.k} of reduced vectors on {len(texts)} chunks and {len(query_vectors)} queries:")
+    for result in projection_recall(corpus_vectors, query_vectors, projections, k=args.k):
+        print(result.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,79 @@
-from dataclasses import dataclass, asdict
-from typing import Dict, Any, Optional
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Any, Optional, List, Tuple
 import hashlib
 import os
 import datetime
 from langchain_core.documents.base import Document
 
+# Source of chunks without "source" metadata
+UNKNOWN_SOURCE = "unknown"
+
+# Metadata field holding the absolute path of the file a chunk was produced from.
+# Processors mostly set "source" to the bare file name, which is not unique across domains.
+SOURCE_FILE_KEY = "source_file"
+
+
+def source_key(metadata: Dict[str, Any]) -> str:
+    """Identify the file a chunk belongs to: its path if known, else its "source" value."""
+    return metadata.get(SOURCE_FILE_KEY) or metadata.get("source") or UNKNOWN_SOURCE
+
+
+def make_chunk_id(source: str, chunk_index: int, content: str) -> str:
+    """Build the deterministic ID of a chunk.
+    
+    The ID is stable across rebuilds and only changes when the chunk's content
+    or its position in the source changes, so re-adding a source overwrites its
+    vectors instead of duplicating them.
+    
+    Args:
+        source: "source" metadata value of the chunk
+        chunk_index: Position of the chunk among the chunks of its source
+        content: Text of the chunk
+        
+    Returns:
+        ID of the form "<source>::<chunk index>::<md5 of the content>"
+    """
+    return f"{source}::{chunk_index}::{hashlib.md5(content.encode()).hexdigest()}"
+
+
+def assign_chunk_ids(documents: List[Document]) -> Tuple[List[Document], List[str]]:
+    """Assign chunk IDs to documents and drop repeated chunks within a source.
+    
+    Chunks are numbered in the order they appear for their source file. A chunk
+    whose content already appeared earlier in the same file is dropped; identical
+    content in different files is kept, so deleting one file never removes
+    another file's chunks. Only if two files of the same name repeat a chunk at
+    the same position do their IDs coincide, and the repeat is dropped.
+    
+    Args:
+        documents: Chunks in the order the processors produced them
+        
+    Returns:
+        A tuple of the unique documents and their IDs
+    """
+    unique_documents, ids = [], []
+    chunk_counts: Dict[str, int] = {}
+    seen = set()
+    for doc in documents:
+        key = source_key(doc.metadata)
+        chunk_index = chunk_counts.get(key, 0)
+        chunk_counts[key] = chunk_index + 1
+        content_hash = hashlib.md5(doc.page_content.encode()).hexdigest()
+        chunk_id = make_chunk_id(doc.metadata.get("source") or UNKNOWN_SOURCE, chunk_index, doc.page_content)
+        if (key, content_hash) in seen or chunk_id in seen:
+            continue
+        seen.update([(key, content_hash), chunk_id])
+        unique_documents.append(doc)
+        ids.append(chunk_id)
+    return unique_documents, ids
+
 
 @dataclass
 class DocumentTraceability:
     """Track source document information for embeddings."""
     
     # Document identification
-    doc_id: str                # Unique identifier (hash of content)
+    doc_id: str                # Chunk ID, see make_chunk_id (hash of content for older indexes)
     source_path: str           # Original file path
     filename: str              # Original filename
     file_type: str             # File extension/type (pdf, json, etc.)
@@ -26,12 +88,17 @@ class DocumentTraceability:
     # Document stats
     file_size: int = 0         # Size in bytes
     chunk_count: int = 1       # Total chunks the document was split into
+    content_hash: str = ""     # MD5 of the chunk text
     
     @classmethod
-    def from_document(cls, doc: Document, embedding_model: str, embedding_provider: str = "openai", source_path: str = None) -> 'DocumentTraceability':
-        """Create traceability info from a Document object."""
-        # Generate a unique document ID based on content
-        doc_id = hashlib.md5(doc.page_content.encode()).hexdigest()
+    def from_document(cls, doc: Document, embedding_model: str, embedding_provider: str = "openai", source_path: str = None,
+                      doc_id: str = None) -> 'DocumentTraceability':
+        """Create traceability info from a Document object.
+        
+        The doc_id defaults to the hash of the content when no chunk ID is given.
+        """
+        content_hash = hashlib.md5(doc.page_content.encode()).hexdigest()
+        doc_id = doc_id or content_hash
         
         # Extract filename from path or metadata
         if source_path:
@@ -64,9 +131,86 @@ class DocumentTraceability:
             chunk_id=chunk_id,
             domain=domain,
             file_size=file_size,
-            chunk_count=chunk_count
+            chunk_count=chunk_count,
+            content_hash=content_hash
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for storage."""
+        return asdict(self)
+
+
+@dataclass
+class SourceFingerprint:
+    """Fingerprint of a source file, used to detect changes between index builds."""
+    
+    path: str                  # Path of the source file on disk
+    size: int                  # Size in bytes
+    mtime: float               # Last modification time
+    content_hash: str          # MD5 of the file content
+    domain: str = "unknown"    # Semantic domain the file was indexed under
+    sources: List[str] = field(default_factory=list)  # "source" metadata values of the produced chunks
+    indexed_date: str = ""     # Date/time when the source was last indexed
+    
+    @classmethod
+    def from_file(cls, file_path: str, domain: str = "unknown", previous: Optional['SourceFingerprint'] = None) -> 'SourceFingerprint':
+        """Create a fingerprint for a file on disk.
+        
+        The content hash of the previous fingerprint is reused when size and mtime
+        are unchanged, so unchanged files are never read.
+        """
+        stat = os.stat(file_path)
+        if previous and previous.size == stat.st_size and previous.mtime == stat.st_mtime:
+            content_hash = previous.content_hash
+        else:
+            md5 = hashlib.md5()
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    md5.update(block)
+            content_hash = md5.hexdigest()
+        
+        return cls(
+            path=os.path.abspath(file_path),
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            content_hash=content_hash,
+            domain=domain,
+            sources=list(previous.sources) if previous else [],
+            indexed_date=previous.indexed_date if previous else ""
         )
     
+    def attach_documents(self, documents: List[Document]) -> 'SourceFingerprint':
+        """Record which "source" metadata values the chunks of this file carry."""
+        self.sources = sorted({doc.metadata.get("source", "unknown_source") for doc in documents})
+        self.indexed_date = datetime.datetime.now().isoformat()
+        return self
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SourceFingerprint':
+        """Create a fingerprint from its stored dictionary form."""
+        return cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for storage."""
-        return asdict(self) 
\ No newline at end of file
+        return asdict(self)
+
+
+@dataclass
+class SourceChangeSet:
+    """Result of comparing the source files on disk with the tracking index."""
+    
+    added: List[SourceFingerprint] = field(default_factory=list)
+    changed: List[SourceFingerprint] = field(default_factory=list)
+    removed: List[SourceFingerprint] = field(default_factory=list)
+    unchanged: List[SourceFingerprint] = field(default_factory=list)
+    
+    @property
+    def to_process(self) -> List[SourceFingerprint]:
+        """Sources that need to be (re-)processed and embedded."""
+        return self.added + self.changed
+    
+    @property
+    def has_changes(self) -> bool:
+        """Whether anything needs to be synced."""
+        return bool(self.added or self.changed or self.removed)
+
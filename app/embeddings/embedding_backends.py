@@ -0,0 +1,244 @@
+import os
+import re
+import sys
+import time
+import random
+import logging
+import argparse
+import importlib.util
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+import torch
+from langchain_core.embeddings import Embeddings
+
+try:
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+except ImportError:
+    export_dynamic_quantized_onnx_model = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Quantized ONNX copies of models are exported here once
+DEFAULT_EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "onnx")
+
+# ONNX Runtime quantization preset: "avx2" runs on any x86-64 CPU, "avx512_vnni" is faster where supported
+DEFAULT_ONNX_QUANTIZATION = "avx2"
+
+
+def onnx_available() -> bool:
+    """Check whether the ONNX Runtime backend of sentence-transformers can be used."""
+    return importlib.util.find_spec("optimum") is not None and importlib.util.find_spec("onnxruntime") is not None
+
+
+def export_quantized_onnx(model_name: str, device: str, cache_folder: Optional[str],
+                          load: Callable[..., Any]) -> Tuple[str, str]:
+    """Export an int8 dynamically quantized ONNX copy of a model, unless it already exists.
+
+    Args:
+        model_name: HuggingFace model name
+        device: Device the model is exported on
+        cache_folder: HuggingFace cache folder of the original model
+        load: SentenceTransformer class used to load the model
+
+    Returns:
+        Directory of the exported model and the file name of its quantized ONNX graph
+    """
+    if not onnx_available() or export_dynamic_quantized_onnx_model is None:
+        raise ImportError("ONNX export requires optimum[onnxruntime]")
+    quantization = os.getenv("EMBEDDING_ONNX_QUANTIZATION", DEFAULT_ONNX_QUANTIZATION)
+    export_dir = os.getenv("EMBEDDING_EXPORT_DIR") or DEFAULT_EXPORT_DIR
+    directory = os.path.join(export_dir, re.sub(r'[^A-Za-z0-9._-]', "_", model_name))
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+
+    if not os.path.exists(os.path.join(directory, file_name)):
+        logger.info(f"Exporting int8 ONNX model of {model_name} to {directory}")
+        model = load(model_name_or_path=model_name, device=device, cache_folder=cache_folder, backend="onnx")
+        model.save(directory)
+        # Written last, so an interrupted export is repeated on the next load
+        export_dynamic_quantized_onnx_model(model, quantization, directory)
+    return directory, file_name
+
+
+def quantize_torch_model(model: torch.nn.Module) -> torch.nn.Module:
+    """Quantize the linear layers of a CPU model to int8 with PyTorch dynamic quantization."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class Float16Vectors(Embeddings):
+    """Embeddings rounded to float16, as stored by an embedding cache with EMBEDDING_CACHE_DTYPE=float16."""
+
+    def __init__(self, base: Embeddings):
+        """Initialize the wrapper.
+
+        Args:
+            base: Embeddings producing float32 vectors
+        """
+        self.base = base
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document texts and round the vectors to float16."""
+        return np.asarray(self.base.embed_documents(texts), dtype=np.float16).astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query text and round the vector to float16."""
+        return np.asarray(self.base.embed_query(text), dtype=np.float16).astype(np.float32).tolist()
+
+
+@dataclass
+class BackendComparison:
+    """Accuracy and speed of an embedding backend relative to the float32 model."""
+    backend: str
+    texts: int
+    queries: int
+    k: int
+    mean_cosine: float  # Cosine similarity of the same text's vectors from both backends
+    min_cosine: float
+    recall_rebuilt: float  # Overlap of the top-k neighbours once the database is rebuilt with the backend
+    recall_mixed: float  # Overlap while the database still holds float32 vectors
+    reference_seconds: float
+    candidate_seconds: float
+
+    @property
+    def speedup(self) -> float:
+        """Encoding speed of the backend relative to the float32 model."""
+        return self.reference_seconds / self.candidate_seconds if self.candidate_seconds else 0.0
+
+    def report(self) -> str:
+        """Format the comparison for the terminal."""
+        return "\n".join([
+            f"Backend {self.backend} vs float32 on {self.texts} chunks and {self.queries} queries:",
+            f"  Vector cosine similarity: mean {self.mean_cosine:.4f}, min {self.min_cosine:.4f}",
+            f"  Recall@{self.k} after rebuilding the database: {self.recall_rebuilt:.3f}",
+            f"  Recall@{self.k} with the current float32 database: {self.recall_mixed:.3f}",
+            f"  Encoding time: {self.reference_seconds:.1f}s float32, {self.candidate_seconds:.1f}s {self.backend} ({self.speedup:.1f}x)"
+        ])
+
+
+def normalize_rows(vectors: List[List[float]]) -> np.ndarray:
+    """Convert vectors to a float32 matrix of unit rows."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def top_k_neighbours(queries: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k nearest corpus vectors of each query."""
+    scores = queries @ corpus.T
+    k = min(k, corpus.shape[0])
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def recall_at_k(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Mean share of the reference neighbours found by the candidate."""
+    overlaps = [len(set(ref) & set(cand)) / len(ref) for ref, cand in zip(reference, candidate)]
+    return float(np.mean(overlaps)) if overlaps else 0.0
+
+
+def default_queries(texts: List[str], count: int, seed: int = 0) -> List[str]:
+    """Build queries from the first line of sampled chunks, e.g. their signal or service heading."""
+    rng = random.Random(seed)
+    queries = []
+    for text in rng.sample(texts, min(count, len(texts))):
+        lines = [line.strip("# ").strip() for line in text.splitlines() if line.strip("# ").strip()]
+        if lines:
+            queries.append(lines[0][:200])
+    return queries
+
+
+def compare_backends(texts: List[str], queries: List[str], reference: Embeddings, candidate: Embeddings,
+                     backend: str, k: int = 10) -> BackendComparison:
+    """Measure how closely a backend reproduces the float32 model on a corpus.
+
+    Args:
+        texts: Corpus chunks
+        queries: Queries searched against the corpus
+        reference: Embeddings of the float32 model
+        candidate: Embeddings of the backend under test
+        backend: Name of the backend under test
+        k: Number of neighbours compared per query
+
+    Returns:
+        BackendComparison of the two backends
+    """
+    # Load both models before timing
+    reference.embed_documents(texts[:1])
+    candidate.embed_documents(texts[:1])
+
+    start = time.perf_counter()
+    reference_corpus = normalize_rows(reference.embed_documents(texts))
+    reference_seconds = time.perf_counter() - start
+    reference_queries = normalize_rows([reference.embed_query(query) for query in queries])
+
+    start = time.perf_counter()
+    candidate_corpus = normalize_rows(candidate.embed_documents(texts))
+    candidate_seconds = time.perf_counter() - start
+    candidate_queries = normalize_rows([candidate.embed_query(query) for query in queries])
+
+    cosine = np.sum(reference_corpus * candidate_corpus, axis=1)
+    expected = top_k_neighbours(reference_queries, reference_corpus, k)
+    return BackendComparison(
+        backend=backend,
+        texts=len(texts),
+        queries=len(queries),
+        k=k,
+        mean_cosine=float(cosine.mean()),
+        min_cosine=float(cosine.min()),
+        recall_rebuilt=recall_at_k(expected, top_k_neighbours(candidate_queries, candidate_corpus, k)),
+        recall_mixed=recall_at_k(expected, top_k_neighbours(candidate_queries, reference_corpus, k)),
+        reference_seconds=reference_seconds,
+        candidate_seconds=candidate_seconds
+    )
+
+
+def sample_corpus(persist_directory: str, sample: int, seed: int = 0) -> List[str]:
+    """Read a random sample of the chunks stored in the vector database."""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=persist_directory)
+    collection = client.get_collection(client.list_collections()[0])
+    ids = collection.get(include=[])["ids"]
+    ids = random.Random(seed).sample(ids, min(sample, len(ids)))
+    return [text for text in collection.get(ids=ids, include=["documents"])["documents"] if text]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Compare an embedding backend with the float32 model on the chunks of the database."""
+    from app.embeddings.huggingface_embeddings import HuggingFaceEmbeddings
+    from app.utils.generation_config import EMBEDDING_BACKENDS, get_model_config
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--backend", default="torch", choices=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--float16-vectors", action="store_true", help="Round the backend's vectors to float16, as EMBEDDING_CACHE_DTYPE=float16 stores them")
+    parser.add_argument("--model", help="HuggingFace embedding model (defaults to the configured one)")
+    parser.add_argument("--persist-directory", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "chroma_db"))
+    parser.add_argument("--sample", type=int, default=500, help="Chunks encoded by both backends")
+    parser.add_argument("--queries", type=int, default=100, help="Queries built from chunk headings")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours compared per query")
+    args = parser.parse_args(argv)
+    if args.backend == "torch" and not args.float16_vectors:
+        parser.error("choose a --backend other than torch, or --float16-vectors")
+
+    model_config = get_model_config()
+    model_name = args.model or (model_config["embedding_model"] if model_config["embedding_provider"] == "huggingface" else "BAAI/bge-large-en-v1.5")
+    texts = sample_corpus(args.persist_directory, args.sample)
+    if not texts:
+        print(f"❌ No chunks found in {args.persist_directory}. Build the database first.")
+        sys.exit(1)
+
+    candidate = HuggingFaceEmbeddings(model_name=model_name, backend=args.backend, use_embedding_cache=False)
+    comparison = compare_backends(
+        texts,
+        default_queries(texts, args.queries),
+        HuggingFaceEmbeddings(model_name=model_name, backend="torch", use_embedding_cache=False),
+        Float16Vectors(candidate) if args.float16_vectors else candidate,
+        f"{args.backend} with float16 vectors" if args.float16_vectors else args.backend,
+        k=args.k
+    )
+    print(comparison.report())
+
+
+if __name__ == "__main__":
+    main()
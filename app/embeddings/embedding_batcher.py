@@ -0,0 +1,197 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Texts encoded together at most (calls of this size or larger bypass the queue)
+DEFAULT_MAX_BATCH_SIZE = 32
+
+# Milliseconds the first call of a batch waits for others to join it
+DEFAULT_MAX_WAIT_MS = 5.0
+
+
+class EmbeddingBatcher:
+    """Micro-batching scheduler for embedding calls from many threads.
+
+    Calls are queued and a worker thread collects them for up to max_wait_ms
+    after the first one arrives, or until max_batch_size texts are waiting. The
+    collected texts are sorted by length, so each padded sub-batch holds texts of
+    similar size, encoded with a single model call and the rows handed back to
+    the callers. Concurrent sessions embedding one query each thus share one
+    batched forward pass instead of queueing for the model one by one.
+
+    A call of max_batch_size texts or more, such as a database build, would fill
+    batches on its own and hold up the queries queued behind it, so it is
+    encoded directly on the calling thread.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], Any], max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS, name: str = "embedding-batcher"):
+        """Initialize the batcher.
+
+        Args:
+            encode: Function encoding a list of texts into a 2D array of vectors
+            max_batch_size: Maximum number of texts per batch
+            max_wait_ms: Maximum milliseconds a call waits for a batch to fill
+            name: Name of the worker thread
+        """
+        self.encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.wait_seconds = 0.0  # Time the first call of each batch waited for the batch to fill
+        self.direct_requests = 0  # Calls encoded on the calling thread, outside any batch
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in a batch shared with concurrent callers.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One vector per text, in the order of the texts
+        """
+        if not texts:
+            return []
+        if len(texts) >= self.max_batch_size:
+            with self._stats_lock:
+                self.direct_requests += 1
+            return np.asarray(self.encode(list(texts))).tolist()
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use."""
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """Collect and encode batches until the process exits."""
+        while True:
+            batch = [self._queue.get()]
+            started = time.monotonic()
+            size = len(batch[0][0])
+            deadline = started + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if size + len(request[0]) > self.max_batch_size:
+                    # Keep the batch within the limit; the call opens the next batch
+                    self._encode_batch(batch, time.monotonic() - started)
+                    batch, size, started = [request], len(request[0]), time.monotonic()
+                    deadline = started + self.max_wait
+                    continue
+                batch.append(request)
+                size += len(request[0])
+            self._encode_batch(batch, time.monotonic() - started)
+
+    def _encode_batch(self, batch: List[Tuple[List[str], Future]], waited: float):
+        """Encode the texts of a batch and resolve the futures of its calls."""
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        try:
+            encoded = np.asarray(self.encode([texts[i] for i in order]))
+            vectors: List[Any] = [None] * len(texts)
+            for row, i in enumerate(order):
+                vectors[i] = encoded[row].tolist()
+        except Exception as e:
+            logger.error(f"Error encoding embedding batch of {len(texts)} texts: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.texts += len(texts)
+            self.wait_seconds += waited
+        logger.debug(f"Encoded embedding batch: {len(batch)} calls, {len(texts)}/{self.max_batch_size} texts, waited {waited * 1000:.1f}ms")
+
+        start = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[start:start + len(request_texts)])
+            start += len(request_texts)
+
+    def stats(self) -> Dict[str, float]:
+        """Batch fill metrics since the batcher was created.
+
+        Returns:
+            Dictionary with the number of batches, calls and texts, the mean texts and
+            calls per batch, the mean fill (texts per batch / max_batch_size), the
+            mean milliseconds spent waiting for batches to fill and the number of
+            large calls encoded outside the batches
+        """
+        with self._stats_lock:
+            batches = max(1, self.batches)
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts": self.texts,
+                "mean_batch_texts": self.texts / batches,
+                "mean_batch_requests": self.requests / batches,
+                "mean_fill": self.texts / batches / self.max_batch_size,
+                "mean_wait_ms": self.wait_seconds / batches * 1000,
+                "direct_requests": self.direct_requests
+            }
+
+
+# Batchers by model, shared by every embeddings object of the process
+_batchers: Dict[Hashable, EmbeddingBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_embedding_batcher(key: Hashable, encode: Callable[[List[str]], Any]) -> Optional[EmbeddingBatcher]:
+    """Get the process-wide batcher of a model.
+
+    Limits are read from EMBEDDING_MICROBATCH_SIZE and EMBEDDING_MICROBATCH_WAIT_MS.
+
+    Args:
+        key: Identity of the model and its encode options
+        encode: Function encoding a list of texts, used when the batcher is created
+
+    Returns:
+        EmbeddingBatcher instance, or None if micro-batching is disabled
+        (EMBEDDING_MICROBATCH_SIZE of 1)
+    """
+    max_batch_size = int(os.getenv("EMBEDDING_MICROBATCH_SIZE", DEFAULT_MAX_BATCH_SIZE))
+    if max_batch_size <= 1:
+        return None
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = EmbeddingBatcher(
+                encode,
+                max_batch_size=max_batch_size,
+                max_wait_ms=float(os.getenv("EMBEDDING_MICROBATCH_WAIT_MS", DEFAULT_MAX_WAIT_MS)),
+                name=f"embedding-batcher-{len(_batchers)}"
+            )
+        return _batchers[key]
+
+
+def get_batcher_stats() -> Dict[str, Dict[str, float]]:
+    """Batch fill metrics of every batcher, by worker thread name."""
+    with _batchers_lock:
+        return {batcher.name: batcher.stats() for batcher in _batchers.values()}
@@ -0,0 +1,339 @@
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Default location survives "Clear DB", which only removes the chroma_db directory
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "embeddings")
+DEFAULT_MAX_MB = 1024
+# float16 halves the file, but a rebuild served from it stores slightly different vectors than a fresh one
+DEFAULT_DTYPE = "float32"
+
+# Number of vector slots allocated when a cache file is first created
+INITIAL_CAPACITY = 1024
+
+# Minimum seconds between index writes while only appending new vectors
+INDEX_FLUSH_INTERVAL = 5.0
+
+# Lock files of the cache directories this process owns, kept open until it exits
+_owned_directories: Dict[str, IO] = {}
+_owned_directories_lock = threading.Lock()
+
+
+def content_hash(text: str) -> str:
+    """Hash text the same way DocumentTraceability derives doc_id."""
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache for one (provider, model) pair.
+
+    Vectors are stored in a memory-mapped array of fixed-size slots, and a JSON
+    index maps content hashes to slots in least-recently-used order. When the
+    array reaches its size limit, the least recently used vectors are evicted and
+    their slots reused.
+
+    Slots are reused without coordination, so a cache directory has a single
+    owner process, held with an exclusive file lock until the process exits. A
+    second process sharing EMBEDDING_CACHE_DIR, e.g. the HTTP API next to the
+    Streamlit app, uses the next free sibling directory (<model>.1, <model>.2, ...)
+    and keeps its vectors there across restarts.
+    """
+
+    def __init__(self, provider: str, model_name: str, cache_dir: Optional[str] = None,
+                 max_bytes: Optional[int] = None, dtype: Optional[str] = None):
+        """Initialize the embedding cache.
+
+        Args:
+            provider: Embedding provider ('openai' or 'huggingface')
+            model_name: Name of the embedding model
+            cache_dir: Root cache directory. Defaults to EMBEDDING_CACHE_DIR or app/cache/embeddings
+            max_bytes: Maximum size of the vector file. Defaults to EMBEDDING_CACHE_MAX_MB
+            dtype: Storage dtype, 'float32' or 'float16'. Defaults to EMBEDDING_CACHE_DTYPE.
+                float16 halves the file but rounds the cached vectors, so a rebuild served
+                from the cache stores slightly different vectors than a fresh build
+        """
+        self.provider = provider
+        self.model_name = model_name
+        cache_dir = cache_dir or os.getenv("EMBEDDING_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv("EMBEDDING_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+
+        # One directory per provider and model, so switching models never mixes vectors
+        safe_name = re.sub(r'[^A-Za-z0-9._-]', "_", f"{provider}__{model_name}")
+        self.directory = self._claim_directory(os.path.join(cache_dir, safe_name))
+        self.vectors_path = os.path.join(self.directory, "vectors.bin")
+        self.index_path = os.path.join(self.directory, "index.json")
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.memmap] = None
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # content hash -> slot, LRU first
+        self._free_slots: List[int] = []
+        self.dimension: Optional[int] = None
+        self.capacity = 0
+        self.dtype = np.dtype(dtype or os.getenv("EMBEDDING_CACHE_DTYPE", DEFAULT_DTYPE))
+        self.hits = 0
+        self.misses = 0
+        self._last_flush = 0.0
+        self._dirty = False
+
+        self._load()
+
+    @staticmethod
+    def _claim_directory(directory: str) -> str:
+        """Lock the first cache directory not owned by another process.
+
+        Args:
+            directory: Preferred cache directory
+
+        Returns:
+            The claimed directory, owned by this process until it exits
+        """
+        if fcntl is None:
+            return directory
+        with _owned_directories_lock:
+            candidate, suffix = directory, 0
+            while candidate not in _owned_directories:
+                os.makedirs(candidate, exist_ok=True)
+                lock_file = open(os.path.join(candidate, "owner.lock"), 'a')
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                    suffix += 1
+                    candidate = f"{directory}.{suffix}"
+                    continue
+                _owned_directories[candidate] = lock_file
+                if suffix:
+                    logger.info(f"Embedding cache {directory} is in use by another process, using {candidate}")
+            return candidate
+
+    def _load(self):
+        """Load the index and map the vector file, discarding a cache that is inconsistent."""
+        if not os.path.exists(self.index_path) or not os.path.exists(self.vectors_path):
+            return
+
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+
+            dimension = index["dimension"]
+            capacity = index["capacity"]
+            dtype = np.dtype(index["dtype"])
+            if dtype != self.dtype:
+                raise ValueError(f"cache stores {dtype.name} vectors, {self.dtype.name} are configured")
+            if os.path.getsize(self.vectors_path) < capacity * dimension * dtype.itemsize:
+                raise ValueError("vector file is smaller than the index expects")
+
+            self.dimension = dimension
+            self.capacity = capacity
+            self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode='r+', shape=(capacity, dimension))
+            self._entries = OrderedDict(index["entries"])
+            used_slots = set(self._entries.values())
+            self._free_slots = [slot for slot in range(capacity - 1, -1, -1) if slot not in used_slots]
+            logger.info(f"Loaded embedding cache {self.directory} with {len(self._entries)} vectors")
+        except Exception as e:
+            logger.warning(f"Discarding unreadable embedding cache {self.directory}: {str(e)}")
+            self._vectors = None
+            self._entries = OrderedDict()
+            self._free_slots = []
+            self.dimension = None
+            self.capacity = 0
+
+    def _max_slots(self) -> int:
+        """Number of vectors that fit into the size limit."""
+        return max(1, self.max_bytes // (self.dimension * self.dtype.itemsize))
+
+    def _grow(self):
+        """Enlarge the vector file, doubling its capacity up to the size limit."""
+        new_capacity = min(self._max_slots(), max(INITIAL_CAPACITY, self.capacity * 2))
+        if new_capacity <= self.capacity:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(new_capacity * self.dimension * self.dtype.itemsize)
+
+        self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode='r+', shape=(new_capacity, self.dimension))
+        self._free_slots = list(range(new_capacity - 1, self.capacity - 1, -1)) + self._free_slots
+        self.capacity = new_capacity
+
+    def _allocate_slot(self) -> Tuple[int, bool]:
+        """Get a free slot, growing the file or evicting the least recently used vector.
+
+        Returns:
+            A tuple of the slot and whether a cached vector was evicted from it
+        """
+        if not self._free_slots:
+            self._grow()
+        if not self._free_slots:
+            _, slot = self._entries.popitem(last=False)
+            return slot, True
+        return self._free_slots.pop(), False
+
+    def get_many(self, hashes: List[str]) -> List[Optional[List[float]]]:
+        """Look up vectors by content hash.
+
+        Args:
+            hashes: Content hashes to look up
+
+        Returns:
+            One vector per hash, or None where the hash is not cached
+        """
+        results = []
+        with self._lock:
+            for key in hashes:
+                slot = self._entries.get(key)
+                if slot is None:
+                    results.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                results.append(self._vectors[slot].astype(np.float32).tolist())
+        return results
+
+    def put_many(self, hashes: List[str], vectors: List[List[float]]):
+        """Store vectors under their content hashes.
+
+        Args:
+            hashes: Content hashes
+            vectors: One vector per hash
+        """
+        if not hashes:
+            return
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = len(vectors[0])
+
+            evicted = False
+            for key, vector in zip(hashes, vectors):
+                if len(vector) != self.dimension:
+                    logger.warning(f"Not caching vector of dimension {len(vector)}, cache holds dimension {self.dimension}")
+                    continue
+                slot = self._entries.get(key)
+                if slot is None:
+                    slot, slot_evicted = self._allocate_slot()
+                    evicted = evicted or slot_evicted
+                self._vectors[slot] = np.asarray(vector, dtype=self.dtype)
+                self._entries[key] = slot
+                self._entries.move_to_end(key)
+            self._dirty = True
+
+            # A reused slot must never be read through the stale on-disk index, so write it right away
+            if evicted or time.time() - self._last_flush >= INDEX_FLUSH_INTERVAL:
+                self._flush()
+
+    def flush(self):
+        """Write pending index changes to disk."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        """Persist the vector file and write the index atomically."""
+        if self._vectors is None or not self._dirty:
+            return
+        self._vectors.flush()
+
+        index = {
+            "provider": self.provider,
+            "model_name": self.model_name,
+            "dimension": self.dimension,
+            "dtype": self.dtype.name,
+            "capacity": self.capacity,
+            "entries": list(self._entries.items())
+        }
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(temp_path, self.index_path)
+        self._dirty = False
+        self._last_flush = time.time()
+
+    def embed_documents(self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """Embed texts, computing only the vectors that are not cached yet.
+
+        Args:
+            texts: Texts to embed
+            embed_fn: Function embedding a list of texts, called once with all cache misses
+
+        Returns:
+            One vector per text, in input order
+        """
+        if not texts:
+            return []
+
+        hashes = [content_hash(text) for text in texts]
+        results = self.get_many(hashes)
+
+        # Embed each missing text once, even if it occurs several times
+        missing: Dict[str, Tuple[str, List[int]]] = {}
+        for i, (key, vector) in enumerate(zip(hashes, results)):
+            if vector is None:
+                missing.setdefault(key, (texts[i], []))[1].append(i)
+
+        self.hits += len(texts) - sum(len(positions) for _, positions in missing.values())
+        self.misses += len(missing)
+
+        if missing:
+            missing_keys = list(missing.keys())
+            new_vectors = embed_fn([missing[key][0] for key in missing_keys])
+            for key, vector in zip(missing_keys, new_vectors):
+                for i in missing[key][1]:
+                    results[i] = vector
+            self.put_many(missing_keys, new_vectors)
+
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} of {len(texts)} texts served from cache")
+        return results
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Caches shared by all embeddings objects of the same provider and model
+_embedding_caches: Dict[Tuple[str, str, str], EmbeddingCache] = {}
+_embedding_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(provider: str, model_name: str) -> EmbeddingCache:
+    """Get the shared embedding cache for a provider and model.
+
+    Args:
+        provider: Embedding provider ('openai' or 'huggingface')
+        model_name: Name of the embedding model
+
+    Returns:
+        EmbeddingCache instance
+    """
+    cache_dir = os.getenv("EMBEDDING_CACHE_DIR") or DEFAULT_CACHE_DIR
+    key = (cache_dir, provider, model_name)
+    with _embedding_caches_lock:
+        if key not in _embedding_caches:
+            _embedding_caches[key] = EmbeddingCache(provider, model_name, cache_dir=cache_dir)
+        return _embedding_caches[key]
+
+
+@atexit.register
+def _flush_embedding_caches():
+    """Write the indexes of all shared caches when the process exits."""
+    for cache in list(_embedding_caches.values()):
+        try:
+            cache.flush()
+        except Exception as e:
+            logger.warning(f"Failed to flush embedding cache {cache.directory}: {str(e)}")
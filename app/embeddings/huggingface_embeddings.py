@@ -1,6 +1,9 @@
 import os
+import json
+import time
 import numpy as np
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from langchain_core.embeddings import Embeddings
 from pydantic import BaseModel, Field, PrivateAttr
 import torch
@@ -8,6 +11,12 @@ from sentence_transformers import SentenceTransformer
 import logging
 from dotenv import load_dotenv
 
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .query_cache import get_query_cache, query_cache_key
+from .model_registry import get_model_registry, model_key
+from .embedding_batcher import EmbeddingBatcher, get_embedding_batcher
+from .embedding_backends import onnx_available, export_quantized_onnx, quantize_torch_model
+
 # Load environment variables
 load_dotenv()
 
@@ -15,6 +24,112 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Texts per forward pass when encoding documents
+DEFAULT_ENCODE_BATCH_SIZE = 32
+
+# Rough estimate when the model has no usable tokenizer
+CHARS_PER_TOKEN = 4
+
+# Calls with at least this many buckets log their progress
+PROGRESS_MIN_BUCKETS = 10
+
+
+@dataclass
+class EncodeStats:
+    """Token counts of one bucketed encode call."""
+    texts: int = 0
+    buckets: int = 0
+    tokens: int = 0  # Tokens the model sees, after truncation
+    padded_tokens: int = 0  # Tokens processed including padding
+    truncated_texts: int = 0  # Texts longer than the model's sequence limit
+    truncated_tokens: int = 0  # Tokens cut off those texts
+    
+    @property
+    def padding_waste(self) -> float:
+        """Share of the processed tokens that are padding."""
+        return 1 - self.tokens / self.padded_tokens if self.padded_tokens else 0.0
+
+
+def token_lengths(model: Any, texts: List[str]) -> List[int]:
+    """Count the tokens of texts with the model's tokenizer, untruncated.
+    
+    Falls back to a character estimate if the model has no usable tokenizer.
+    """
+    tokenizer = getattr(model, "tokenizer", None)
+    if callable(tokenizer):
+        try:
+            input_ids = tokenizer(texts, add_special_tokens=True, truncation=False, verbose=False)["input_ids"]
+            lengths = [len(ids) for ids in input_ids]
+            if len(lengths) == len(texts):
+                return lengths
+        except Exception as e:
+            logger.debug(f"Could not count tokens with the model tokenizer: {str(e)}")
+    return [len(text) // CHARS_PER_TOKEN + 2 for text in texts]
+
+
+def encode_in_length_buckets(model: Any, texts: List[str], batch_size: int = DEFAULT_ENCODE_BATCH_SIZE,
+                             encode_kwargs: Optional[Dict[str, Any]] = None,
+                             progress: Optional[Callable[[int, int], None]] = None) -> Tuple[np.ndarray, EncodeStats]:
+    """Encode texts in batches of similar token length and restore their order.
+    
+    Every batch is padded to its longest text, so encoding short CSV rows
+    together with long ODX chunks wastes most of the computation on padding.
+    Sorting the texts by token length first keeps each batch nearly uniform.
+    Lengths are capped at the model's max_seq_length, beyond which the model
+    truncates; truncated texts are counted so oversized chunks show up in the log.
+    
+    Args:
+        model: SentenceTransformer model
+        texts: Texts to encode
+        batch_size: Texts per forward pass
+        encode_kwargs: Further arguments of model.encode
+        progress: Called with (encoded texts, total texts) after every batch (optional)
+        
+    Returns:
+        Array of vectors in the order of the texts, and the token counts of the call
+    """
+    encode_kwargs = {key: value for key, value in (encode_kwargs or {}).items() if key != "batch_size"}
+    batch_size = max(1, batch_size)
+    lengths = token_lengths(model, texts)
+    max_tokens = getattr(model, "max_seq_length", None)
+    if not isinstance(max_tokens, int):
+        max_tokens = None
+    effective = [min(length, max_tokens) if max_tokens else length for length in lengths]
+    
+    order = sorted(range(len(texts)), key=lambda i: effective[i])
+    buckets = [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+    stats = EncodeStats(texts=len(texts), buckets=len(buckets), tokens=sum(effective))
+    if max_tokens:
+        stats.truncated_texts = sum(1 for length in lengths if length > max_tokens)
+        stats.truncated_tokens = sum(length - max_tokens for length in lengths if length > max_tokens)
+    
+    vectors: Optional[np.ndarray] = None
+    done = 0
+    for bucket in buckets:
+        encoded = np.asarray(model.encode([texts[i] for i in bucket], batch_size=len(bucket), **encode_kwargs))
+        if vectors is None:
+            vectors = np.empty((len(texts), encoded.shape[-1]), dtype=encoded.dtype)
+        vectors[bucket] = encoded
+        stats.padded_tokens += max(effective[i] for i in bucket) * len(bucket)
+        done += len(bucket)
+        if progress:
+            progress(done, len(texts))
+    return (vectors if vectors is not None else np.empty((0, 0), dtype=np.float32)), stats
+
+
+def log_encode_stats(stats: EncodeStats, model_name: str, seconds: float):
+    """Log the padding and truncation of a large encode call."""
+    logger.info(
+        f"Encoded {stats.texts} texts with {model_name} in {stats.buckets} length buckets ({seconds:.1f}s): "
+        f"{stats.tokens} tokens, {stats.padding_waste:.1%} padding"
+    )
+    if stats.truncated_texts:
+        logger.warning(
+            f"{stats.truncated_texts} of {stats.texts} texts exceed the sequence limit of {model_name}; "
+            f"{stats.truncated_tokens} tokens were truncated and are not represented in their vectors"
+        )
+
+
 class HuggingFaceEmbeddings(BaseModel, Embeddings):
     """HuggingFace embeddings wrapper for sentence_transformers models.
     
@@ -27,9 +142,13 @@ class HuggingFaceEmbeddings(BaseModel, Embeddings):
     model_kwargs: Dict[str, Any] = Field(default_factory=dict)
     encode_kwargs: Dict[str, Any] = Field(default_factory=dict)
     cache_folder: Optional[str] = Field(default=None)
+    use_embedding_cache: bool = Field(True)  # Reuse cached document and query vectors
+    backend: str = Field("torch")  # "torch", "onnx", "int8" or "torch-fp16-weights", see EMBEDDING_BACKENDS
+    encode_batch_size: int = Field(default_factory=lambda: int(os.getenv("EMBEDDING_ENCODE_BATCH_SIZE", DEFAULT_ENCODE_BATCH_SIZE)))
     
     # Use PrivateAttr instead of Field for internal attributes
     _model: Optional[SentenceTransformer] = PrivateAttr(default=None)
+    _embedding_cache: Optional[EmbeddingCache] = PrivateAttr(default=None)
     
     def __init__(self, **kwargs):
         """Initialize the HuggingFace embeddings wrapper."""
@@ -57,52 +176,165 @@ class HuggingFaceEmbeddings(BaseModel, Embeddings):
             self.model_kwargs = {}
             
     def _get_model(self) -> SentenceTransformer:
-        """Get or initialize the sentence transformer model."""
+        """Get the sentence transformer model, shared with every instance using the same model."""
         if self._model is None:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            logger.info(f"Using cache folder: {self.cache_folder or 'default'}")
-            
-            # Check if CUDA is available and requested
-            if self.device == "cuda" and not torch.cuda.is_available():
-                logger.warning("CUDA requested but not available. Using CPU instead.")
-                self.device = "cpu"
-                
-            # Load the model with specified parameters
-            try:
-                self._model = SentenceTransformer(
+            self._model = get_model_registry().get(self._model_key(), self._load_model)
+        return self._model
+    
+    def _model_key(self):
+        """Get the key of this model in the process-wide model registry."""
+        # Check if CUDA is available and requested
+        if self.device == "cuda" and not torch.cuda.is_available():
+            logger.warning("CUDA requested but not available. Using CPU instead.")
+            self.device = "cpu"
+        return model_key(self.model_name, self.device, self.cache_folder, self.model_kwargs, self.backend)
+    
+    def _load_model(self) -> SentenceTransformer:
+        """Load the sentence transformer model from disk or the HuggingFace hub on the configured backend."""
+        logger.info(f"Loading embedding model: {self.model_name} ({self.backend} backend)")
+        logger.info(f"Using cache folder: {self.cache_folder or 'default'}")
+        
+        # Load the model with specified parameters
+        try:
+            if self.backend == "int8":
+                model = self._load_int8_model()
+            elif self.backend == "onnx" and onnx_available():
+                model = SentenceTransformer(
                     model_name_or_path=self.model_name,
                     device=self.device,
                     cache_folder=self.cache_folder,
+                    backend="onnx",
                     **self.model_kwargs
                 )
-                logger.info(f"Successfully loaded model {self.model_name}, embedding dimension: {self._model.get_sentence_embedding_dimension()}")
-            except Exception as e:
-                logger.error(f"Error loading embedding model {self.model_name}: {str(e)}")
-                raise
-                
-        return self._model
+            else:
+                if self.backend == "onnx":
+                    logger.warning("ONNX backend requires optimum[onnxruntime]. Using PyTorch instead.")
+                model = SentenceTransformer(
+                    model_name_or_path=self.model_name,
+                    device=self.device,
+                    cache_folder=self.cache_folder,
+                    **self.model_kwargs
+                )
+                if self.backend == "torch-fp16-weights":
+                    # Half-precision matrix multiplies only pay off on GPUs
+                    if self.device == "cpu":
+                        logger.warning("float16 weights give no speedup on CPU and cost accuracy. Consider the int8 backend.")
+                    model = model.half()
+            logger.info(f"Successfully loaded model {self.model_name}, embedding dimension: {model.get_sentence_embedding_dimension()}")
+        except Exception as e:
+            logger.error(f"Error loading embedding model {self.model_name}: {str(e)}")
+            raise
+        return model
+    
+    def _load_int8_model(self) -> SentenceTransformer:
+        """Load the int8 quantized ONNX export of the model, exporting it on first use.
+        
+        Without ONNX Runtime the linear layers of the PyTorch model are quantized instead.
+        """
+        try:
+            directory, file_name = export_quantized_onnx(self.model_name, self.device, self.cache_folder, SentenceTransformer)
+        except ImportError as e:
+            logger.warning(f"Int8 ONNX export unavailable ({str(e)}). Using PyTorch dynamic quantization instead.")
+            model = SentenceTransformer(
+                model_name_or_path=self.model_name,
+                device="cpu",
+                cache_folder=self.cache_folder,
+                **self.model_kwargs
+            )
+            return quantize_torch_model(model)
+        return SentenceTransformer(
+            model_name_or_path=directory,
+            device=self.device,
+            backend="onnx",
+            model_kwargs={"file_name": file_name},
+            **self.model_kwargs
+        )
+    
+    def warmup(self):
+        """Load the model on a background thread if no instance has loaded it yet.
+        
+        Queries made while the model is loading wait for the same load.
+        """
+        if self._model is None:
+            get_model_registry().warmup(self._model_key(), self._load_and_warm_model)
+    
+    def _load_and_warm_model(self) -> SentenceTransformer:
+        """Load the model and run one encode, so lazy initialization is not paid by the first query."""
+        model = self._load_model()
+        model.encode("warmup", **self.encode_kwargs)
+        return model
+    
+    def _get_embedding_cache(self) -> EmbeddingCache:
+        """Get the on-disk cache of document vectors for this model."""
+        if self._embedding_cache is None:
+            # Vectors of other backends differ slightly, so each backend has its own cache
+            cache_name = self.model_name if self.backend == "torch" else f"{self.model_name}@{self.backend}"
+            self._embedding_cache = get_embedding_cache("huggingface", cache_name)
+        return self._embedding_cache
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of documents.
         
+        Vectors of texts embedded before are read from the embedding cache,
+        so only new texts are passed through the model.
+        
         Args:
             texts: List of document texts to embed
             
         Returns:
             List of embeddings, one for each document
         """
+        # Handle empty inputs
+        if not texts:
+            return []
+            
+        # Convert inputs to strings (model requires string input)
+        texts = [str(text) for text in texts]
+        
+        if self.use_embedding_cache:
+            return self._get_embedding_cache().embed_documents(texts, self._encode_documents)
+        return self._encode_documents(texts)
+    
+    def _get_batcher(self) -> Optional[EmbeddingBatcher]:
+        """Get the micro-batcher shared by all instances with this model and encode options."""
+        key = self._model_key()
+        loader = self._load_model
+        return get_embedding_batcher(
+            (key, json.dumps(self.encode_kwargs, sort_keys=True, default=str), self.encode_batch_size),
+            lambda texts: self._encode_bucketed(get_model_registry().get(key, loader), texts)
+        )
+    
+    def _encode_bucketed(self, model: SentenceTransformer, texts: List[str]) -> np.ndarray:
+        """Encode texts in length buckets, logging progress and padding of large calls."""
+        large = len(texts) >= PROGRESS_MIN_BUCKETS * self.encode_batch_size
+        step = max(1, len(texts) // 10)
+        
+        def progress(done: int, total: int):
+            # Roughly every 10% of the texts
+            if done == total or done // step != (done - self.encode_batch_size) // step:
+                logger.info(f"Embedding documents: {done}/{total}")
+        
+        start = time.perf_counter()
+        vectors, stats = encode_in_length_buckets(model, texts, self.encode_batch_size, self.encode_kwargs, progress if large else None)
+        if large or stats.truncated_texts:
+            log_encode_stats(stats, self.model_name, time.perf_counter() - start)
+        return vectors
+    
+    def _encode_documents(self, texts: List[str]) -> List[List[float]]:
+        """Encode document texts with the model, batched with concurrent calls."""
+        batcher = self._get_batcher()
+        if batcher is not None:
+            try:
+                return batcher.embed(texts)
+            except Exception as e:
+                logger.error(f"Error generating document embeddings: {str(e)}")
+                raise
+        
         model = self._get_model()
         
         try:
-            # Handle empty inputs
-            if not texts:
-                return []
-                
-            # Convert inputs to strings (model requires string input)
-            texts = [str(text) for text in texts]
-            
-            # Generate embeddings using the model
-            embeddings = model.encode(texts, **self.encode_kwargs)
+            # Generate embeddings using the model, in batches of similar length
+            embeddings = self._encode_bucketed(model, texts)
             
             # Convert to list of lists (LangChain compatibility)
             return embeddings.tolist()
@@ -113,18 +345,35 @@ class HuggingFaceEmbeddings(BaseModel, Embeddings):
     def embed_query(self, text: str) -> List[float]:
         """Generate embeddings for a single query text.
         
+        Query vectors are kept in the process-wide query cache, so repeated
+        queries from any session are not re-encoded.
+        
         Args:
             text: Query text to embed
             
         Returns:
             Embedding for the query
         """
+        # Convert input to string
+        text = str(text)
+        
+        if self.use_embedding_cache:
+            return get_query_cache().get_or_compute(query_cache_key(self, text), lambda: self._encode_query(text))
+        return self._encode_query(text)
+    
+    def _encode_query(self, text: str) -> List[float]:
+        """Encode a query text with the model, batched with concurrent calls."""
+        batcher = self._get_batcher()
+        if batcher is not None:
+            try:
+                return batcher.embed([text])[0]
+            except Exception as e:
+                logger.error(f"Error generating query embedding: {str(e)}")
+                raise
+        
         model = self._get_model()
         
         try:
-            # Convert input to string
-            text = str(text)
-            
             # Generate embedding
             embedding = model.encode(text, **self.encode_kwargs)
             
@@ -144,13 +393,14 @@ class HuggingFaceEmbeddings(BaseModel, Embeddings):
         return model.get_sentence_embedding_dimension()
 
 
-def get_huggingface_embeddings(model_name="BAAI/bge-large-en-v1.5", device="cpu", cache_folder=None):
+def get_huggingface_embeddings(model_name="BAAI/bge-large-en-v1.5", device="cpu", cache_folder=None, backend="torch"):
     """Convenience function to get HuggingFace embeddings instance.
     
     Args:
         model_name: Name of the HuggingFace model to use
         device: Device to run the model on ("cpu" or "cuda")
         cache_folder: Optional folder to cache models
+        backend: Inference backend ("torch", "onnx", "int8" or "torch-fp16-weights")
         
     Returns:
         HuggingFaceEmbeddings instance
@@ -162,5 +412,6 @@ def get_huggingface_embeddings(model_name="BAAI/bge-large-en-v1.5", device="cpu"
     return HuggingFaceEmbeddings(
         model_name=model_name,
         device=device,
-        cache_folder=cache_folder
+        cache_folder=cache_folder,
+        backend=backend
     ) 
\ No newline at end of file
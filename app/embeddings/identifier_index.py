@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+from langchain_core.documents.base import Document
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Metadata fields emitted by the document processors that hold names and identifiers
+IDENTIFIER_METADATA_FIELDS = [
+    "signal_name", "signal_names", "signal_source", "signal_sources", "signal_targets",
+    "method_name", "method_names", "service_name", "data_object_name",
+    "normalized_name", "normalized_service_name", "name_keywords", "service_keywords", "service_aliases",
+    "content_section", "tara_phase", "threat_id", "risk_id", "asset_name",
+    "failure_mode_id", "failure_mode_name", "mode_id", "mode_name",
+    "system_name", "document_id",
+]
+
+# Candidate tokens: letters, digits and inner separators such as "B1A2F-11", "0x22" or "Vehicle_Speed"
+TOKEN_PATTERN = re.compile(r'[A-Za-z0-9_]+(?:[-.][A-Za-z0-9_]+)*')
+
+
+def is_identifier(token: str) -> bool:
+    """Check whether a token looks like an identifier rather than a plain word.
+
+    Identifiers contain a digit or an underscore, or are camelCase/PascalCase
+    with at least two capitals (e.g. "ReadDataByIdentifier", "P0420", "0x22").
+    """
+    if len(token) < 3:
+        return False
+    if any(char.isdigit() for char in token) or "_" in token:
+        return True
+    return sum(1 for char in token if char.isupper()) >= 2 and any(char.islower() for char in token)
+
+
+def extract_identifiers(text: str) -> List[str]:
+    """Extract identifier tokens from text, normalized to lowercase."""
+    return [token.lower() for token in TOKEN_PATTERN.findall(text) if is_identifier(token)]
+
+
+class IdentifierIndex:
+    """Inverted index from identifiers to chunk IDs.
+
+    Keys are the identifier metadata values of each chunk (whole values and the
+    identifier tokens inside them) and identifier tokens from the chunk text.
+    Lookups are dictionary accesses, so exact matches need no embedding call.
+    The Streamlit app shares one index between sessions, so updates and lookups
+    hold the same lock.
+    """
+
+    def __init__(self, index_path: str):
+        """Initialize the identifier index.
+
+        Args:
+            index_path: JSON file the index is persisted to
+        """
+        self.index_path = index_path
+        self._postings: Optional[Dict[str, Set[str]]] = None  # identifier -> chunk IDs, loaded lazily
+        self._lock = threading.RLock()
+
+    @property
+    def postings(self) -> Dict[str, Set[str]]:
+        """The postings, loaded from disk on first access."""
+        if self._postings is None:
+            with self._lock:
+                if self._postings is None:
+                    self._postings = self._load()
+        return self._postings
+
+    def _load(self) -> Dict[str, Set[str]]:
+        """Load the postings from disk, or start empty."""
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            return {key: set(ids) for key, ids in data.get("postings", {}).items()}
+        except Exception as e:
+            logger.warning(f"Error loading identifier index {self.index_path}: {str(e)}. Starting empty.")
+            return {}
+
+    def save(self):
+        """Persist the index if it was loaded or modified."""
+        if self._postings is None:
+            return
+        with self._lock:
+            data = {"postings": {key: sorted(ids) for key, ids in self._postings.items()}}
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.index_path)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._postings = {}
+
+    @staticmethod
+    def keys_for_document(document: Document) -> Set[str]:
+        """Collect the index keys of a chunk from its metadata and text."""
+        keys = set()
+        metadata = document.metadata or {}
+        for field in IDENTIFIER_METADATA_FIELDS:
+            value = metadata.get(field)
+            if value is None or value == "":
+                continue
+            value = str(value)
+            # Lists are stored as their string form, so only index whole values that are single names
+            if not value.startswith("["):
+                keys.add(value.strip().lower())
+            keys.update(extract_identifiers(value))
+        keys.update(extract_identifiers(document.page_content))
+        return keys
+
+    def add_documents(self, ids: List[str], documents: List[Document]):
+        """Index chunks under their vector IDs.
+
+        Args:
+            ids: Vector IDs, one per document
+            documents: Chunks to index
+        """
+        keys_per_chunk = [self.keys_for_document(document) for document in documents]
+        with self._lock:
+            postings = self.postings
+            for chunk_id, keys in zip(ids, keys_per_chunk):
+                for key in keys:
+                    postings.setdefault(key, set()).add(chunk_id)
+
+    def remove_ids(self, ids: Iterable[str]):
+        """Remove chunks from the index."""
+        ids = set(ids)
+        if not ids:
+            return
+        with self._lock:
+            postings = self.postings
+            for key in list(postings.keys()):
+                postings[key] -= ids
+                if not postings[key]:
+                    del postings[key]
+
+    def lookup(self, terms: List[str], limit: Optional[int] = None) -> List[str]:
+        """Find chunks matching any of the terms exactly (case-insensitive).
+
+        Args:
+            terms: Identifiers or names to look up
+            limit: Maximum number of chunk IDs to return
+
+        Returns:
+            Chunk IDs ordered by the number of matched terms, most first
+        """
+        match_counts = Counter()
+        with self._lock:
+            postings = self.postings
+            for key in {term.strip().lower() for term in terms if term}:
+                match_counts.update(postings.get(key, ()))
+        # Sort by count, then ID, so results are deterministic
+        ranked = sorted(match_counts.items(), key=lambda item: (-item[1], item[0]))
+        return [chunk_id for chunk_id, _ in ranked[:limit]]
+
+    def __len__(self) -> int:
+        return len(self.postings)
@@ -0,0 +1,111 @@
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def model_key(model_name: str, device: str, cache_folder: Optional[str] = None,
+              model_kwargs: Optional[Dict[str, Any]] = None, backend: str = "torch") -> Tuple[str, str, Optional[str], str, str]:
+    """Build the registry key of a model from everything that changes the loaded weights."""
+    return model_name, device, cache_folder, json.dumps(model_kwargs or {}, sort_keys=True, default=str), backend
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models.
+
+    Every model is loaded once per process and shared by all Streamlit sessions,
+    the HTTP API and worker threads. Inference with a loaded sentence-transformers
+    model only reads its weights, so concurrent encode calls need no lock. Each
+    key has its own load lock: concurrent requests for the same model wait for a
+    single load, while different models load independently.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._models: Dict[Hashable, Any] = {}
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        self._warmups: Dict[Hashable, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Get a model, loading it on first use.
+
+        Args:
+            key: Identity of the model, see model_key
+            loader: Function loading the model, called at most once per key while it succeeds
+
+        Returns:
+            The shared model instance
+        """
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = loader()
+                self._models[key] = model
+        return model
+
+    def warmup(self, key: Hashable, loader: Callable[[], Any]) -> Optional[threading.Thread]:
+        """Load a model on a background thread.
+
+        A query arriving during the warmup waits for the same load instead of
+        starting another one.
+
+        Args:
+            key: Identity of the model, see model_key
+            loader: Function loading the model
+
+        Returns:
+            The warmup thread, or None if the model is already loaded or loading
+        """
+        with self._lock:
+            if key in self._models or (key in self._warmups and self._warmups[key].is_alive()):
+                return None
+            thread = threading.Thread(target=self._warm, args=(key, loader), name=f"warmup-{key[0] if isinstance(key, tuple) else key}", daemon=True)
+            self._warmups[key] = thread
+        thread.start()
+        return thread
+
+    def _warm(self, key: Hashable, loader: Callable[[], Any]):
+        """Load a model, logging instead of raising; the first query retries a failed load."""
+        try:
+            self.get(key, loader)
+        except Exception as e:
+            logger.warning(f"Background loading of model {key} failed: {str(e)}")
+
+    def is_loaded(self, key: Hashable) -> bool:
+        """Check whether a model is loaded."""
+        return key in self._models
+
+    def clear(self):
+        """Drop all loaded models, e.g. after the embedding model was changed."""
+        with self._lock:
+            self._models.clear()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+
+# Global model registry instance
+_model_registry: Optional[ModelRegistry] = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get the process-wide model registry.
+
+    Returns:
+        ModelRegistry instance
+    """
+    global _model_registry
+    with _model_registry_lock:
+        if _model_registry is None:
+            _model_registry = ModelRegistry()
+        return _model_registry
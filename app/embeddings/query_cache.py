@@ -0,0 +1,122 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 3600.0
+
+
+class QueryEmbeddingCache:
+    """In-memory LRU cache of query vectors with a time-to-live.
+
+    A single instance is shared by all Streamlit sessions of the process, so a
+    query embedded in one session is a cache hit in every other session.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        """Initialize the query cache.
+
+        Args:
+            max_entries: Maximum number of cached vectors
+            ttl_seconds: Seconds after which a cached vector expires
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple[float, ...]]]" = OrderedDict()  # key -> (expiry, vector)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[List[float]]:
+        """Get a cached vector, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expiry, vector = entry
+            if expiry < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(vector)
+
+    def put(self, key: Hashable, vector: List[float]):
+        """Cache a vector, evicting the least recently used entries beyond the size limit."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, tuple(vector))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], List[float]]) -> List[float]:
+        """Get a cached vector, computing and caching it on a miss.
+
+        The lock is not held while computing, so a slow embedding call never
+        blocks lookups of other queries.
+        """
+        vector = self.get(key)
+        if vector is None:
+            vector = compute()
+            self.put(key, vector)
+        return vector
+
+    def clear(self):
+        """Remove all cached vectors."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Global query cache instance
+_query_cache: Optional[QueryEmbeddingCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """Get the process-wide query embedding cache.
+
+    Size and TTL are read from QUERY_CACHE_MAX_ENTRIES and QUERY_CACHE_TTL_SECONDS.
+
+    Returns:
+        QueryEmbeddingCache instance
+    """
+    global _query_cache
+    with _query_cache_lock:
+        if _query_cache is None:
+            _query_cache = QueryEmbeddingCache(
+                max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+            )
+        return _query_cache
+
+
+def query_cache_key(embeddings: Any, text: str) -> Tuple[str, Optional[str], Optional[str], str]:
+    """Build the cache key of a query for an embeddings object."""
+    model_name = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None)
+    return (type(embeddings).__name__, model_name, getattr(embeddings, "backend", None), text)
+
+
+def embed_query_cached(embeddings: Embeddings, text: str) -> List[float]:
+    """Embed a query through the shared query cache.
+
+    Args:
+        embeddings: Embeddings object used to compute the vector on a miss
+        text: Query text
+
+    Returns:
+        Query vector
+    """
+    return get_query_cache().get_or_compute(query_cache_key(embeddings, text), lambda: embeddings.embed_query(text))
@@ -0,0 +1,288 @@
+import os
+import json
+import uuid
+import logging
+import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Compact once the journal holds this many records and more records than there are documents
+MIN_COMPACTION_RECORDS = 10000
+
+# Secondary indexes and the document field each one is keyed on
+INDEX_FIELDS = {
+    "sources": ("source_path", "unknown_source"),
+    "domains": ("domain", "unknown_domain"),
+    "file_types": ("file_type", "unknown_type"),
+}
+
+
+class TrackingStore:
+    """Document tracking index persisted as a snapshot plus an append-only journal.
+
+    Tracking a document is an O(1) update of the in-memory maps; save() only
+    appends the changes made since the previous save to the journal, and the
+    journal is folded into a new snapshot once it outgrows the snapshot. The
+    secondary indexes (source, domain and file type to document IDs) are
+    insertion-ordered sets rebuilt from the documents on load, so they are not
+    stored at all. Files are read on first access.
+
+    The store can be read like the former tracking index dictionary, e.g.
+    store["documents"][doc_id] or store["domains"].keys().
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: Optional[str] = None):
+        """Initialize the tracking store.
+
+        Args:
+            snapshot_path: JSON snapshot of the store (the former tracking_index.json)
+            journal_path: JSONL journal of changes since the snapshot. Defaults to the
+                snapshot path with a .journal extension
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{os.path.splitext(snapshot_path)[0]}.journal"
+        self._loaded = False
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[str, Dict[str, None]]] = {name: {} for name in INDEX_FIELDS}
+        self._fingerprints: Dict[str, Dict[str, Any]] = {}
+        self._created = datetime.datetime.now().isoformat()
+        self._snapshot_id: Optional[str] = None  # Journals of other snapshots are stale
+        self._pending: List[Dict[str, Any]] = []  # Journal records not yet written
+        self._journal_records = 0
+        self._saved_fingerprints: Optional[str] = None  # Fingerprints as last written
+        self._needs_snapshot = False
+
+    def _ensure_loaded(self):
+        """Load the snapshot and replay the journal on first use."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r') as f:
+                    data = json.load(f)
+                # Older snapshots also hold the secondary indexes as lists, they are rebuilt instead
+                for doc_id, info in data.get("documents", {}).items():
+                    self._add(doc_id, info)
+                self._fingerprints = data.get("source_fingerprints", {})
+                self._created = data.get("created", self._created)
+                self._snapshot_id = data.get("snapshot_id")
+            except Exception as e:
+                print(f"WARNING: Error loading tracking index: {str(e)}. Creating new index.")
+                self._clear()
+                self._needs_snapshot = True
+        else:
+            self._needs_snapshot = True
+
+        if os.path.exists(self.journal_path) and not self._needs_snapshot:
+            with open(self.journal_path, 'r') as f:
+                header = self._read_header(f.readline())
+                if header != self._snapshot_id:
+                    # Left behind by a compaction that stopped before removing it
+                    logger.warning(f"Ignoring tracking journal {self.journal_path} of an older snapshot")
+                    f.seek(0, os.SEEK_END)
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError) as e:
+                        # A crash during an append can leave a partial last record
+                        logger.warning(f"Skipping unreadable tracking journal record: {str(e)}")
+                        continue
+                    self._journal_records += 1
+        self._saved_fingerprints = json.dumps(self._fingerprints, sort_keys=True)
+
+    @staticmethod
+    def _read_header(line: str) -> Optional[str]:
+        """Get the snapshot ID from the first line of a journal."""
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        return record.get("snapshot") if record.get("op") == "header" else None
+
+    def _clear(self):
+        """Empty the in-memory maps."""
+        self._documents = {}
+        self._indexes = {name: {} for name in INDEX_FIELDS}
+        self._fingerprints = {}
+
+    def _add(self, doc_id: str, info: Dict[str, Any]):
+        """Add a document to the maps, replacing an earlier entry with the same ID."""
+        if doc_id in self._documents:
+            self._discard(doc_id)
+        self._documents[doc_id] = info
+        for name, (field_name, default) in INDEX_FIELDS.items():
+            self._indexes[name].setdefault(info.get(field_name) or default, {})[doc_id] = None
+
+    def _discard(self, doc_id: str) -> bool:
+        """Remove a document from the maps. Returns False if it was not tracked."""
+        info = self._documents.pop(doc_id, None)
+        if info is None:
+            return False
+        for name, (field_name, default) in INDEX_FIELDS.items():
+            value = info.get(field_name) or default
+            doc_ids = self._indexes[name].get(value)
+            if doc_ids is not None:
+                doc_ids.pop(doc_id, None)
+                if not doc_ids:
+                    del self._indexes[name][value]
+        return True
+
+    def _apply(self, record: Dict[str, Any]):
+        """Apply a journal record to the maps."""
+        op = record["op"]
+        if op == "track":
+            self._add(record["id"], record["info"])
+        elif op == "remove":
+            for doc_id in record["ids"]:
+                self._discard(doc_id)
+        elif op == "fingerprints":
+            self._fingerprints = record["data"]
+        else:
+            raise KeyError(f"unknown operation {op}")
+
+    def track(self, doc_id: str, info: Dict[str, Any]):
+        """Track a document, replacing an earlier entry with the same ID.
+
+        Args:
+            doc_id: Document ID
+            info: Traceability info of the document (DocumentTraceability.to_dict())
+        """
+        self._ensure_loaded()
+        self._add(doc_id, info)
+        self._pending.append({"op": "track", "id": doc_id, "info": info})
+
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        """Stop tracking documents.
+
+        Args:
+            doc_ids: IDs of the documents to remove
+
+        Returns:
+            Number of documents that were tracked
+        """
+        self._ensure_loaded()
+        removed = [doc_id for doc_id in doc_ids if self._discard(doc_id)]
+        if removed:
+            self._pending.append({"op": "remove", "ids": removed})
+        return len(removed)
+
+    def remove_source(self, source: str) -> Set[str]:
+        """Stop tracking all documents of a source.
+
+        Args:
+            source: Source path the documents were tracked under
+
+        Returns:
+            IDs of the removed documents
+        """
+        self._ensure_loaded()
+        doc_ids = set(self._indexes["sources"].get(source, {}))
+        self.remove(doc_ids)
+        return doc_ids
+
+    def reset(self):
+        """Forget all documents and fingerprints, e.g. before a full rebuild."""
+        self._ensure_loaded()
+        self._clear()
+        self._pending = []
+        # The journal is obsolete, write a fresh snapshot on the next save instead
+        self._needs_snapshot = True
+
+    def ids_for(self, index: str, value: str) -> List[str]:
+        """Get the IDs of the documents with a value in a secondary index.
+
+        Args:
+            index: "sources", "domains" or "file_types"
+            value: Source path, domain or file type
+
+        Returns:
+            Document IDs in the order they were tracked
+        """
+        self._ensure_loaded()
+        return list(self._indexes[index].get(value, {}))
+
+    def save(self):
+        """Persist the changes made since the last save.
+
+        Changes are appended to the journal; a new snapshot is written instead when
+        the journal has grown larger than the snapshot or after a reset.
+        """
+        if not self._loaded:
+            return
+        fingerprints = json.dumps(self._fingerprints, sort_keys=True)
+        if fingerprints != self._saved_fingerprints:
+            self._pending.append({"op": "fingerprints", "data": self._fingerprints})
+
+        records = len(self._pending) + self._journal_records
+        if self._needs_snapshot or (records >= MIN_COMPACTION_RECORDS and records > len(self._documents)):
+            self.compact()
+        elif self._pending:
+            with open(self.journal_path, 'a') as f:
+                if f.tell() == 0:
+                    f.write(json.dumps({"op": "header", "snapshot": self._snapshot_id}) + "\n")
+                f.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in self._pending))
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_records += len(self._pending)
+            self._pending = []
+        self._saved_fingerprints = fingerprints
+
+    def compact(self):
+        """Write the current state as a new snapshot and truncate the journal."""
+        self._ensure_loaded()
+        self._snapshot_id = uuid.uuid4().hex
+        data = {
+            "snapshot_id": self._snapshot_id,
+            "documents": self._documents,
+            "source_fingerprints": self._fingerprints,
+            "total_documents": len(self._documents),
+            "created": self._created
+        }
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, self.snapshot_path)
+        # The snapshot already contains the journal; if removing it fails, its header marks it stale
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_records = 0
+        self._pending = []
+        self._needs_snapshot = False
+
+    def __getitem__(self, key: str) -> Any:
+        self._ensure_loaded()
+        if key == "documents":
+            return self._documents
+        if key in self._indexes:
+            return self._indexes[key]
+        if key == "source_fingerprints":
+            return self._fingerprints
+        if key == "total_documents":
+            return len(self._documents)
+        if key == "created":
+            return self._created
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dictionary-style access that returns default for unknown keys."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        """Dictionary-style access; every key of the store always exists."""
+        return self[key]
+
+    def keys(self) -> List[str]:
+        return ["documents", *INDEX_FIELDS, "source_fingerprints", "total_documents", "created"]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._documents)
@@ -50,7 +50,7 @@ from openai import OpenAI
 import pandas as pd
 
 # Import HuggingFace client
-from app.api.huggingface_client import get_huggingface_client
+from app.api.huggingface_client import get_huggingface_client, iter_stream_text
 
 # Import model configuration utility
 from app.utils.model_config import get_model_config, EMBEDDING_PROVIDERS, LLM_PROVIDERS
@@ -70,17 +70,27 @@ load_dotenv()
 
 # --- Database Management ---
 from app.embeddings import DBManager
+from app.embeddings.db_manager import get_index_generation
+from app.embeddings.identifier_index import IdentifierIndex
+from app.embeddings.bm25_index import BM25Index
 
 # --- Document Processing ---
 from app.document_processors import PDFProcessor, JSONProcessor, MarkdownProcessor, ExcelProcessor, CSVProcessor, ARXMLProcessor, ODXProcessor, FMEAProcessor, SignalDatabaseProcessor, TARAProcessor
+from app.document_processors.ingestion import collect_source_files, process_file, IngestionEngine
+from app.embeddings.document_tracking import SourceFingerprint
 from langchain_core.documents.base import Document
 
 # --- Retrieval Functions ---
 from app.retrieval.query_preprocessing import preprocess_query
-from app.retrieval.hybrid_search import hybrid_search
+from app.retrieval.engine import RetrievalEngine
+from app.retrieval.reranker import get_reranker, warmup_reranker
+from app.utils.event_sink import StreamlitSink
+from app.retrieval.answer_cache import get_answer_cache, chunk_id
+from app.embeddings.query_cache import embed_query_cached
+from app.utils.prompt_builder import build_context, build_prompt, NO_DATABASE_SOURCE_INFO, NO_CONTEXT_TEXT
 
 # --- API Functions ---
-from app.api.document_tracing import document_tracing_ui, format_trace_info
+from app.api.document_tracing import document_tracing_ui
 
 # --- Initialize Session State Variables from Configuration ---
 # Get model configuration from environment or config file
@@ -321,6 +331,10 @@ with col3:
             st.error(f"❌ Error clearing database: {str(e)}")
             st.info("Please try again or manually delete the app/chroma_db directory")
     
+    # Sync DB button - re-indexes only added, changed and removed files
+    if st.button("🔄 Sync DB", key="sync_db_button", help="Re-index only documents that were added, changed or removed"):
+        st.session_state["sync_db_requested"] = True
+    
     # Model Config button
     if st.button("⚙️ Model Config", key="model_config_button", help="Configure models"):
         st.session_state["show_model_settings"] = not st.session_state.get("show_model_settings", False)
@@ -337,156 +351,136 @@ if "show_utils" not in st.session_state:
 st.markdown("""<br>""", unsafe_allow_html=True)  # Smaller spacer
 
 # --- Handle Database Initialization ---
-def get_processor_for_file(file_path, domain):
-    """Determine the appropriate processor for a given file.
-    
-    This function examines the file path and optionally file content
-    to determine which document processor to use.
+def process_source_files(source_files, all_documents, source_fingerprints=None):
+    """Process files in parallel worker processes and collect their documents.
     
     Args:
-        file_path: Path to the file
-        domain: The semantic domain of the file
+        source_files: List of (file_path, domain) tuples to process
+        all_documents: List to append processed documents to, in input file order
+        source_fingerprints: Optional list to append a fingerprint of every processed file to
         
     Returns:
-        An instance of the appropriate processor
+        Number of files processed
     """
-    file_name = os.path.basename(file_path).lower()
-    file_ext = os.path.splitext(file_name)[1].lower()
-    
-    # First, handle by extension
-    if file_ext == '.pdf':
-        return PDFProcessor(domain=domain)
-    elif file_ext in ['.xlsx', '.xls']:
-        return ExcelProcessor(domain=domain)
-    elif file_ext == '.csv':
-        return CSVProcessor(domain=domain)
-    elif file_ext in ['.md', '.markdown']:
-        return MarkdownProcessor(domain=domain)
-    elif file_ext == '.arxml' and 'ARXMLProcessor' in globals():
-        return ARXMLProcessor(domain=domain)
-    elif file_ext in ['.odx', '.odx-c'] and 'ODXProcessor' in globals():
-        return ODXProcessor(domain=domain)
-    elif file_ext == '.json':
-        # Check for signal database files
-        is_signal_db = ('signal' in file_name and 'database' in file_name)
-        
-        # For JSON files, check content patterns to determine type
-        # Use standardized naming pattern for FMEA files (starts with 'fmea-')
-        is_fmea = file_name.startswith('fmea-')
+    files_processed = 0
+    
+    for result in ingestion_engine.process_files(source_files):
+        file = os.path.basename(result.file_path)
+        if result.error:
+            print(f"DEBUG: Error processing file {file}: {result.error}")
+            print(f"DEBUG: Stack trace:\n{result.error_traceback}")
+            st.error(f"❌ Error processing file {file}: {result.error}")
+            continue
         
-        # Check for TARA files (starts with 'tara-')
-        is_tara = file_name.startswith('tara-')
+        if result.documents is not None:
+            files_processed += 1
+            all_documents.extend(result.documents)
         
-        # If not clear from filename, peek at content
-        if not (is_fmea or is_signal_db or is_tara):
+        # Record every file, so files without a processor are not re-examined on sync
+        if source_fingerprints is not None:
             try:
-                with open(file_path, 'r') as f:
-                    content_peek = f.read(1000)  # Read just the beginning to check
-                    
-                    # Check for signal database pattern
-                    if '"database_info"' in content_peek and '"signals"' in content_peek:
-                        is_signal_db = True
-                        print(f"DEBUG: Detected signal database by content inspection")
-                    elif any(marker in content_peek for marker in ['"fmeaType"', '"failureModes"', '"systemInformation"', '"severity"', '"occurrence"']):
-                        is_fmea = True
-                        print(f"DEBUG: Detected FMEA document by content inspection")
-                    elif any(marker in content_peek for marker in ['"taraPhase"', '"damageScenarios"', '"threatScenarios"', '"riskAssessment"']):
-                        is_tara = True
-                        print(f"DEBUG: Detected TARA document by content inspection")
-            except Exception as peek_error:
-                print(f"DEBUG: Error peeking into file content for {file_name}: {str(peek_error)}")
-        
-        # Use the appropriate processor based on content type
-        if is_signal_db:
-            print(f"DEBUG: Using SignalDatabaseProcessor for {file_name}")
-            return SignalDatabaseProcessor(domain=domain)
-        elif is_fmea:
-            print(f"DEBUG: Using FMEAProcessor for {file_name}")
-            return FMEAProcessor(domain=domain)
-        elif is_tara:
-            print(f"DEBUG: Using TARAProcessor for {file_name}")
-            return TARAProcessor(domain=domain)
-        else:
-            return JSONProcessor(domain=domain)
-            
-    # Default to None if no appropriate processor found
-    return None
+                fingerprint = SourceFingerprint.from_file(result.file_path, domain=result.domain)
+                source_fingerprints.append(fingerprint.attach_documents(result.documents or []))
+            except OSError as e:
+                print(f"DEBUG: Could not fingerprint file {file}: {str(e)}")
+    
+    return files_processed
 
-def process_directory(directory_path, domain, all_documents):
+def process_directory(directory_path, domain, all_documents, source_fingerprints=None):
     """Process all files in a directory and its subdirectories.
     
     Args:
         directory_path: Path to the directory to process
         domain: The semantic domain of the directory
         all_documents: List to append processed documents to
+        source_fingerprints: Optional list to append a fingerprint of every processed file to
         
     Returns:
         Number of files processed
     """
-    files_processed = 0
-    
     # Walk the directory tree once
-    for root, _, files in os.walk(directory_path):
-        for file in files:
-            # Skip backup files
-            if file.endswith('.bak'):
-                continue
-                
-            file_path = os.path.join(root, file)
-            try:
-                # Get the appropriate processor for this file
-                processor = get_processor_for_file(file_path, domain)
-                
-                if processor:
-                    print(f"DEBUG: Processing file: {file}")
-                    documents = processor.process_file(file_path)
-                    files_processed += 1
-                    
-                    # Validate returned documents
-                    valid_docs = []
-                    for i, doc in enumerate(documents):
-                        if doc is None:
-                            print(f"WARNING: Processor for {file} returned None document at index {i}")
-                            continue
-                            
-                        # Convert string documents to Document objects
-                        if isinstance(doc, str):
-                            print(f"WARNING: Processor for {file} returned string instead of Document at index {i}, converting")
-                            doc = Document(page_content=doc, metadata={"source": file, "domain": domain})
-                        
-                        # Ensure metadata exists
-                        if not hasattr(doc, 'metadata') or doc.metadata is None:
-                            print(f"WARNING: Document from {file} at index {i} has no metadata, adding default metadata")
-                            doc.metadata = {"source": file, "domain": domain}
-                        
-                        # Ensure source and domain are set in metadata
-                        if "source" not in doc.metadata:
-                            doc.metadata["source"] = file
-                        if "domain" not in doc.metadata:
-                            doc.metadata["domain"] = domain
-                            
-                        valid_docs.append(doc)
-                    
-                    print(f"DEBUG: File {file} produced {len(documents)} documents, {len(valid_docs)} valid after checking")
-                    all_documents.extend(valid_docs)
-            except Exception as e:
-                print(f"DEBUG: Error processing file {file}: {str(e)}")
-                import traceback
-                print(f"DEBUG: Stack trace:\n{traceback.format_exc()}")
-                st.error(f"❌ Error processing file {file}: {str(e)}")
+    source_files = collect_source_files(directory_path, domain)
+    return process_source_files(source_files, all_documents, source_fingerprints)
+
+def sync_database(db_manager, data_dir, domains):
+    """Incrementally re-index the files that were added, changed or removed since the last build.
     
-    return files_processed
+    Args:
+        db_manager: DBManager with a loaded database
+        data_dir: Path to the data directory
+        domains: Semantic domains (subdirectories of data_dir) to sync
+        
+    Returns:
+        SourceChangeSet describing the files that were synced
+    """
+    source_files = []
+    for domain in domains:
+        domain_dir = os.path.join(data_dir, domain)
+        if os.path.exists(domain_dir):
+            source_files.extend(collect_source_files(domain_dir, domain))
+    
+    changes = db_manager.detect_source_changes(source_files)
+    if not changes.has_changes:
+        return changes
+    
+    documents_by_path = {}
+    to_process = list(changes.to_process)
+    results = ingestion_engine.process_files([(fingerprint.path, fingerprint.domain) for fingerprint in to_process])
+    for fingerprint, result in zip(to_process, results):
+        if result.error:
+            print(f"DEBUG: Error processing file {fingerprint.path}: {result.error}")
+            st.error(f"❌ Error processing file {os.path.basename(fingerprint.path)}: {result.error}")
+            # Leave the file out of this sync so it is retried next time
+            if fingerprint in changes.added:
+                changes.added.remove(fingerprint)
+            else:
+                changes.changed.remove(fingerprint)
+            continue
+        documents_by_path[fingerprint.path] = result.documents or []
+    
+    db_manager.sync_sources(changes, documents_by_path)
+    return changes
+
+@st.cache_resource(max_entries=1)
+def load_lexical_indexes(tracking_directory, index_generation):
+    """Get the lexical indexes shared by all sessions and reruns.
+    
+    Streamlit reruns the script on every interaction, and a new DBManager would
+    parse both index files again. The cached indexes are kept in sync by the
+    DBManager that updates them; index_generation changes when the database
+    was rebuilt or synced, also by another process, and loads them anew.
+    
+    Args:
+        tracking_directory: Directory holding the index files
+        index_generation: Result of get_index_generation()
+        
+    Returns:
+        Tuple of (IdentifierIndex, BM25Index)
+    """
+    return (
+        IdentifierIndex(os.path.join(tracking_directory, "identifier_index.json")),
+        BM25Index(os.path.join(tracking_directory, "bm25_index.json"))
+    )
 
 # --- Model Configuration - Keep hidden to maintain existing UI ---
 # The model configuration is now handled by the utils/model_config.py module
 
 # --- Main App Initialization ---
+# Process pool for document ingestion (worker count from INGESTION_WORKERS)
+ingestion_engine = IngestionEngine(process_file=process_file)
+
 # Initialize DBManager with the selected embedding provider and model
 db_manager = DBManager(
     persist_directory=os.path.join(app_dir, "chroma_db"),
     embedding_provider=st.session_state["embedding_provider"],
-    embedding_model=st.session_state["embedding_model"]
+    embedding_model=st.session_state["embedding_model"],
+    sink=StreamlitSink()
 )
+# Use the lexical indexes cached across reruns instead of the ones DBManager would load again
+db_manager.identifier_index, db_manager.bm25_index = load_lexical_indexes(db_manager.tracking_directory, get_index_generation())
+# Load the embedding and reranker models in the background; they are shared by all sessions
+db_manager.warmup_embeddings()
+warmup_reranker()
 
 # Create sidebar for model settings if enabled
 if st.session_state["show_model_settings"]:
@@ -672,35 +666,48 @@ if st.session_state["show_model_settings"]:
 vector_db = db_manager.initialize_db()
 st.session_state["vector_db"] = vector_db
 
+# Get the path to the data directory
+data_dir = os.path.join(project_root, "data")
+
+# Define the semantic domains
+domains = ["requirements", "catalogues", "standards"]
+
+# Incrementally sync an existing database when requested
+if vector_db and st.session_state.pop("sync_db_requested", False):
+    with st.spinner("🔄 Syncing database with changed documents..."):
+        changes = sync_database(db_manager, data_dir, domains)
+        if changes.has_changes:
+            st.info(f"📄 Synced {len(changes.added)} added, {len(changes.changed)} changed and {len(changes.removed)} removed files ({len(changes.unchanged)} unchanged).")
+        else:
+            st.info("📄 Database is already up to date with the document directories.")
+
 # If no database exists, process documents and create one
 if not vector_db:
     # Show loading message
     with st.spinner("🔍 Initializing database and processing documents..."):
-        # Get the path to the data directory
-        data_dir = os.path.join(project_root, "data")
-        
-        # Define the semantic domains
-        domains = ["requirements", "catalogues", "standards"]
-        
         # Initialize the document list
         all_documents = []
+        source_fingerprints = []
         files_processed = 0
         
-        # Process documents from each domain
+        # Collect files from each domain, so a single worker pool processes all of them
+        source_files = []
         for domain in domains:
             domain_dir = os.path.join(data_dir, domain)
             if not os.path.exists(domain_dir):
                 st.warning(f"Domain directory not found: {domain}")
                 continue
             
-            # Process all files in domain directory with a single traversal
-            domain_files_processed = process_directory(domain_dir, domain, all_documents)
-            files_processed += domain_files_processed
-            print(f"DEBUG: Processed {domain_files_processed} files in {domain} domain")
+            # Collect all files in domain directory with a single traversal
+            domain_files = collect_source_files(domain_dir, domain)
+            source_files.extend(domain_files)
+            print(f"DEBUG: Found {len(domain_files)} files in {domain} domain")
+        
+        files_processed = process_source_files(source_files, all_documents, source_fingerprints)
         
         # Create the database from documents
         if all_documents:
-            vector_db, unique_doc_count = db_manager.create_db_from_documents(all_documents)
+            vector_db, unique_doc_count = db_manager.create_db_from_documents(all_documents, source_fingerprints)
             # Update session state after creation
             st.session_state["vector_db"] = vector_db
             st.info(f"📄 Processed {len(all_documents)} text chunks from {files_processed} files across {len([d for d in domains if os.path.exists(os.path.join(data_dir, d))])} domains, storing {unique_doc_count} unique documents.")
@@ -730,121 +737,63 @@ if user_question:
     with st.chat_message("user"):
         st.markdown(f"<div class='user-message'>{user_question}</div>", unsafe_allow_html=True)
 
+    llm_provider = st.session_state.get("llm_provider")
+    llm_model = st.session_state.get("llm_model")
+    
+    # Answers are cached per question, retrieved chunks, model and generation parameters
+    answer_cache = get_answer_cache()
+    answer_model = f"{llm_provider}:{llm_model}"
+    answer_params = get_generation_params(llm_provider)
+    answer_chunk_ids = []
+    cached_answer = None
+    query_vector = None
+
     # --- Processing Animation ---
     with st.spinner("Thinking... 🤔"):
         if st.session_state.get("vector_db"):
             # Process query for better retrieval
             query = preprocess_query(user_question)
             
-            # Perform hybrid search to improve retrieval accuracy
-            retrieved_docs = hybrid_search(st.session_state["vector_db"], query, user_question, k=20)
+            # A near-duplicate of an earlier question skips retrieval and the LLM call.
+            # The retrieval engine embeds the same text, so the vector comes from the query cache there.
+            if answer_cache.similarity_threshold is not None:
+                query_vector = embed_query_cached(st.session_state["vector_db"].embeddings, query)
+                cached_answer = answer_cache.find_similar(user_question, query_vector, answer_model, answer_params)
             
-            if retrieved_docs:
-                # Format source information based on document type and trace info
-                source_info_dict = {}  # Use a dictionary to deduplicate sources
-                for i, doc in enumerate(retrieved_docs[:5]):
-                    # Use trace info if available
-                    trace_info = doc.metadata.get("trace_info", None)
-                    if trace_info:
-                        source_info = format_trace_info(trace_info)
-                        source_info_dict[source_info] = f"- {source_info}"
-                    else:
-                        # Fall back to standard metadata
-                        source_type = doc.metadata.get('source_type', 'Unknown')
-                        source = doc.metadata.get('source', 'Unknown')
-                        
-                        if source_type == 'pdf':
-                            page = doc.metadata.get('page', 'N/A')
-                            source_info_dict[f"{source}:{page}"] = f"- {source}, Page: {page}"
-                        else:
-                            # For JSON, add relevant metadata details
-                            service_id = doc.metadata.get('service_id', '')
-                            service_name = doc.metadata.get('service_name', '')
-                            instance_id = doc.metadata.get('instance_id', '')
-                            
-                            # Create a unique key for each source combination
-                            if instance_id:
-                                key = f"{source}:{service_name}:{service_id}:{instance_id}"
-                                source_info_dict[key] = f"- {source} (Service: {service_name}, Service ID: {service_id}, Instance ID: {instance_id})"
-                            elif service_id or service_name:
-                                key = f"{source}:{service_name}:{service_id}"
-                                source_info_dict[key] = f"- {source} (Service: {service_name}, ID: {service_id})"
-                            else:
-                                source_info_dict[source] = f"- {source}"
-                
-                # Convert the deduplicated dictionary values to a list
-                source_info = "\n".join(source_info_dict.values())
-                
-                # Use content from top 5 retrieved documents for more comprehensive context
-                context_text = "\n\n---\n\n".join([doc.page_content for doc in retrieved_docs[:5]])
-            else:
-                source_info = "❌ **No relevant information found.**"
-                context_text = "No context available."
+            retrieved_docs = []
+            if cached_answer is None:
+                # Perform hybrid search to improve retrieval accuracy
+                retrieval_engine = RetrievalEngine(st.session_state["vector_db"], db_manager.identifier_index, db_manager.bm25_index, reranker=get_reranker())
+                retrieved_docs = retrieval_engine.search(user_question, k=20, domain_filter=st.session_state.get("domain_filter"), processed_query=query, sink=StreamlitSink())
+            
+            # Pack the most relevant chunks into the context token budget of the model
+            context_text, source_info, context_docs = build_context(retrieved_docs, model=llm_model)
+            
+            # The same question over the same chunks was answered before
+            answer_chunk_ids = [chunk_id(doc) for doc in context_docs]
+            if cached_answer is None and answer_chunk_ids:
+                cached_answer = answer_cache.get(user_question, answer_chunk_ids, answer_model, answer_params)
         else:
-            source_info = "❌ **No document database available.**"
-            context_text = "No context available."
+            source_info = NO_DATABASE_SOURCE_INFO
+            context_text = NO_CONTEXT_TEXT
 
         # --- Construct AI Prompt ---
-        prompt = f"""
-        ## SYSTEM ROLE
-        You are an AI assistant specializing in automotive development documentation. Provide concise, accurate answers based only on the given context. Your expertise covers interface communications, system architectures, protocols, and automotive standards.
-
-        ## USER QUESTION
-        "{user_question}"
-
-        ## CONTEXT
-        '''
-        {context_text}
-        '''
-
-        ## INSTRUCTIONS
-        - Focus on technical details present in the provided context
-        - Pay special attention to exact IDs, especially Instance IDs, Service IDs, and other numerical identifiers
-        - Do not try to infer values - only respond with information explicitly stated in the context
-        - Be precise with numerical values - never substitute one ID for another
-        - If asked about an ID or value and it's explicitly shown in the context, quote the exact value
-        - If the information isn't present in the context, clearly state so
-        - Explain automotive terms and concepts when relevant
-        - For JSON interface definitions, precisely report attribute values as they appear in the data
-        - When dealing with file transfer or management services, pay special attention to the service name, ID and methods
-        - For technical terms like "FileTransferAgent", ensure you connect it to natural language terms like "file transfer service"
-        - Make direct connections between technical identifiers and their functional descriptions
-        - When asked about a specific service, verify you're using information from the correct service definition
-        - ALWAYS include source attribution in your response exactly as formatted in the Sources section
-        - Copy the entire Sources section with all bullet points intact, without modification
-
-        ## RESPONSE FORMAT
-           
-           **Answer:** [Concise response]
-
-        📌 **Key Insights:**
-        - Bullet point 1
-        - Bullet point 2
-        - Bullet point 3
-
-        📖 **Sources:**
-        Important: List each source once, with no duplications. Copy and preserve the exact format below:
-
-        Example:
-        - example.pdf, Page: 42
-        - example.json (Service: ExampleService, ID: SVC-123)
-
-        {source_info}
-        """
+        prompt = build_prompt(user_question, context_text, source_info)
 
         # --- Call LLM API based on provider selection ---
         try:
-            llm_provider = st.session_state.get("llm_provider")
-            llm_model = st.session_state.get("llm_model")
-            
             # Flag to track if streaming was used
             used_streaming = False
             
             # Prepare common message format for both providers
             messages = [{'role': 'user', 'content': prompt}]
             
+            if cached_answer is not None:
+                answer = cached_answer
+                logger.info(f"Answered from the answer cache for model: {llm_model}")
+            
             # Get API keys based on provider
-            if llm_provider == "openai":
+            elif llm_provider == "openai":
                 # Get OpenAI API key from environment
                 api_key = os.getenv("OPENAI_API_KEY")
                 
@@ -920,19 +869,44 @@ if user_question:
                     # Call HuggingFace API
                     logger.info(f"Calling HuggingFace API with model: {llm_model}")
                     client = get_huggingface_client(api_key=api_key)
-                    completion = client.chat.create(
-                        messages=messages,
-                        **model_params,
-                        timeout=120
-                    )
-                    answer = completion.choices[0].message.content
-                    logger.info(f"Successfully received response from HuggingFace model: {llm_model}")
+                    
+                    # Check if streaming is enabled
+                    is_streaming = get_generation_params("huggingface").get('stream', False)
+                    
+                    # Use streaming if enabled
+                    if is_streaming:
+                        logger.info(f"Streaming is enabled for HuggingFace model: {llm_model}")
+                        with st.chat_message("assistant"):
+                            stream = client.chat.create(
+                                messages=messages,
+                                **model_params,
+                                stream=True,
+                                timeout=120
+                            )
+                            answer = st.write_stream(iter_stream_text(stream))
+                        
+                        # Add message to history (already displayed by write_stream)
+                        st.session_state["messages"].append({"role": "assistant", "content": answer})
+                        # Mark that streaming was used
+                        used_streaming = True
+                    else:
+                        completion = client.chat.create(
+                            messages=messages,
+                            **model_params,
+                            timeout=120
+                        )
+                        answer = completion.choices[0].message.content
+                        logger.info(f"Successfully received response from HuggingFace model: {llm_model}")
             else:
                 answer = f"❌ Unsupported LLM provider: {llm_provider}"
                 
         except Exception as e:
             answer = f"❌ Error generating response: {str(e)}"
 
+        # Cache successful answers over retrieved context
+        if cached_answer is None and answer_chunk_ids and isinstance(answer, str) and not answer.startswith("❌"):
+            answer_cache.put(user_question, answer_chunk_ids, answer_model, answer_params, answer, query_vector=query_vector)
+
     # --- Display AI Response ---
     # Only display if we're not using streaming (streaming already displays the content)
     if not used_streaming:
@@ -1,8 +1,13 @@
 from app.retrieval.hybrid_search import hybrid_search
+from app.retrieval.engine import RetrievalEngine
+from app.retrieval.reranker import CrossEncoderReranker, get_reranker, warmup_reranker
 from app.retrieval.query_preprocessing import preprocess_query, extract_technical_terms
 
 __all__ = [
     'hybrid_search',
+    'RetrievalEngine',
+    'CrossEncoderReranker',
+    'get_reranker',
     'preprocess_query',
     'extract_technical_terms'
 ]
@@ -0,0 +1,201 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents.base import Document
+
+from app.embeddings.db_manager import get_index_generation
+from app.embeddings.identifier_index import extract_identifiers
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 86400.0
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a question for cache lookups: lowercase, single spaces, no trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!. ").lower()
+
+
+def chunk_id(document: Document) -> str:
+    """Get the ID of a retrieved chunk: its chunk ID, or the content hash for vectors stored without one."""
+    return document.metadata.get("doc_id") or hashlib.md5(document.page_content.encode()).hexdigest()
+
+
+def answer_cache_key(query: str, chunk_ids: List[str], model: str, params: Dict[str, Any]) -> str:
+    """Build the cache key of an answer.
+
+    Args:
+        query: User question
+        chunk_ids: IDs of the chunks the answer is based on
+        model: LLM model ID (including the provider, if models may clash)
+        params: Generation parameters
+
+    Returns:
+        Hex digest identifying the answer
+    """
+    key_data = [normalize_query(query), sorted(chunk_ids), model, params]
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """In-memory LRU cache of LLM answers, shared by all sessions of the process.
+
+    Exact lookups are keyed on the normalized question, the retrieved chunks,
+    the model and the generation parameters, so they save the LLM call.
+    Near-duplicate lookups compare query vectors before retrieval and save the
+    whole round-trip; they are only made when a similarity threshold is set
+    and only match questions naming the same identifiers.
+
+    Every entry records the index generation it was created under, and entries
+    from an older generation are never returned, so rebuilding the database or
+    adding, changing or removing sources invalidates all cached answers, also
+    when another process (startup.py, the HTTP API) made the change.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 similarity_threshold: Optional[float] = None):
+        """Initialize the answer cache.
+
+        Args:
+            max_entries: Maximum number of cached answers
+            ttl_seconds: Seconds after which a cached answer expires
+            similarity_threshold: Minimum cosine similarity of query vectors for a
+                near-duplicate match, or None to disable near-duplicate lookups
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_duplicate_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _is_valid(entry: Dict[str, Any], generation: Any) -> bool:
+        """Check that an entry has not expired and was created under the current index generation."""
+        return entry["expiry"] >= time.monotonic() and entry["generation"] == generation
+
+    def get(self, query: str, chunk_ids: List[str], model: str, params: Dict[str, Any]) -> Optional[str]:
+        """Get the cached answer for a question over the given chunks, or None."""
+        key = answer_cache_key(query, chunk_ids, model, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._is_valid(entry, get_index_generation()):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["answer"]
+
+    def find_similar(self, query: str, query_vector: Optional[List[float]], model: str,
+                     params: Dict[str, Any]) -> Optional[str]:
+        """Find the answer of a near-duplicate question asked with the same model and parameters.
+
+        Args:
+            query: User question
+            query_vector: Embedding of the question
+            model: LLM model ID
+            params: Generation parameters
+
+        Returns:
+            The answer of the most similar cached question above the threshold, or None
+        """
+        if self.similarity_threshold is None or query_vector is None:
+            return None
+        vector = self._unit_vector(query_vector)
+        identifiers = frozenset(extract_identifiers(query))
+        settings_key = answer_cache_key("", [], model, params)
+
+        best_key, best_similarity = None, self.similarity_threshold
+        generation = get_index_generation()
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry["vector"] is None or entry["settings_key"] != settings_key \
+                        or entry["identifiers"] != identifiers or not self._is_valid(entry, generation):
+                    continue
+                if entry["vector"].shape != vector.shape:
+                    continue
+                similarity = float(np.dot(entry["vector"], vector))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            self.near_duplicate_hits += 1
+            return self._entries[best_key]["answer"]
+
+    def put(self, query: str, chunk_ids: List[str], model: str, params: Dict[str, Any], answer: str,
+            query_vector: Optional[List[float]] = None):
+        """Cache an answer, evicting the least recently used entries beyond the size limit.
+
+        Args:
+            query: User question
+            chunk_ids: IDs of the chunks the answer is based on
+            model: LLM model ID
+            params: Generation parameters
+            answer: Generated answer
+            query_vector: Embedding of the question, enabling near-duplicate lookups
+        """
+        key = answer_cache_key(query, chunk_ids, model, params)
+        entry = {
+            "answer": answer,
+            "expiry": time.monotonic() + self.ttl_seconds,
+            "generation": get_index_generation(),
+            "settings_key": answer_cache_key("", [], model, params),
+            "identifiers": frozenset(extract_identifiers(query)),
+            "vector": self._unit_vector(query_vector) if query_vector is not None else None,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _unit_vector(vector: List[float]) -> np.ndarray:
+        """Normalize a vector so dot products are cosine similarities."""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def clear(self):
+        """Remove all cached answers."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Global answer cache instance
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get the process-wide answer cache.
+
+    Size and TTL are read from ANSWER_CACHE_MAX_ENTRIES and ANSWER_CACHE_TTL_SECONDS.
+    Near-duplicate lookups are enabled by setting ANSWER_CACHE_SIMILARITY (e.g. 0.97).
+
+    Returns:
+        AnswerCache instance
+    """
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            similarity = os.getenv("ANSWER_CACHE_SIMILARITY")
+            _answer_cache = AnswerCache(
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                similarity_threshold=float(similarity) if similarity else None
+            )
+        return _answer_cache
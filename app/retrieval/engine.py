@@ -0,0 +1,72 @@
+from typing import Any, List, Optional
+
+from langchain_core.documents.base import Document
+
+from app.retrieval.query_preprocessing import preprocess_query
+from app.retrieval.hybrid_search import hybrid_search
+from app.retrieval.reranker import CrossEncoderReranker
+from app.utils.event_sink import EventSink, LoggingSink
+
+
+class RetrievalEngine:
+    """Retrieval over a loaded database, independent of the UI.
+
+    All inputs (domain filter, error and metrics sink) are explicit arguments
+    and the engine keeps no per-query state, so one instance can serve
+    concurrent searches from worker threads, the HTTP API or the Streamlit app.
+    """
+
+    def __init__(self, db: Any, identifier_index: Any = None, bm25_index: Any = None,
+                 sink: Optional[EventSink] = None, reranker: Optional[CrossEncoderReranker] = None):
+        """Initialize the retrieval engine.
+
+        Args:
+            db: Chroma database
+            identifier_index: Optional IdentifierIndex for exact identifier matches
+            bm25_index: Optional BM25Index for keyword search
+            sink: Default receiver of errors and metrics (defaults to logging them)
+            reranker: Optional cross-encoder that reorders a wider candidate pool
+        """
+        self.db = db
+        self.identifier_index = identifier_index
+        self.bm25_index = bm25_index
+        self.sink = sink or LoggingSink()
+        self.reranker = reranker
+
+    @classmethod
+    def from_db_manager(cls, db_manager: Any, sink: Optional[EventSink] = None,
+                        reranker: Optional[CrossEncoderReranker] = None) -> "RetrievalEngine":
+        """Create an engine over the database and lexical indexes of a DBManager."""
+        return cls(db_manager.get_db(), db_manager.identifier_index, db_manager.bm25_index, sink=sink, reranker=reranker)
+
+    def search(self, query: str, k: int = 20, domain_filter: Optional[str] = None,
+               processed_query: Optional[str] = None, sink: Optional[EventSink] = None) -> List[Document]:
+        """Retrieve the chunks most relevant to a query.
+
+        Args:
+            query: Query as asked by the user
+            k: Number of results to return
+            domain_filter: Optional domain to restrict results to
+            processed_query: Query already run through preprocess_query (optional)
+            sink: Receiver of errors and metrics for this search (defaults to the engine's sink)
+
+        Returns:
+            Retrieved documents, best first
+        """
+        if not self.db:
+            return []
+        if processed_query is None:
+            processed_query = preprocess_query(query)
+        sink = sink or self.sink
+        # With a reranker, retrieve a wider pool and let the cross-encoder pick the best k
+        candidates = max(k, self.reranker.candidates) if self.reranker else k
+        documents = hybrid_search(
+            self.db, processed_query, query, k=candidates,
+            identifier_index=self.identifier_index,
+            bm25_index=self.bm25_index,
+            domain_filter=domain_filter,
+            sink=sink
+        )
+        if self.reranker:
+            documents = self.reranker.rerank(query, documents, top_n=k, sink=sink)
+        return documents
@@ -1,265 +1,448 @@
-import streamlit as st
-import traceback
 import os
-import json
-import datetime
 import time
-from pathlib import Path
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from app.retrieval.query_preprocessing import extract_technical_terms
+from app.retrieval.retrieval_logger import get_retrieval_logger
+from app.embeddings.query_cache import embed_query_cached
+from app.embeddings.identifier_index import extract_identifiers
+from app.utils.event_sink import LoggingSink
+from langchain_core.documents.base import Document
 
-def create_log_directory():
-    """Create a timestamped log directory for the current retrieval session."""
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    log_dir = Path("app/embeddings/log/runtime") / timestamp
-    os.makedirs(log_dir, exist_ok=True)
-    return log_dir
+# Metadata fields matched exactly against technical terms, and whether the term is lowercased first
+METADATA_TERM_FIELDS = {
+    "data_object_name": False,
+    "service_name": False,
+    "normalized_name": True,
+    "normalized_service_name": True,
+    "name_keywords": True,
+    "service_keywords": True,
+    "service_aliases": True,
+    "method_names": False,
+}
 
-def log_documents(log_dir, filename, documents, metadata=None):
-    """Save document contents and metadata to a JSON file."""
-    doc_data = []
-    
-    for i, doc in enumerate(documents):
-        # Extract document data
-        doc_info = {
-            "index": i,
-            "content": doc.page_content,
-            "metadata": doc.metadata
-        }
-        doc_data.append(doc_info)
-    
-    # Add any additional metadata
-    log_data = {
-        "timestamp": datetime.datetime.now().isoformat(),
-        "count": len(documents),
-        "metadata": metadata or {},
-        "documents": doc_data
-    }
+# Rank offset for reciprocal-rank fusion (the value from the original RRF paper)
+RRF_K = 60
+
+# Results fetched per term/field condition by the combined metadata search, and the overall cap
+METADATA_RESULTS_PER_CONDITION = 5
+MAX_METADATA_RESULTS = 100
+
+# Threads shared by the retrieval stages of all queries, and the deadline of each stage in seconds
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "8"))
+RETRIEVAL_STAGE_TIMEOUT = float(os.getenv("RETRIEVAL_STAGE_TIMEOUT", "10"))
+
+_stage_executor = None
+_stage_executor_lock = threading.Lock()
+
+def build_metadata_filter(technical_terms, domain_filter=None):
+    """Build one Chroma filter matching any technical term in any metadata field.
     
-    # Save to file
-    log_path = log_dir / f"{filename}.json"
-    with open(log_path, "w") as f:
-        json.dump(log_data, f, indent=2)
+    Args:
+        technical_terms: Terms extracted from the query
+        domain_filter: Optional domain to restrict results to
+        
+    Returns:
+        A tuple of the filter dict and the list of (field, value) conditions it contains
+    """
+    conditions = []
+    for term in technical_terms:
+        for field, lowercase in METADATA_TERM_FIELDS.items():
+            condition = (field, term.lower() if lowercase else term)
+            if condition not in conditions:
+                conditions.append(condition)
+    
+    clauses = [{field: {"$in": [value]}} for field, value in conditions]
+    metadata_filter = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+    
+    # Chroma requires an explicit $and to combine operators with another field
+    if domain_filter:
+        metadata_filter = {"$and": [metadata_filter, {"domain": domain_filter}]}
     
-    print(f"DEBUG: Logged {len(documents)} documents to {log_path}")
-    return log_path
+    return metadata_filter, conditions
 
-def hybrid_search(db, processed_query, original_query, k=20):
-    """Perform hybrid search combining keyword filtering with vector similarity.
+def count_metadata_matches(doc, conditions):
+    """Count the (field, value) conditions a document's metadata satisfies."""
+    return sum(1 for field, value in conditions if doc.metadata.get(field) == value)
+
+def lookup_identifier_matches(db, identifier_index, terms, domain_filter=None, limit=20):
+    """Fetch chunks whose identifiers exactly match the given terms.
     
-    This approach improves retrieval by:
-    1. First attempting metadata filtering for exact matches
-    2. Falling back to semantic search if metadata filtering returns too few results
-    3. Combining results for a more comprehensive set of relevant documents
-    4. Applying domain filtering if specified in the session state
+    Args:
+        db: Chroma database
+        identifier_index: IdentifierIndex built at ingest time
+        terms: Identifiers and names to look up
+        domain_filter: Optional domain to restrict results to
+        limit: Maximum number of chunks to return
+        
+    Returns:
+        Matching documents, those matching the most terms first
     """
-    # Create log directory for this retrieval session
-    log_dir = create_log_directory()
-    
-    # Log the initial query
-    query_log = {
-        "original_query": original_query,
-        "processed_query": processed_query,
-        "k": k,
-        "start_time": time.time()
+    ids = identifier_index.lookup(terms, limit=limit)
+    return fetch_documents_by_id(db, ids, domain_filter)
+
+def fetch_documents_by_id(db, ids, domain_filter=None):
+    """Fetch stored chunks by vector ID, keeping the order of the IDs.
+    
+    Args:
+        db: Chroma database
+        ids: Vector IDs to fetch
+        domain_filter: Optional domain to restrict results to
+        
+    Returns:
+        Documents for the IDs that exist (and match the domain)
+    """
+    if not ids:
+        return []
+    
+    where = {"domain": domain_filter} if domain_filter else None
+    stored = db.get(ids=ids, where=where, include=["documents", "metadatas"])
+    
+    # Chroma does not preserve the order of the requested IDs
+    documents_by_id = {
+        chunk_id: Document(page_content=content, metadata=metadata or {})
+        for chunk_id, content, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
     }
+    return [documents_by_id[chunk_id] for chunk_id in ids if chunk_id in documents_by_id]
+
+def reciprocal_rank_fusion(ranked_lists, rrf_k=RRF_K):
+    """Fuse ranked document lists with reciprocal-rank fusion.
     
-    with open(log_dir / "query.json", "w") as f:
-        json.dump(query_log, f, indent=2)
+    Each document scores sum(1 / (rrf_k + rank)) over the lists it appears in,
+    so documents ranked well by several retrievers rise to the top. Documents
+    are identified by their content; ties keep the order of first appearance.
     
-    print(f"DEBUG: hybrid_search started. Original query: '{original_query}', Processed query: '{processed_query}', k={k}")
-    metadata_results = []
+    Args:
+        ranked_lists: Lists of documents, each ordered best first
+        rrf_k: Rank offset dampening the weight of top ranks
+        
+    Returns:
+        Fused list of unique documents, best first
+    """
+    scores = {}
+    documents = {}
+    for ranked in ranked_lists:
+        seen_in_list = set()
+        for rank, doc in enumerate(ranked, start=1):
+            content_hash = hash(doc.page_content)
+            # A document counts once per list, at its best rank
+            if content_hash in seen_in_list:
+                continue
+            seen_in_list.add(content_hash)
+            documents.setdefault(content_hash, doc)
+            scores[content_hash] = scores.get(content_hash, 0.0) + 1.0 / (rrf_k + rank)
     
-    # Check if domain filtering is enabled
-    domain_filter = st.session_state.get("domain_filter")
-    print(f"DEBUG: Domain filter: {domain_filter}")
+    # sorted() is stable and dicts keep insertion order, so ties stay in order of first appearance
+    ranked_hashes = sorted(scores, key=lambda content_hash: -scores[content_hash])
+    return [documents[content_hash] for content_hash in ranked_hashes]
+
+def hybrid_search(db, processed_query, original_query, k=20, identifier_index=None, bm25_index=None, domain_filter=None, sink=None):
+    """Perform hybrid search combining lexical retrieval with vector similarity.
     
-    # Step 1: Try metadata filtering for exact matches with technical terms
-    print("DEBUG: Starting metadata filtering step.")
-    technical_terms = extract_technical_terms(original_query)
-    print(f"DEBUG: Extracted technical terms: {technical_terms}")
+    This approach improves retrieval by:
+    1. Resolving exact identifier matches from the identifier index (if given)
+    2. Attempting metadata filtering for exact matches
+    3. Always performing a semantic search
+    4. Scoring chunks with BM25 keyword search (if a BM25 index is given)
+    5. Fusing all result lists with reciprocal-rank fusion
+    6. Applying domain filtering if a domain is given
     
-    # Log technical terms
-    with open(log_dir / "technical_terms.json", "w") as f:
-        json.dump({
-            "terms": technical_terms,
-            "query": original_query
-        }, f, indent=2)
+    The function does not touch Streamlit, so it can run on any thread. Errors
+    and metrics are reported to the sink, which defaults to logging them.
+    """
+    sink = sink or LoggingSink()
+    # Start the log record of this retrieval; it is written by a background thread
+    log_session = get_retrieval_logger().session(
+        original_query=original_query,
+        processed_query=processed_query,
+        k=k,
+        domain_filter=domain_filter
+    )
+    start_time = time.time()
+    try:
+        results = _hybrid_search(db, processed_query, original_query, k, identifier_index, bm25_index, domain_filter, sink, log_session)
+        sink.metric("retrieval_results", len(results), k=k)
+        return results
+    finally:
+        sink.metric("retrieval_seconds", time.time() - start_time, k=k)
+        log_session.close()
+
+def run_stages(stages, timeout=None):
+    """Run independent retrieval stages concurrently on the shared stage pool.
     
-    if technical_terms:
-        for term in technical_terms:
-            print(f"DEBUG: Processing technical term: '{term}'")
-            metadata_filters = {
-                "data_object_name": {"$in": [term]},
-                "service_name": {"$in": [term]},
-                "normalized_name": {"$in": [term.lower()]},
-                "normalized_service_name": {"$in": [term.lower()]},
-                "name_keywords": {"$in": [term.lower()]},
-                "service_keywords": {"$in": [term.lower()]},
-                "service_aliases": {"$in": [term.lower()]},
-                "method_names": {"$in": [term]},
-            }
-            
-            for field, filter_value in metadata_filters.items():
-                current_filter = {field: filter_value}
-                print(f"DEBUG: Attempting filter: {current_filter}")
-                try:
-                    # Combine with domain filter if enabled
-                    if domain_filter:
-                        final_filter_dict = {
-                            **current_filter, 
-                            "domain": domain_filter
-                        }
-                    else:
-                        final_filter_dict = current_filter
-                        
-                    print(f"DEBUG: Calling similarity_search with filter: {final_filter_dict}")
-                    filtered_docs = db.similarity_search(
-                        processed_query,
-                        k=5, 
-                        filter=final_filter_dict
-                    )
-                    print(f"DEBUG: Filtered search returned {len(filtered_docs)} docs for filter {current_filter}")
-                    
-                    # Log the results from this specific filter
-                    if filtered_docs:
-                        filter_log_name = f"metadata_filter_{term}_{field}"
-                        log_documents(log_dir, filter_log_name, filtered_docs, {
-                            "filter": str(current_filter),
-                            "term": term,
-                            "field": field
-                        })
-                    
-                    metadata_results.extend(filtered_docs)
-                except Exception as filter_err:
-                    # If a particular filter fails, log and continue
-                    print(f"DEBUG: Error during metadata filtered search for {current_filter}: {str(filter_err)}")
-                    print(f"DEBUG: Traceback: {traceback.format_exc()}")
-                    
-                    # Log the error
-                    with open(log_dir / f"error_metadata_filter_{term}_{field}.json", "w") as f:
-                        json.dump({
-                            "error": str(filter_err),
-                            "traceback": traceback.format_exc(),
-                            "filter": str(current_filter)
-                        }, f, indent=2)
-                    
-                    continue
-    else:
-        print("DEBUG: No technical terms found for metadata filtering.")
+    Every stage gets the same deadline, measured from dispatch, so a slow
+    stage cannot hold up the answer for longer than the timeout. A stage that
+    misses its deadline keeps running in the background, but its result is
+    discarded. With RETRIEVAL_WORKERS set to 1 the stages run one after another.
     
-    print(f"DEBUG: Metadata filtering step finished. Found {len(metadata_results)} potential results.")
+    Args:
+        stages: Dictionary mapping stage names to functions without arguments
+        timeout: Seconds each stage may take. Defaults to RETRIEVAL_STAGE_TIMEOUT
+        
+    Returns:
+        Dictionary mapping stage names to (result, error, seconds) tuples. The
+        result is None if the stage failed or timed out
+    """
+    timeout = RETRIEVAL_STAGE_TIMEOUT if timeout is None else timeout
     
-    # Log all metadata results
-    if metadata_results:
-        log_documents(log_dir, "metadata_results_all", metadata_results, {
-            "count": len(metadata_results),
-            "technical_terms": technical_terms
+    def timed(stage):
+        start_time = time.monotonic()
+        result = stage()
+        return result, time.monotonic() - start_time
+    
+    outcomes = {}
+    if RETRIEVAL_WORKERS <= 1:
+        for name, stage in stages.items():
+            start_time = time.monotonic()
+            try:
+                result, seconds = timed(stage)
+                outcomes[name] = (result, None, seconds)
+            except Exception as e:
+                outcomes[name] = (None, e, time.monotonic() - start_time)
+        return outcomes
+    
+    executor = _get_stage_executor()
+    dispatch_time = time.monotonic()
+    futures = {name: executor.submit(timed, stage) for name, stage in stages.items()}
+    deadline = dispatch_time + timeout
+    for name, future in futures.items():
+        try:
+            result, seconds = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            outcomes[name] = (result, None, seconds)
+        except FutureTimeoutError:
+            # Drop the stage if it has not started yet; a running stage cannot be interrupted
+            future.cancel()
+            outcomes[name] = (None, TimeoutError(f"{name} stage exceeded its {timeout:.1f}s deadline"), time.monotonic() - dispatch_time)
+        except Exception as e:
+            outcomes[name] = (None, e, time.monotonic() - dispatch_time)
+    return outcomes
+
+def _get_stage_executor():
+    """Get the thread pool shared by the retrieval stages of all queries."""
+    global _stage_executor
+    with _stage_executor_lock:
+        if _stage_executor is None:
+            _stage_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval-stage")
+        return _stage_executor
+
+def _identifier_stage(db, identifier_index, identifier_terms, domain_filter, k, log_session):
+    """Look up exact identifier matches; they need no vector search."""
+    identifier_results = lookup_identifier_matches(db, identifier_index, identifier_terms, domain_filter, limit=k)
+    print(f"DEBUG: Identifier index returned {len(identifier_results)} exact matches for {len(identifier_terms)} terms")
+    if identifier_results:
+        log_session.log_documents("identifier_matches", identifier_results, {
+            "terms": identifier_terms
         })
+    return identifier_results
 
-    # Step 2: Always perform a standard semantic search as well
-    print("DEBUG: Starting standard semantic search step.")
-    standard_results = []
+def _metadata_stage(db, query_vector, technical_terms, domain_filter, log_session):
+    """Resolve every term/field match with a single filtered search instead of one search per pair."""
+    metadata_filter, conditions = build_metadata_filter(technical_terms, domain_filter)
+    metadata_k = min(METADATA_RESULTS_PER_CONDITION * len(conditions), MAX_METADATA_RESULTS)
+    print(f"DEBUG: Calling similarity_search_by_vector with {len(conditions)} metadata conditions, k={metadata_k}")
     try:
-        # Apply domain filter to standard search if specified
-        semantic_filter = {"domain": domain_filter} if domain_filter else None
-        print(f"DEBUG: Calling similarity_search for standard semantic search. Filter: {semantic_filter}")
+        filtered_docs = db.similarity_search_by_vector(
+            query_vector,
+            k=metadata_k,
+            filter=metadata_filter
+        )
+    except Exception as filter_err:
+        # If the combined filter fails, log and continue with the other stages
+        print(f"DEBUG: Error during combined metadata filtered search: {str(filter_err)}")
+        print(f"DEBUG: Traceback: {traceback.format_exc()}")
         
-        standard_results = db.similarity_search(
-            processed_query, 
+        # Log the error
+        log_session.log_event("error_metadata_filter_combined", {
+            "error": str(filter_err),
+            "traceback": traceback.format_exc(),
+            "filter": str(metadata_filter)
+        }, error=True)
+        raise
+    print(f"DEBUG: Combined metadata search returned {len(filtered_docs)} docs")
+    
+    # Rank by the number of conditions a document matches; the stable sort keeps vector order for ties
+    filtered_docs = sorted(filtered_docs, key=lambda doc: -count_metadata_matches(doc, conditions))
+    
+    # Log the results of the combined filter
+    if filtered_docs:
+        log_session.log_documents("metadata_filter_combined", filtered_docs, {
+            "filter": str(metadata_filter),
+            "terms": technical_terms,
+            "match_counts": [count_metadata_matches(doc, conditions) for doc in filtered_docs]
+        })
+    return filtered_docs
+
+def _semantic_stage(db, query_vector, k, domain_filter, log_session):
+    """Run the standard semantic search, falling back to an unfiltered search if the domain filter fails.
+    
+    Returns:
+        A tuple of the results and the error that caused the fallback, if any
+    """
+    # Apply domain filter to standard search if specified
+    semantic_filter = {"domain": domain_filter} if domain_filter else None
+    print(f"DEBUG: Calling similarity_search_by_vector for standard semantic search. Filter: {semantic_filter}")
+    try:
+        standard_results = db.similarity_search_by_vector(
+            query_vector, 
             k=k,
             filter=semantic_filter
         )
         print(f"DEBUG: Standard semantic search returned {len(standard_results)} results.")
         
         # Log standard semantic search results
-        log_documents(log_dir, "standard_semantic_results", standard_results, {
+        log_session.log_documents("standard_semantic_results", standard_results, {
             "filter": str(semantic_filter),
             "count": len(standard_results)
         })
-        
+        return standard_results, None
     except Exception as e:
         # If domain filtering fails, log and fall back to unfiltered search
         print(f"DEBUG: Error during standard semantic search (possibly domain filter): {str(e)}")
         print(f"DEBUG: Traceback: {traceback.format_exc()}")
-        st.warning(f"Domain filtering error: {str(e)}. Falling back to unfiltered search.")
         
         # Log the error
-        with open(log_dir / "error_standard_search.json", "w") as f:
-            json.dump({
-                "error": str(e),
-                "traceback": traceback.format_exc(),
-                "filter": str(semantic_filter)
-            }, f, indent=2)
+        log_session.log_event("error_standard_search", {
+            "error": str(e),
+            "traceback": traceback.format_exc(),
+            "filter": str(semantic_filter)
+        }, error=True)
+        fallback_reason = e
+    
+    try:
+        print("DEBUG: Falling back to unfiltered semantic search.")
+        standard_results = db.similarity_search_by_vector(query_vector, k=k, filter=None)
+        print(f"DEBUG: Unfiltered fallback search returned {len(standard_results)} results.")
+    except Exception as fallback_e:
+        print(f"DEBUG: Error during unfiltered fallback search: {str(fallback_e)}")
+        print(f"DEBUG: Traceback: {traceback.format_exc()}")
         
-        try:
-            print("DEBUG: Falling back to unfiltered semantic search.")
-            standard_results = db.similarity_search(processed_query, k=k, filter=None)
-            print(f"DEBUG: Unfiltered fallback search returned {len(standard_results)} results.")
-            
-            # Log fallback search results
-            log_documents(log_dir, "fallback_semantic_results", standard_results, {
-                "fallback_reason": str(e),
-                "count": len(standard_results)
-            })
-            
-        except Exception as fallback_e:
-            print(f"DEBUG: Error during unfiltered fallback search: {str(fallback_e)}")
-            print(f"DEBUG: Traceback: {traceback.format_exc()}")
-            st.error(f"❌ Critical search error: {fallback_e}")
-            
-            # Log the fallback error
-            with open(log_dir / "error_fallback_search.json", "w") as f:
-                json.dump({
-                    "error": str(fallback_e),
-                    "traceback": traceback.format_exc()
-                }, f, indent=2)
-                
-            standard_results = []
-    
-    print("DEBUG: Starting combination and deduplication.")
-    # Combine results, removing duplicates
-    seen_content = set()
-    combined_results = []
-    
-    # First add the metadata-filtered results (higher priority)
-    for doc in metadata_results:
-        content_hash = hash(doc.page_content)
-        if content_hash not in seen_content:
-            seen_content.add(content_hash)
-            combined_results.append(doc)
-    
-    print(f"DEBUG: Added {len(combined_results)} unique results from metadata search.")
-    
-    # Then add the semantic search results
-    initial_combined_count = len(combined_results)
-    for doc in standard_results:
-        content_hash = hash(doc.page_content)
-        if content_hash not in seen_content:
-            seen_content.add(content_hash)
-            combined_results.append(doc)
-            
-    print(f"DEBUG: Added {len(combined_results) - initial_combined_count} unique results from standard search.")
-    print(f"DEBUG: Total combined results before limiting to k: {len(combined_results)}")
-    
-    # Return the combined results, limited to k
+        # Log the fallback error
+        log_session.log_event("error_fallback_search", {
+            "error": str(fallback_e),
+            "traceback": traceback.format_exc()
+        }, error=True)
+        raise
+    
+    # Log fallback search results
+    log_session.log_documents("fallback_semantic_results", standard_results, {
+        "fallback_reason": str(fallback_reason),
+        "count": len(standard_results)
+    })
+    return standard_results, fallback_reason
+
+def _bm25_stage(db, bm25_index, processed_query, k, domain_filter, log_session):
+    """Score chunks with BM25 so identifier-heavy queries are found even when they miss in embedding space."""
+    bm25_hits = bm25_index.search(processed_query, k=k)
+    bm25_results = fetch_documents_by_id(db, [chunk_id for chunk_id, _ in bm25_hits], domain_filter)
+    print(f"DEBUG: BM25 search returned {len(bm25_results)} results.")
+    
+    # Log BM25 results
+    log_session.log_documents("bm25_results", bm25_results, {
+        "count": len(bm25_results),
+        "scores": [score for _, score in bm25_hits]
+    })
+    return bm25_results
+
+def _hybrid_search(db, processed_query, original_query, k, identifier_index, bm25_index, domain_filter, sink, log_session):
+    """Run the retrieval steps of hybrid_search, recording them in log_session."""
+    print(f"DEBUG: hybrid_search started. Original query: '{original_query}', Processed query: '{processed_query}', k={k}")
+    
+    # Embed the query once (through the shared query cache) and reuse the vector for every sub-search
+    try:
+        query_vector = embed_query_cached(db.embeddings, processed_query)
+    except Exception as embed_err:
+        print(f"DEBUG: Error embedding query: {str(embed_err)}")
+        print(f"DEBUG: Traceback: {traceback.format_exc()}")
+        sink.error(f"❌ Critical search error: {embed_err}")
+        
+        # Log the embedding error
+        log_session.log_event("error_query_embedding", {
+            "error": str(embed_err),
+            "traceback": traceback.format_exc()
+        }, error=True)
+        
+        return []
+    
+    print(f"DEBUG: Domain filter: {domain_filter}")
+    
+    technical_terms = extract_technical_terms(original_query)
+    print(f"DEBUG: Extracted technical terms: {technical_terms}")
+    
+    # Log technical terms
+    log_session.log_event("technical_terms", {
+        "terms": technical_terms,
+        "query": original_query
+    })
+    
+    # The stages are independent, so they are dispatched together and the
+    # latency is that of the slowest one rather than the sum of all
+    stages = {"semantic": lambda: _semantic_stage(db, query_vector, k, domain_filter, log_session)}
+    if identifier_index is not None:
+        identifier_terms = technical_terms + extract_identifiers(original_query)
+        stages["identifier"] = lambda: _identifier_stage(db, identifier_index, identifier_terms, domain_filter, k, log_session)
+    if technical_terms:
+        stages["metadata"] = lambda: _metadata_stage(db, query_vector, technical_terms, domain_filter, log_session)
+    else:
+        print("DEBUG: No technical terms found for metadata filtering.")
+    if bm25_index is not None:
+        stages["bm25"] = lambda: _bm25_stage(db, bm25_index, processed_query, k, domain_filter, log_session)
+    
+    print(f"DEBUG: Dispatching retrieval stages: {list(stages)}")
+    outcomes = run_stages(stages)
+    
+    # Report on the calling thread, the sink may not be usable from pool threads
+    for name, (_, error, seconds) in outcomes.items():
+        sink.metric("retrieval_stage_seconds", seconds, stage=name)
+        if isinstance(error, TimeoutError):
+            print(f"DEBUG: {str(error)}")
+            log_session.log_event(f"timeout_{name}", {"error": str(error)}, error=True)
+            sink.warning(f"⚠️ The {name} search timed out and was skipped.")
+        elif error is not None and name in ("identifier", "bm25"):
+            print(f"DEBUG: Error during {name} search: {str(error)}")
+    
+    identifier_results = outcomes.get("identifier", (None,))[0] or []
+    filtered_results = outcomes.get("metadata", (None,))[0] or []
+    
+    standard_results, semantic_error, _ = outcomes["semantic"]
+    if standard_results is not None:
+        standard_results, fallback_reason = standard_results
+        if fallback_reason is not None:
+            sink.warning(f"Domain filtering error: {str(fallback_reason)}. Falling back to unfiltered search.")
+    else:
+        standard_results = []
+        if not isinstance(semantic_error, TimeoutError):
+            sink.error(f"❌ Critical search error: {semantic_error}")
+    
+    bm25_results = outcomes.get("bm25", (None,))[0] or []
+    
+    # Log all metadata results
+    metadata_results = identifier_results + filtered_results
+    print(f"DEBUG: Metadata filtering step finished. Found {len(metadata_results)} potential results.")
+    if metadata_results:
+        log_session.log_documents("metadata_results_all", metadata_results, {
+            "count": len(metadata_results),
+            "technical_terms": technical_terms
+        })
+    
+    print("DEBUG: Starting reciprocal-rank fusion.")
+    ranked_lists = [identifier_results, filtered_results, bm25_results, standard_results]
+    combined_results = reciprocal_rank_fusion([ranked for ranked in ranked_lists if ranked])
+    print(f"DEBUG: Total fused results before limiting to k: {len(combined_results)}")
+    
+    # Return the fused results, limited to k
     final_results = combined_results[:k]
     print(f"DEBUG: Returning final {len(final_results)} results after limiting to k={k}.")
     
     # Log the final combined results
-    log_documents(log_dir, "final_combined_results", final_results, {
-        "metadata_results_count": len(metadata_results),
+    log_session.log_documents("final_combined_results", final_results, {
+        "identifier_results_count": len(identifier_results),
+        "metadata_results_count": len(filtered_results),
+        "bm25_results_count": len(bm25_results),
         "standard_results_count": len(standard_results),
         "combined_count": len(combined_results),
         "final_count": len(final_results),
         "k_limit": k
     })
     
-    # Log timing information
-    with open(log_dir / "timing.json", "w") as f:
-        json.dump({
-            "start_time": query_log["start_time"],
-            "end_time": time.time(),
-            "duration": time.time() - query_log["start_time"]
-        }, f, indent=2)
-    
     return final_results
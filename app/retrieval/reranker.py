@@ -0,0 +1,214 @@
+import os
+import time
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from langchain_core.documents.base import Document
+from sentence_transformers import CrossEncoder
+
+from app.embeddings.model_registry import get_model_registry, model_key
+from app.utils.event_sink import EventSink, LoggingSink
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_CANDIDATES = 50
+DEFAULT_TIME_BUDGET = 2.0
+DEFAULT_BATCH_TOKENS = 8192
+DEFAULT_MAX_LENGTH = 512
+
+# Rough token estimate for sizing batches without running the tokenizer
+CHARS_PER_TOKEN = 4
+
+
+class CrossEncoderReranker:
+    """Reorders retrieved chunks by the relevance a local cross-encoder assigns to each (query, chunk) pair.
+
+    Pairs are sorted by length and grouped into batches of about the same
+    padded size, so short chunks are not padded to the longest one. Batches
+    are scored until the time budget of the query would be exceeded;
+    candidates left unscored keep their retrieval positions, and the scored
+    ones are reordered among the positions they held.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL, candidates: int = DEFAULT_CANDIDATES,
+                 time_budget: float = DEFAULT_TIME_BUDGET, batch_tokens: int = DEFAULT_BATCH_TOKENS,
+                 max_length: int = DEFAULT_MAX_LENGTH, device: str = "cpu"):
+        """Initialize the reranker. The model is loaded by warmup or on first use.
+
+        Args:
+            model_name: HuggingFace name of the cross-encoder
+            candidates: Number of retrieved chunks to rerank
+            time_budget: Seconds a query may spend scoring
+            batch_tokens: Maximum padded tokens per batch
+            max_length: Tokens per pair after truncation
+            device: Device to run the model on
+        """
+        self.model_name = model_name
+        self.candidates = candidates
+        self.time_budget = time_budget
+        self.batch_tokens = max(batch_tokens, max_length)
+        self.max_length = max_length
+        self.device = device
+        self._model: Optional[CrossEncoder] = None
+        self._load_failed = False
+        self._lock = threading.Lock()
+
+    def _model_key(self):
+        """Get the key of this model in the process-wide model registry."""
+        return model_key(self.model_name, self.device, model_kwargs={"max_length": self.max_length}, backend="cross-encoder")
+
+    def _load_model(self) -> CrossEncoder:
+        """Load the cross-encoder from disk or the HuggingFace hub."""
+        logger.info(f"Loading reranker model: {self.model_name}")
+        return CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+
+    def _get_model(self) -> Optional[CrossEncoder]:
+        """Get or load the cross-encoder. Returns None if it cannot be loaded."""
+        if self._model is None and not self._load_failed:
+            try:
+                self._model = get_model_registry().get(self._model_key(), self._load_model)
+            except Exception as e:
+                # Reranking is optional, keep serving retrieval order
+                logger.warning(f"Could not load reranker model {self.model_name}, results are not reranked: {str(e)}")
+                self._load_failed = True
+        return self._model
+
+    def warmup(self):
+        """Load the model on a background thread if no instance has loaded it yet.
+
+        Queries made while the model is loading wait for the same load.
+        """
+        if self._model is None and not self._load_failed:
+            get_model_registry().warmup(self._model_key(), self._load_model)
+
+    def estimate_tokens(self, query: str, text: str) -> int:
+        """Estimate the tokens of a (query, chunk) pair after truncation."""
+        return min(self.max_length, (len(query) + len(text)) // CHARS_PER_TOKEN + 3)
+
+    def make_batches(self, query: str, documents: List[Document]) -> List[List[Tuple[int, int]]]:
+        """Group candidates into batches of similar length.
+
+        Args:
+            query: Query text
+            documents: Candidates to score
+
+        Returns:
+            Batches of (candidate index, estimated tokens), shortest pairs first
+        """
+        lengths = sorted(
+            ((i, self.estimate_tokens(query, doc.page_content)) for i, doc in enumerate(documents)),
+            key=lambda item: item[1]
+        )
+        batches = []
+        batch = []
+        for item in lengths:
+            # Pairs are padded to the longest pair of their batch, which is the last one
+            if batch and (len(batch) + 1) * item[1] > self.batch_tokens:
+                batches.append(batch)
+                batch = []
+            batch.append(item)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def rerank(self, query: str, documents: List[Document], top_n: Optional[int] = None,
+               sink: Optional[EventSink] = None) -> List[Document]:
+        """Reorder documents by cross-encoder relevance.
+
+        Args:
+            query: Query as asked by the user
+            documents: Retrieved documents, best first
+            top_n: Number of documents to return (all if None)
+            sink: Receiver of the reranking metrics
+
+        Returns:
+            The top_n documents, most relevant first
+        """
+        sink = sink or LoggingSink()
+        top_n = len(documents) if top_n is None else top_n
+        candidates = documents[:self.candidates]
+        if len(candidates) < 2:
+            return documents[:top_n]
+
+        model = self._get_model()
+        if model is None:
+            return documents[:top_n]
+
+        # Time spent waiting for another query's scoring counts against the budget
+        start_time = time.monotonic()
+        scores = {}
+        seconds_per_token = None
+        with self._lock:
+            for batch in self.make_batches(query, candidates):
+                padded_tokens = len(batch) * batch[-1][1]
+                elapsed = time.monotonic() - start_time
+                # Stop before a batch that is expected to overrun the budget
+                if seconds_per_token is not None and elapsed + padded_tokens * seconds_per_token > self.time_budget:
+                    break
+                batch_start = time.monotonic()
+                pairs = [(query, candidates[i].page_content) for i, _ in batch]
+                batch_scores = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+                seconds_per_token = (time.monotonic() - batch_start) / padded_tokens
+                scores.update((i, float(score)) for (i, _), score in zip(batch, batch_scores))
+
+        # Batches run shortest first, so the scored candidates are not the best
+        # retrieved ones; only reorder them within the positions they came from
+        order = list(range(len(candidates)))
+        by_score = iter(sorted(scores, key=lambda i: scores[i], reverse=True))
+        for position in sorted(scores):
+            order[position] = next(by_score)
+        unscored = [i for i in order if i not in scores]
+        reranked = [candidates[i] for i in order] + documents[len(candidates):]
+
+        sink.metric("rerank_seconds", time.monotonic() - start_time, candidates=len(candidates))
+        sink.metric("rerank_scored", len(scores), candidates=len(candidates))
+        if unscored:
+            logger.info(f"Reranking time budget reached, {len(unscored)} of {len(candidates)} candidates not scored")
+        return reranked[:top_n]
+
+
+# Global reranker instance
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """Get the process-wide reranker.
+
+    Reranking is on by default. The model is read from RERANKER_MODEL (empty
+    disables reranking), the number
+    of candidates from RERANK_CANDIDATES, the per-query budget in seconds from
+    RERANK_TIME_BUDGET and the padded tokens per batch from RERANK_BATCH_TOKENS.
+
+    Returns:
+        CrossEncoderReranker instance, or None if reranking is disabled
+    """
+    global _reranker
+    model_name = os.getenv("RERANKER_MODEL", DEFAULT_RERANKER_MODEL)
+    if not model_name:
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker(
+                model_name=model_name,
+                candidates=int(os.getenv("RERANK_CANDIDATES", DEFAULT_CANDIDATES)),
+                time_budget=float(os.getenv("RERANK_TIME_BUDGET", DEFAULT_TIME_BUDGET)),
+                batch_tokens=int(os.getenv("RERANK_BATCH_TOKENS", DEFAULT_BATCH_TOKENS))
+            )
+        return _reranker
+
+
+def warmup_reranker():
+    """Start loading the reranker model in the background, unless reranking is disabled.
+
+    Called at startup next to DBManager.warmup_embeddings, and skipped the same
+    way with EMBEDDING_WARMUP=false.
+    """
+    if os.getenv("EMBEDDING_WARMUP", "true").lower() == "false":
+        return
+    reranker = get_reranker()
+    if reranker is not None:
+        reranker.warmup()
@@ -0,0 +1,232 @@
+import os
+import glob
+import gzip
+import json
+import time
+import queue
+import atexit
+import random
+import datetime
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Default location of the retrieval logs (previously one directory of JSON files per query)
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "embeddings", "log", "runtime")
+
+# Maximum records written as one compressed block
+MAX_BATCH_RECORDS = 64
+
+
+class RetrievalLogSession:
+    """Collects the log sections of one retrieval and hands them to the writer as one record.
+
+    Recording only stores references, so it costs next to nothing on the request
+    path; serialization and compression happen on the writer thread. Sessions that
+    were not sampled only keep error sections.
+    """
+
+    def __init__(self, logger: "RetrievalLogger", sampled: bool, **fields):
+        self._logger = logger
+        self.sampled = sampled
+        self.start_time = time.time()
+        self.record: Dict[str, Any] = {
+            "timestamp": datetime.datetime.now().isoformat(),
+            **fields,
+            "sections": {}
+        }
+
+    def log_documents(self, name: str, documents: List[Any], metadata: Optional[Dict[str, Any]] = None):
+        """Record a list of retrieved documents under a section name."""
+        if not self.sampled:
+            return
+        self.record["sections"][name] = {
+            "count": len(documents),
+            "metadata": metadata or {},
+            # Copy metadata dicts, the documents may be modified after the query
+            "documents": [(doc.page_content, dict(doc.metadata or {})) for doc in documents]
+        }
+
+    def log_event(self, name: str, data: Dict[str, Any], error: bool = False):
+        """Record a section of arbitrary JSON data. Errors are kept even when not sampled."""
+        if self.sampled or error:
+            self.record["sections"][name] = data
+
+    def close(self):
+        """Finish the record and queue it for writing."""
+        if not self.record["sections"]:
+            return
+        end_time = time.time()
+        self.record["timing"] = {
+            "start_time": self.start_time,
+            "end_time": end_time,
+            "duration": end_time - self.start_time
+        }
+        # Hand over a copy, a timed-out retrieval stage may still add sections later
+        self._logger.submit(dict(self.record, sections=dict(self.record["sections"])))
+
+
+class RetrievalLogger:
+    """Background writer of retrieval records to compressed, append-only JSONL files.
+
+    Records are queued without blocking and written in batches, one compressed
+    block per batch. Files are rotated by size, and the oldest files are deleted
+    when the log directory exceeds its disk budget.
+    """
+
+    def __init__(self, log_dir: Optional[str] = None, sample_rate: Optional[float] = None,
+                 max_file_bytes: Optional[int] = None, max_total_bytes: Optional[int] = None,
+                 compression: Optional[str] = None, max_queue_size: int = 1000):
+        """Initialize the retrieval logger.
+
+        Args:
+            log_dir: Directory for log files. Defaults to RETRIEVAL_LOG_DIR or app/embeddings/log/runtime
+            sample_rate: Fraction of queries logged in full (0.0-1.0). Defaults to RETRIEVAL_LOG_SAMPLE_RATE or 1.0
+            max_file_bytes: Size at which a new file is started. Defaults to RETRIEVAL_LOG_MAX_FILE_MB or 16 MB
+            max_total_bytes: Disk budget for all log files. Defaults to RETRIEVAL_LOG_MAX_TOTAL_MB or 256 MB
+            compression: 'zstd' or 'gzip'. Defaults to RETRIEVAL_LOG_COMPRESSION, or zstd when installed
+            max_queue_size: Records waiting to be written; further records are dropped
+        """
+        self.log_dir = log_dir or os.getenv("RETRIEVAL_LOG_DIR") or DEFAULT_LOG_DIR
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("RETRIEVAL_LOG_SAMPLE_RATE", "1.0"))
+        self.max_file_bytes = max_file_bytes or int(float(os.getenv("RETRIEVAL_LOG_MAX_FILE_MB", "16")) * 1024 * 1024)
+        self.max_total_bytes = max_total_bytes or int(float(os.getenv("RETRIEVAL_LOG_MAX_TOTAL_MB", "256")) * 1024 * 1024)
+
+        compression = compression or os.getenv("RETRIEVAL_LOG_COMPRESSION") or ("zstd" if zstandard else "gzip")
+        if compression == "zstd" and zstandard is None:
+            print("WARNING: zstandard is not installed, compressing retrieval logs with gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.extension = ".jsonl.zst" if compression == "zstd" else ".jsonl.gz"
+
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue_size)
+        self._current_path: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def session(self, **fields) -> RetrievalLogSession:
+        """Start the log record of one retrieval, deciding whether it is sampled."""
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        return RetrievalLogSession(self, sampled, **fields)
+
+    def submit(self, record: Dict[str, Any]):
+        """Queue a record for writing without blocking. Records are dropped if the queue is full."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 10.0):
+        """Wait until all queued records are written."""
+        if self._thread is None:
+            return
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_thread(self):
+        """Start the writer thread on first use."""
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="retrieval-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Writer loop: take everything queued (up to a batch), then write it as one compressed block."""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH_RECORDS:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"ERROR: Failed to write {len(batch)} retrieval log records: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        """Serialize, compress and append a batch of records, rotating files as needed."""
+        lines = [json.dumps(self._serializable(record), default=str) for record in batch]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        if self.compression == "zstd":
+            block = zstandard.ZstdCompressor().compress(data)
+        else:
+            block = gzip.compress(data)
+
+        path = self._file_for_write()
+        # Concatenated gzip members and zstd frames decompress as one stream
+        with open(path, "ab") as f:
+            f.write(block)
+
+    @staticmethod
+    def _serializable(record: Dict[str, Any]) -> Dict[str, Any]:
+        """Expand the document tuples recorded by sessions into JSON objects."""
+        for section in record.get("sections", {}).values():
+            if isinstance(section, dict) and "documents" in section:
+                section["documents"] = [
+                    {"index": i, "content": content, "metadata": metadata}
+                    for i, (content, metadata) in enumerate(section["documents"])
+                ]
+        return record
+
+    def _file_for_write(self) -> str:
+        """Get the current log file, starting a new one and enforcing the disk budget when it is full."""
+        os.makedirs(self.log_dir, exist_ok=True)
+        if self._current_path is None or not os.path.exists(self._current_path) \
+                or os.path.getsize(self._current_path) >= self.max_file_bytes:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            self._current_path = os.path.join(self.log_dir, f"retrieval_{timestamp}{self.extension}")
+            self._enforce_disk_budget()
+        return self._current_path
+
+    def _enforce_disk_budget(self):
+        """Delete the oldest log files while the directory exceeds its disk budget."""
+        log_files = sorted(glob.glob(os.path.join(self.log_dir, "retrieval_*.jsonl.*")))
+        sizes = {path: os.path.getsize(path) for path in log_files}
+        total = sum(sizes.values())
+        for path in log_files:
+            if total <= self.max_total_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= sizes[path]
+            except OSError as e:
+                print(f"ERROR: Failed to remove old retrieval log {path}: {str(e)}")
+
+
+# Global retrieval logger instance
+_retrieval_logger: Optional[RetrievalLogger] = None
+_retrieval_logger_lock = threading.Lock()
+
+
+def get_retrieval_logger() -> RetrievalLogger:
+    """Get the process-wide retrieval logger.
+
+    Returns:
+        RetrievalLogger instance
+    """
+    global _retrieval_logger
+    with _retrieval_logger_lock:
+        if _retrieval_logger is None:
+            _retrieval_logger = RetrievalLogger()
+        return _retrieval_logger
+
+
+@atexit.register
+def _flush_retrieval_logger():
+    """Write queued records before the process exits."""
+    if _retrieval_logger is not None:
+        _retrieval_logger.flush(timeout=5.0)
@@ -7,6 +7,25 @@ from pathlib import Path
 # Add the parent directory to sys.path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+@pytest.fixture(autouse=True)
+def isolated_embedding_cache(tmp_path, monkeypatch):
+    """Keep the on-disk embedding cache of tests out of app/cache."""
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", str(tmp_path / "embedding_cache"))
+
+@pytest.fixture(autouse=True)
+def isolated_chunk_logs(tmp_path, monkeypatch):
+    """Write the chunk logs of database builds to a temporary directory instead of app/embeddings/log."""
+    monkeypatch.setattr("app.embeddings.db_manager.log_directory", str(tmp_path / "log"))
+
+@pytest.fixture(autouse=True)
+def isolated_model_registry(monkeypatch):
+    """Keep models loaded by one test (often mocks) out of the next, and skip warmups and micro-batching."""
+    from app.embeddings.model_registry import get_model_registry
+    monkeypatch.setenv("EMBEDDING_WARMUP", "false")
+    monkeypatch.setenv("EMBEDDING_MICROBATCH_SIZE", "1")
+    yield
+    get_model_registry().clear()
+
 @pytest.fixture(scope="function")
 def save_env():
     """Save and restore environment variables."""
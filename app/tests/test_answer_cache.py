@@ -0,0 +1,82 @@
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+
+from app.retrieval.answer_cache import AnswerCache, chunk_id, normalize_query
+from app.embeddings.db_manager import INDEX_GENERATION_FILE, bump_index_generation, watch_index_generation
+
+MODEL = "huggingface:meta-llama/Llama-3.3-70B-Instruct"
+PARAMS = {"temperature": 0.3, "max_tokens": 4000}
+
+
+class TestAnswerCache:
+    """Tests for the answer cache."""
+
+    def test_exact_lookup(self):
+        """Test that answers are keyed on the question, chunks, model and parameters."""
+        cache = AnswerCache()
+        cache.put("What is the service ID of FileTransferAgent?", ["a", "b"], MODEL, PARAMS, "0x1234")
+
+        # Normalization and chunk order do not matter
+        assert cache.get("what is the service ID of  FileTransferAgent", ["b", "a"], MODEL, PARAMS) == "0x1234"
+        assert cache.get("What is the service ID of FileTransferAgent?", ["a", "c"], MODEL, PARAMS) is None
+        assert cache.get("What is the service ID of FileTransferAgent?", ["a", "b"], "openai:gpt-4o-mini", PARAMS) is None
+        assert cache.get("What is the service ID of FileTransferAgent?", ["a", "b"], MODEL, {"temperature": 0.9}) is None
+        assert cache.hits == 1 and cache.misses == 3
+
+    def test_invalidated_by_index_change(self):
+        """Test that changing the stored chunks invalidates cached answers."""
+        cache = AnswerCache()
+        cache.put("Which DTCs does the BMS display raise?", ["a"], MODEL, PARAMS, "B1A2F-11")
+        assert cache.get("Which DTCs does the BMS display raise?", ["a"], MODEL, PARAMS) == "B1A2F-11"
+
+        bump_index_generation()
+        assert cache.get("Which DTCs does the BMS display raise?", ["a"], MODEL, PARAMS) is None
+
+    def test_invalidated_by_index_change_in_another_process(self, temp_dir):
+        """Test that a change recorded in the database directory by another process invalidates cached answers."""
+        watch_index_generation(temp_dir)
+        bump_index_generation(temp_dir)
+        cache = AnswerCache()
+        cache.put("Which DTCs does the BMS display raise?", ["a"], MODEL, PARAMS, "B1A2F-11")
+        assert cache.get("Which DTCs does the BMS display raise?", ["a"], MODEL, PARAMS) == "B1A2F-11"
+
+        # Another process replaces the generation file without touching this process's counter
+        other_path = os.path.join(temp_dir, "other.tmp")
+        with open(other_path, "w") as f:
+            f.write("rebuilt elsewhere\n")
+        os.replace(other_path, os.path.join(temp_dir, INDEX_GENERATION_FILE))
+        assert cache.get("Which DTCs does the BMS display raise?", ["a"], MODEL, PARAMS) is None
+
+    def test_near_duplicate_lookup(self):
+        """Test that similar questions naming the same identifiers share an answer."""
+        cache = AnswerCache(similarity_threshold=0.95)
+        cache.put("What is the service ID of FileTransferAgent?", ["a"], MODEL, PARAMS, "0x1234",
+                  query_vector=[1.0, 0.0, 0.1])
+
+        assert cache.find_similar("Service ID of FileTransferAgent", [1.0, 0.01, 0.1], MODEL, PARAMS) == "0x1234"
+        # Similar wording but another identifier
+        assert cache.find_similar("What is the service ID of DiagnosticAgent?", [1.0, 0.0, 0.1], MODEL, PARAMS) is None
+        # Dissimilar question
+        assert cache.find_similar("Service ID of FileTransferAgent", [0.0, 1.0, 0.0], MODEL, PARAMS) is None
+        # Other model
+        assert cache.find_similar("Service ID of FileTransferAgent", [1.0, 0.0, 0.1], "openai:gpt-4o-mini", PARAMS) is None
+
+    def test_near_duplicate_disabled_by_default(self):
+        """Test that near-duplicate lookups are off without a threshold."""
+        cache = AnswerCache()
+        cache.put("What is the service ID of FileTransferAgent?", ["a"], MODEL, PARAMS, "0x1234",
+                  query_vector=[1.0, 0.0])
+        assert cache.find_similar("What is the service ID of FileTransferAgent?", [1.0, 0.0], MODEL, PARAMS) is None
+
+    def test_helpers(self):
+        """Test query normalization and chunk IDs."""
+        assert normalize_query("  What IS\tthe ID?  ") == "what is the id"
+        document = Document(page_content="content", metadata={})
+        assert chunk_id(document) == "9a0364b9e99bb480dd25e1f0284c8555"
+        assert chunk_id(Document(page_content="content", metadata={"doc_id": "x"})) == "x"
@@ -0,0 +1,110 @@
+import sys
+import json
+import pytest
+from pathlib import Path
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+from langchain_core.documents.base import Document
+
+from app.api.server import create_app
+
+
+class FakeService:
+    """Stand-in for AssistantService with canned retrieval and generation."""
+
+    def __init__(self, cached_answer=None, fail=False):
+        self.cached_answer = cached_answer
+        self.fail = fail
+        self.cached = []
+        self.searches = []
+
+    def health(self):
+        return {"status": "ok", "documents": 2}
+
+    def search(self, query, k=20, domain=None):
+        self.searches.append((query, k, domain))
+        return [Document(page_content="FileTransferAgent service ID 0x1234", metadata={"source": "services.json"})]
+
+    def prepare_answer(self, question, k=20, domain=None):
+        self.search(question, k, domain)
+        return {"prompt": f"PROMPT {question}", "sources": "- services.json", "chunk_ids": ["a"],
+                "cached_answer": self.cached_answer}
+
+    def generate(self, prompt):
+        yield "The service ID "
+        if self.fail:
+            raise RuntimeError("LLM unavailable")
+        yield "is 0x1234."
+
+    def cache_answer(self, question, chunk_ids, answer):
+        self.cached.append((question, chunk_ids, answer))
+
+
+def parse_events(body):
+    """Parse the data payloads of a server-sent event stream."""
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+class TestAPIServer:
+    """Tests for the headless HTTP API."""
+
+    def test_health(self):
+        """Test the health endpoint."""
+        with TestClient(create_app(FakeService())) as client:
+            response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ok"
+
+    def test_search(self):
+        """Test that search results are returned with their IDs and metadata."""
+        service = FakeService()
+        with TestClient(create_app(service)) as client:
+            response = client.post("/search", json={"query": "FileTransferAgent", "k": 5, "domain": "services"})
+        assert response.status_code == 200
+        result = response.json()["results"][0]
+        assert result["metadata"]["source"] == "services.json"
+        assert len(result["id"]) == 32
+        assert service.searches == [("FileTransferAgent", 5, "services")]
+
+    def test_search_validates_request(self):
+        """Test that an empty query is rejected."""
+        with TestClient(create_app(FakeService())) as client:
+            assert client.post("/search", json={"query": ""}).status_code == 422
+
+    def test_answer(self):
+        """Test a non-streaming answer, which is then cached."""
+        service = FakeService()
+        with TestClient(create_app(service)) as client:
+            response = client.post("/answer", json={"query": "Service ID of FileTransferAgent?"})
+        assert response.json() == {"answer": "The service ID is 0x1234.", "sources": "- services.json", "cached": False}
+        assert service.cached == [("Service ID of FileTransferAgent?", ["a"], "The service ID is 0x1234.")]
+
+    def test_answer_from_cache(self):
+        """Test that a cached answer is returned without generating."""
+        with TestClient(create_app(FakeService(cached_answer="cached"))) as client:
+            response = client.post("/answer", json={"query": "Service ID of FileTransferAgent?"})
+        assert response.json()["answer"] == "cached"
+        assert response.json()["cached"] is True
+
+    def test_answer_stream(self):
+        """Test that a streamed answer sends sources, deltas and a final event."""
+        with TestClient(create_app(FakeService())) as client:
+            response = client.post("/answer", json={"query": "Service ID of FileTransferAgent?", "stream": True})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.text)
+        assert events[0]["type"] == "sources"
+        assert "".join(event["content"] for event in events if event["type"] == "delta") == "The service ID is 0x1234."
+        assert events[-1]["type"] == "done"
+
+    def test_answer_stream_error(self):
+        """Test that a generation error ends the stream with an error event."""
+        service = FakeService(fail=True)
+        with TestClient(create_app(service)) as client:
+            response = client.post("/answer", json={"query": "Service ID of FileTransferAgent?", "stream": True})
+        events = parse_events(response.text)
+        assert events[-1] == {"type": "error", "error": "LLM unavailable"}
+        assert service.cached == []
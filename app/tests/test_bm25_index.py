@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import time
+import threading
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+
+from app.embeddings.bm25_index import BM25Index, tokenize
+
+
+class TestBM25Index:
+    """Tests for the persisted BM25 index."""
+
+    def _documents(self):
+        return [
+            Document(page_content="Service 0x22 ReadDataByIdentifier reads a data identifier"),
+            Document(page_content="Service 0x19 ReadDTCInformation reports DTC B1A2F-11"),
+            Document(page_content="The gateway forwards diagnostic requests between buses"),
+        ]
+
+    def test_tokenize_keeps_identifiers(self):
+        """Identifiers with separators stay whole."""
+        assert tokenize("DTC B1A2F-11 via 0x22!") == ["dtc", "b1a2f-11", "via", "0x22"]
+
+    def test_search_ranks_exact_terms(self, temp_dir):
+        """Chunks containing the rare query terms rank first."""
+        index = BM25Index(os.path.join(temp_dir, "bm25_index.json"))
+        index.add_documents(["id-1", "id-2", "id-3"], self._documents())
+
+        assert [chunk_id for chunk_id, _ in index.search("0x22 ReadDataByIdentifier")] == ["id-1"]
+        assert index.search("B1A2F-11", k=5)[0][0] == "id-2"
+        assert index.search("unknown term") == []
+
+    def test_incremental_updates_persist(self, temp_dir):
+        """Removed chunks disappear, and the index survives a save and reload."""
+        index_path = os.path.join(temp_dir, "bm25_index.json")
+        index = BM25Index(index_path)
+        index.add_documents(["id-1", "id-2", "id-3"], self._documents())
+        index.remove_ids(["id-1"])
+        index.add_documents(["id-4"], [Document(page_content="0x22 is also used by the gateway")])
+        index.save()
+
+        reloaded = BM25Index(index_path)
+        assert len(reloaded) == 3
+        assert [chunk_id for chunk_id, _ in reloaded.search("0x22")] == ["id-4"]
+        assert reloaded.search("gateway", k=5) == index.search("gateway", k=5)
+
+    def test_queries_during_the_first_load_wait_for_it(self, temp_dir):
+        """A query arriving while another thread loads the index sees the loaded chunks."""
+        index_path = os.path.join(temp_dir, "bm25_index.json")
+        index = BM25Index(index_path)
+        index.add_documents(["id-1", "id-2", "id-3"], self._documents())
+        index.save()
+
+        def slow_load(f):
+            time.sleep(0.2)
+            return json.loads(f.read())
+
+        reloaded = BM25Index(index_path)
+        results = {}
+        with patch("app.embeddings.bm25_index.json.load", side_effect=slow_load):
+            first = threading.Thread(target=lambda: results.setdefault("first", reloaded.search("0x22")))
+            first.start()
+            time.sleep(0.05)
+            results["second"] = reloaded.search("0x22")
+            first.join()
+
+        assert results["first"] == results["second"] == index.search("0x22")
+        assert results["second"]
+
+    def test_searches_during_updates(self, temp_dir):
+        """Searches on worker threads never see a half-applied update."""
+        index = BM25Index(os.path.join(temp_dir, "bm25_index.json"))
+        index.add_documents(["id-1", "id-2", "id-3"], self._documents())
+        batch = [Document(page_content=f"gateway service 0x22 chunk {i}") for i in range(200)]
+        batch_ids = [f"batch-{i}" for i in range(200)]
+        stop = threading.Event()
+        errors = []
+
+        def search():
+            while not stop.is_set():
+                try:
+                    index.search("gateway 0x22", k=5)
+                except Exception as e:
+                    errors.append(e)
+
+        searchers = [threading.Thread(target=search) for _ in range(4)]
+        for thread in searchers:
+            thread.start()
+        for _ in range(50):
+            index.add_documents(batch_ids, batch)
+            index.remove_ids(batch_ids)
+        stop.set()
+        for thread in searchers:
+            thread.join()
+
+        assert errors == []
+        assert len(index) == 3
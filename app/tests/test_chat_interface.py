@@ -0,0 +1,29 @@
+import os
+import sys
+import subprocess
+import pytest
+from pathlib import Path
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+pytest.importorskip("streamlit")
+pytest.importorskip("openai")
+
+APP_DIR = Path(__file__).parent.parent
+PROJECT_ROOT = APP_DIR.parent
+
+
+def test_importable_the_way_main_imports_it():
+    """`streamlit run app/main.py` puts app/ first on sys.path and appends the
+    project root, so the UI package is imported as top-level `ui`."""
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    result = subprocess.run(
+        [sys.executable, "-c", "import ui.chat_interface"],
+        cwd=str(APP_DIR),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,81 @@
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+
+from app.utils.context_packing import pack_context, strip_seen_header, count_tokens
+from app.utils.prompt_builder import build_context, NO_CONTEXT_TEXT
+
+SUMMARY = "# SIGNAL DATABASE SUMMARY\nDatabase: Powertrain CAN\nVersion: 2.1\nSignals: 120"
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens():
+    """Count tokens with the character estimate, independent of the tiktoken encodings available offline."""
+    with patch("app.utils.context_packing._get_encoding", return_value=None):
+        yield
+
+
+def signal_chunk(name, body="Description: Engine speed\nBus Type: CAN"):
+    """Signal chunk with the summary header the signal processor repeats in every chunk."""
+    return Document(page_content=f"{SUMMARY}\n\n# SIGNAL: {name}\n{body}", metadata={"source": "signals.json"})
+
+
+class TestContextPacking:
+    """Tests for token-budgeted context packing."""
+
+    def test_repeated_header_is_kept_once(self):
+        """The summary header of later chunks from the same document is removed."""
+        packed = pack_context([signal_chunk("EngineSpeed"), signal_chunk("VehicleSpeed")], token_budget=1000)
+
+        assert packed.text.count("# SIGNAL DATABASE SUMMARY") == 1
+        assert "# SIGNAL: VehicleSpeed" in packed.text
+        assert packed.duplicate_header_tokens == count_tokens(SUMMARY)
+        assert len(packed.documents) == 2
+
+    def test_strip_seen_header_only_removes_leading_blocks(self):
+        """Blocks already in the context are removed only at the start of a chunk."""
+        seen = {"Header", "Shared"}
+
+        assert strip_seen_header("Header\n\nShared\n\nNew", seen) == "New"
+        assert strip_seen_header("New\n\nShared", seen) == "New\n\nShared"
+        assert strip_seen_header("Header", seen) == ""
+
+    def test_budget_is_filled_by_relevance(self):
+        """Chunks that do not fit are skipped and smaller, less relevant chunks fill the rest."""
+        documents = [
+            Document(page_content="a" * 400, metadata={"source": "best.json"}),
+            Document(page_content="b" * 400, metadata={"source": "too_long.json"}),
+            Document(page_content="c" * 40, metadata={"source": "small.json"})
+        ]
+
+        packed = pack_context(documents, token_budget=150)
+
+        assert [doc.metadata["source"] for doc in packed.documents] == ["best.json", "small.json"]
+        assert packed.skipped == 1
+        assert packed.tokens <= 150
+
+    def test_oversized_best_chunk_is_truncated(self):
+        """The best chunk is truncated rather than dropped when it alone exceeds the budget."""
+        packed = pack_context([Document(page_content="x" * 4000, metadata={})], token_budget=100)
+
+        assert len(packed.documents) == 1
+        assert packed.tokens <= 100
+
+    def test_build_context_cites_packed_documents(self):
+        """The source list only cites the documents placed in the context."""
+        documents = [
+            Document(page_content="a" * 400, metadata={"source": "best.json"}),
+            Document(page_content="b" * 400, metadata={"source": "dropped.json"})
+        ]
+
+        context_text, source_info, context_docs = build_context(documents, token_budget=150)
+
+        assert source_info == "- best.json"
+        assert context_docs == documents[:1]
+        assert build_context([])[0] == NO_CONTEXT_TEXT
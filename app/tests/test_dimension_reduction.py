@@ -0,0 +1,113 @@
+import os
+import sys
+import zlib
+import numpy as np
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+
+from app.embeddings.db_manager import DBManager
+from app.embeddings.dimension_reduction import VectorProjection, ProjectedEmbeddings, projection_recall
+from app.embeddings.query_cache import embed_query_cached
+
+
+class TopicEmbeddings(Embeddings):
+    """Deterministic 16-dimensional embeddings whose variance lies mostly in 4 directions."""
+
+    def _vector(self, text):
+        rng = np.random.default_rng(zlib.crc32(text.encode()))
+        return np.concatenate([rng.normal(size=4) * 5, rng.normal(size=12) * 0.1]).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+class TestDimensionReduction:
+    """Tests for projecting stored vectors to fewer dimensions."""
+
+    def test_pca_keeps_the_main_directions(self, temp_dir):
+        """PCA reduces to unit vectors that keep the neighbours of the dominant directions."""
+        embeddings = TopicEmbeddings()
+        corpus = embeddings.embed_documents([f"chunk {i}" for i in range(200)])
+        queries = embeddings.embed_documents([f"query {i}" for i in range(20)])
+
+        pca4 = VectorProjection("pca", 4).fit(corpus)
+        pca1 = VectorProjection("pca", 1).fit(corpus)
+        reduced = np.asarray(pca4.transform(corpus))
+
+        assert reduced.shape == (200, 4)
+        assert np.allclose(np.linalg.norm(reduced, axis=1), 1.0, atol=1e-5)
+        recall4, recall1 = projection_recall(corpus, queries, [pca4, pca1], k=5)
+        assert recall4.recall > 0.7
+        assert recall1.recall < recall4.recall
+
+        path = os.path.join(temp_dir, "projection.npz")
+        pca4.save(path)
+        loaded = VectorProjection.load(path)
+        assert loaded.name == "pca4"
+        assert np.allclose(loaded.transform(queries), pca4.transform(queries), atol=1e-6)
+
+    def test_truncate_and_invalid_sizes(self):
+        """Truncation keeps the leading dimensions; impossible sizes are rejected."""
+        projection = VectorProjection("truncate", 2).fit([[3.0, 4.0, 7.0]])
+
+        assert projection.transform([[3.0, 4.0, 7.0]]) == [pytest.approx([0.6, 0.8])]
+        with pytest.raises(ValueError):
+            VectorProjection("pca", 8).fit([[1.0] * 16] * 4)
+        with pytest.raises(ValueError):
+            VectorProjection("truncate", 32).fit([[1.0] * 16])
+
+    def test_build_stores_reduced_vectors(self, temp_dir, monkeypatch):
+        """A build fits the projection, stores reduced vectors and queries use the same projection."""
+        monkeypatch.setenv("EMBEDDING_PROJECTION", "pca")
+        monkeypatch.setenv("EMBEDDING_PROJECTION_DIMS", "4")
+        documents = [
+            Document(page_content=f"signal number {i}", metadata={"source": "signals.json", "domain": "signals"})
+            for i in range(20)
+        ]
+        persist_directory = os.path.join(temp_dir, "chroma_db")
+        db_manager = DBManager(persist_directory=persist_directory, embedding_provider="huggingface",
+                               embedding_model="BAAI/bge-large-en-v1.5")
+
+        with patch.object(db_manager, "_get_embeddings_function", return_value=TopicEmbeddings()):
+            db, count = db_manager.create_db_from_documents(documents)
+            stored = db._collection.get(include=["embeddings"])["embeddings"]
+            results = db_manager.similarity_search("signal number 3", k=1)
+
+            reloaded = DBManager(persist_directory=persist_directory, embedding_provider="huggingface",
+                                 embedding_model="BAAI/bge-large-en-v1.5")
+            with patch.object(reloaded, "_get_embeddings_function", return_value=TopicEmbeddings()):
+                reloaded_db = reloaded.initialize_db()
+
+        assert count == 20
+        assert len(stored[0]) == 4
+        assert isinstance(db.embeddings, ProjectedEmbeddings)
+        assert results[0].page_content == "signal number 3"
+        assert isinstance(reloaded_db.embeddings, ProjectedEmbeddings)
+        assert reloaded_db.embeddings.model_name == db.embeddings.model_name
+        assert "@pca4-" in db.embeddings.model_name
+
+    def test_refit_invalidates_cached_query_vectors(self, temp_dir, monkeypatch):
+        """After a rebuild refits the projection, cached queries are projected with the new fit."""
+        monkeypatch.setenv("EMBEDDING_PROJECTION", "pca")
+        monkeypatch.setenv("EMBEDDING_PROJECTION_DIMS", "4")
+        db_manager = DBManager(persist_directory=os.path.join(temp_dir, "chroma_db"), embedding_provider="huggingface",
+                               embedding_model="BAAI/bge-large-en-v1.5")
+
+        with patch.object(db_manager, "_get_embeddings_function", return_value=TopicEmbeddings()):
+            db, _ = db_manager.create_db_from_documents([Document(page_content=f"signal {i}", metadata={"source": "a.json"}) for i in range(20)])
+            before = embed_query_cached(db.embeddings, "signal 3")
+            db, _ = db_manager.create_db_from_documents([Document(page_content=f"service {i}", metadata={"source": "b.json"}) for i in range(20)])
+            after = embed_query_cached(db.embeddings, "signal 3")
+
+        assert after != pytest.approx(before)
+        assert after == pytest.approx(db.embeddings.embed_query("signal 3"))
@@ -0,0 +1,125 @@
+import sys
+import numpy as np
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.embeddings import Embeddings
+
+from app.embeddings.embedding_backends import Float16Vectors, compare_backends, default_queries
+from app.embeddings.huggingface_embeddings import HuggingFaceEmbeddings
+from app.utils.model_config import validate_config
+
+
+class RecordingSentenceTransformer:
+    """SentenceTransformer stand-in recording how models are loaded."""
+    loads = []
+
+    def __init__(self, model_name_or_path, device="cpu", cache_folder=None, **kwargs):
+        RecordingSentenceTransformer.loads.append(kwargs)
+        self.halved = False
+
+    def half(self):
+        self.halved = True
+        return self
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+    def encode(self, texts, **kwargs):
+        return np.ones(4, dtype=np.float16 if self.halved else np.float32)
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic embeddings with optional noise, standing in for two backends."""
+
+    def __init__(self, noise=0.0):
+        self.noise = noise
+
+    def _vector(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        vector = rng.normal(size=16)
+        if self.noise:
+            vector += np.random.default_rng(len(text)).normal(scale=self.noise, size=16)
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+class TestEmbeddingBackends:
+    """Tests for selectable embedding backends and their accuracy check."""
+
+    def setup_method(self):
+        RecordingSentenceTransformer.loads = []
+
+    @patch("app.embeddings.huggingface_embeddings.SentenceTransformer", RecordingSentenceTransformer)
+    def test_fp16_weights_backend_halves_the_model(self):
+        """The torch-fp16-weights backend converts the weights to float16."""
+        embeddings = HuggingFaceEmbeddings(model_name="test/model", backend="torch-fp16-weights", use_embedding_cache=False)
+
+        assert embeddings._get_model().halved
+        assert embeddings.embed_query("speed") == [1.0, 1.0, 1.0, 1.0]
+
+    @patch("app.embeddings.huggingface_embeddings.SentenceTransformer", RecordingSentenceTransformer)
+    @patch("app.embeddings.huggingface_embeddings.onnx_available", return_value=True)
+    def test_onnx_backend_is_passed_to_sentence_transformers(self, _):
+        """The onnx backend loads the model through ONNX Runtime."""
+        HuggingFaceEmbeddings(model_name="test/model", backend="onnx")._get_model()
+
+        assert RecordingSentenceTransformer.loads == [{"backend": "onnx"}]
+
+    @patch("app.embeddings.huggingface_embeddings.SentenceTransformer", RecordingSentenceTransformer)
+    @patch("app.embeddings.huggingface_embeddings.export_quantized_onnx", side_effect=ImportError("no optimum"))
+    @patch("app.embeddings.huggingface_embeddings.quantize_torch_model", side_effect=lambda model: model)
+    def test_int8_falls_back_to_torch_quantization(self, quantize, export):
+        """Without ONNX Runtime the int8 backend quantizes the PyTorch model."""
+        model = HuggingFaceEmbeddings(model_name="test/model", backend="int8")._get_model()
+
+        quantize.assert_called_once_with(model)
+        assert RecordingSentenceTransformer.loads == [{}]
+
+    @patch("app.embeddings.huggingface_embeddings.SentenceTransformer", RecordingSentenceTransformer)
+    def test_backends_load_separate_models(self):
+        """Each backend of a model is loaded and cached on its own."""
+        torch_model = HuggingFaceEmbeddings(model_name="test/model")._get_model()
+        fp16_model = HuggingFaceEmbeddings(model_name="test/model", backend="torch-fp16-weights")._get_model()
+
+        assert torch_model is not fp16_model
+        assert HuggingFaceEmbeddings(model_name="test/model", backend="torch-fp16-weights")._get_embedding_cache().model_name == "test/model@torch-fp16-weights"
+
+    def test_invalid_backend_falls_back_to_torch(self):
+        """Unknown backends in the configuration are replaced by the default."""
+        config = validate_config({"provider": "huggingface", "embedding_backend": "tensorrt"})
+        assert config["embedding_backend"] == "torch"
+        assert validate_config({"provider": "huggingface", "embedding_backend": "int8"})["embedding_backend"] == "int8"
+
+    def test_accuracy_check(self):
+        """Identical backends have perfect recall, a noisy backend loses some."""
+        texts = [f"# SIGNAL: Signal{i}\nDescription: value {i}" for i in range(60)]
+        queries = default_queries(texts, 20)
+
+        identical = compare_backends(texts, queries, HashEmbeddings(), HashEmbeddings(), "onnx", k=5)
+        noisy = compare_backends(texts, queries, HashEmbeddings(), HashEmbeddings(noise=2.0), "int8", k=5)
+
+        assert queries[0].startswith("SIGNAL: Signal")
+        assert identical.recall_rebuilt == identical.recall_mixed == 1.0
+        assert identical.mean_cosine == pytest.approx(1.0)
+        assert noisy.recall_rebuilt < 1.0
+        assert noisy.mean_cosine < 1.0
+        assert "Recall@5" in noisy.report()
+
+    def test_float16_vectors_check(self):
+        """Rounding vectors to float16 keeps them close to the float32 ones."""
+        texts = [f"# SIGNAL: Signal{i}\nDescription: value {i}" for i in range(60)]
+        rounded = Float16Vectors(HashEmbeddings())
+
+        assert rounded.embed_query("Signal1") == np.float16(HashEmbeddings().embed_query("Signal1")).astype(np.float32).tolist()
+        comparison = compare_backends(texts, default_queries(texts, 20), HashEmbeddings(), rounded, "torch with float16 vectors", k=5)
+        assert comparison.mean_cosine == pytest.approx(1.0, abs=1e-4)
@@ -0,0 +1,153 @@
+import sys
+import time
+import threading
+import numpy as np
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.embeddings.embedding_batcher import EmbeddingBatcher
+from app.embeddings.huggingface_embeddings import HuggingFaceEmbeddings
+
+
+def length_encode(calls):
+    """Encode function returning [len(text), position in batch] rows and recording each batch."""
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+    return encode
+
+
+def run_concurrently(batcher, inputs):
+    """Call the batcher from one thread per input and return the results by input."""
+    results = [None] * len(inputs)
+    barrier = threading.Barrier(len(inputs))
+
+    def call(i):
+        barrier.wait()
+        results[i] = batcher.embed(inputs[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestEmbeddingBatcher:
+    """Tests for micro-batching of concurrent embedding calls."""
+
+    def test_concurrent_calls_share_a_sorted_batch(self):
+        """Calls arriving within the wait window are encoded together, shortest text first."""
+        calls = []
+        batcher = EmbeddingBatcher(length_encode(calls), max_batch_size=16, max_wait_ms=200)
+        inputs = [["a" * (i + 1) * 3] for i in range(4)] + [["bb", "c"]]
+
+        results = run_concurrently(batcher, inputs)
+
+        assert len(calls) == 1
+        assert calls[0] == sorted(calls[0], key=len)
+        # Every caller gets the rows of its own texts back, in its own order
+        for texts, vectors in zip(inputs, results):
+            assert [vector[0] for vector in vectors] == [len(text) for text in texts]
+        stats = batcher.stats()
+        assert stats["batches"] == 1
+        assert stats["requests"] == 5
+        assert stats["mean_fill"] == pytest.approx(6 / 16)
+
+    def test_batches_respect_max_size(self):
+        """A batch closes before it would exceed the size limit."""
+        calls = []
+        batcher = EmbeddingBatcher(length_encode(calls), max_batch_size=4, max_wait_ms=100)
+
+        results = run_concurrently(batcher, [["x" * i] for i in range(1, 11)])
+
+        assert all(len(batch) <= 4 for batch in calls)
+        assert sum(len(batch) for batch in calls) == 10
+        assert [vectors[0][0] for vectors in results] == list(range(1, 11))
+
+    def test_single_call_waits_at_most_max_wait(self):
+        """A lone call is encoded once the wait window has passed."""
+        batcher = EmbeddingBatcher(length_encode([]), max_batch_size=8, max_wait_ms=20)
+        start = time.monotonic()
+
+        assert batcher.embed(["abc"]) == [[3.0, 0.0]]
+        assert time.monotonic() - start < 1.0
+
+    def test_large_calls_do_not_hold_up_queries(self):
+        """A call that fills a batch on its own is encoded on its thread, and queries are batched meanwhile."""
+        calls = []
+        encode_threads = []
+        build_started = threading.Event()
+
+        def encode(texts):
+            encode_threads.append(threading.current_thread().name)
+            if len(texts) >= 4:
+                build_started.set()
+                time.sleep(0.5)
+            return length_encode(calls)(texts)
+
+        batcher = EmbeddingBatcher(encode, max_batch_size=4, max_wait_ms=5, name="batcher")
+        build = threading.Thread(target=batcher.embed, args=(["doc"] * 10,), name="build")
+        build.start()
+        build_started.wait()
+        start = time.monotonic()
+
+        assert batcher.embed(["query"]) == [[5.0, 0.0]]
+        assert time.monotonic() - start < 0.4
+        build.join()
+        assert encode_threads == ["build", "batcher"]
+        assert [len(batch) for batch in calls] == [1, 10]
+        assert batcher.stats()["direct_requests"] == 1
+        assert batcher.stats()["batches"] == 1
+
+    def test_errors_reach_every_caller(self):
+        """A failed batch raises in each call it contained, and the batcher keeps working."""
+        def encode(texts):
+            if "fail" in texts:
+                raise RuntimeError("model error")
+            return np.zeros((len(texts), 2))
+
+        batcher = EmbeddingBatcher(encode, max_batch_size=8, max_wait_ms=5)
+
+        with pytest.raises(RuntimeError):
+            batcher.embed(["fail"])
+        assert batcher.embed(["ok"]) == [[0.0, 0.0]]
+
+    def test_huggingface_queries_are_batched(self, monkeypatch):
+        """Concurrent embed_query calls of HuggingFaceEmbeddings run as one model call."""
+        monkeypatch.setenv("EMBEDDING_MICROBATCH_SIZE", "8")
+        monkeypatch.setenv("EMBEDDING_MICROBATCH_WAIT_MS", "200")
+        calls = []
+
+        class BatchModel:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def get_sentence_embedding_dimension(self):
+                return 3
+
+            def encode(self, texts, **kwargs):
+                calls.append(texts)
+                return np.ones((len(texts), 3), dtype=np.float32)
+
+        with patch("app.embeddings.huggingface_embeddings.SentenceTransformer", BatchModel):
+            embeddings = HuggingFaceEmbeddings(model_name="test/batched-model", use_embedding_cache=False)
+            results = [None] * 4
+
+            def query(i):
+                results[i] = embeddings.embed_query(f"query {i}")
+
+            threads = [threading.Thread(target=query, args=(i,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert results == [[1.0, 1.0, 1.0]] * 4
+        assert sum(len(texts) for texts in calls) == 4
+        assert len(calls) < 4
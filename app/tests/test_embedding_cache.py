@@ -0,0 +1,97 @@
+import os
+import sys
+import subprocess
+import pytest
+from pathlib import Path
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.embeddings.embedding_cache import EmbeddingCache, content_hash
+
+
+class CountingEmbedder:
+    """Embeds texts deterministically and records what it was asked to embed."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def __call__(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 0.5, 0.25, 1.0] for text in texts]
+
+
+class TestEmbeddingCache:
+    """Tests for the persistent content-addressed embedding cache."""
+
+    def test_only_misses_are_embedded(self, temp_dir):
+        """Cached texts are served from disk and duplicates are embedded once."""
+        cache = EmbeddingCache("huggingface", "BAAI/bge-large-en-v1.5", cache_dir=temp_dir, dtype="float32")
+        embedder = CountingEmbedder()
+
+        first = cache.embed_documents(["alpha", "beta", "alpha"], embedder)
+        second = cache.embed_documents(["beta", "gamma"], embedder)
+
+        assert embedder.embedded == ["alpha", "beta", "gamma"]
+        assert first[0] == first[2] == [5.0, 0.5, 0.25, 1.0]
+        assert second[0] == first[1]
+
+    def test_vectors_persist_across_instances(self, temp_dir):
+        """A new cache instance reads the vectors written by a previous one."""
+        cache = EmbeddingCache("openai", "text-embedding-3-large", cache_dir=temp_dir)
+        cache.embed_documents(["requirement text"], CountingEmbedder())
+        cache.flush()
+
+        reopened = EmbeddingCache("openai", "text-embedding-3-large", cache_dir=temp_dir)
+        embedder = CountingEmbedder()
+        vectors = reopened.embed_documents(["requirement text"], embedder)
+
+        assert embedder.embedded == []
+        assert vectors[0] == pytest.approx([16.0, 0.5, 0.25, 1.0], rel=1e-3)
+
+        # Another model never sees these vectors
+        other_model = EmbeddingCache("openai", "text-embedding-3-small", cache_dir=temp_dir)
+        assert other_model.get_many([content_hash("requirement text")]) == [None]
+
+    def test_least_recently_used_vectors_are_evicted(self, temp_dir):
+        """The cache stays within its size limit by evicting the least recently used vectors."""
+        # Room for exactly two float32 vectors of dimension 4
+        cache = EmbeddingCache("huggingface", "test-model", cache_dir=temp_dir, max_bytes=2 * 4 * 4, dtype="float32")
+        embedder = CountingEmbedder()
+
+        cache.embed_documents(["one", "two"], embedder)
+        cache.embed_documents(["one"], embedder)  # "two" is now least recently used
+        cache.embed_documents(["three"], embedder)
+
+        assert len(cache) == 2
+        hits = cache.get_many([content_hash(text) for text in ["one", "two", "three"]])
+        assert hits[0] is not None and hits[1] is None and hits[2] is not None
+        assert os.path.getsize(cache.vectors_path) == 2 * 4 * 4
+
+    def test_cache_stored_in_another_dtype_is_discarded(self, temp_dir):
+        """A float16 cache is not reused when float32 vectors are configured."""
+        cache = EmbeddingCache("huggingface", "test-model", cache_dir=temp_dir, dtype="float16")
+        cache.embed_documents(["one"], CountingEmbedder())
+        cache.flush()
+
+        reopened = EmbeddingCache("huggingface", "test-model", cache_dir=temp_dir)
+
+        assert reopened.dtype.name == "float32"
+        assert len(reopened) == 0
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="directory ownership uses fcntl locks")
+    def test_second_process_uses_its_own_directory(self, temp_dir):
+        """A process never writes into a cache directory owned by another process."""
+        cache = EmbeddingCache("huggingface", "test-model", cache_dir=temp_dir)
+        # Load the module on its own, importing the app.embeddings package would load torch
+        script = (
+            "import sys, importlib.util; "
+            "spec = importlib.util.spec_from_file_location('embedding_cache', sys.argv[1]); "
+            "module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module); "
+            "print(module.EmbeddingCache('huggingface', 'test-model', cache_dir=sys.argv[2]).directory)"
+        )
+        module_path = str(Path(__file__).parent.parent / "embeddings" / "embedding_cache.py")
+        other = subprocess.run([sys.executable, "-c", script, module_path, temp_dir], capture_output=True, text=True, check=True)
+
+        assert other.stdout.strip() == f"{cache.directory}.1"
+        assert EmbeddingCache("huggingface", "test-model", cache_dir=temp_dir).directory == cache.directory
@@ -0,0 +1,119 @@
+import os
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+
+from app.embeddings.db_manager import DBManager, batch_documents_by_size
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic embeddings that can fail on a given call."""
+
+    def __init__(self, fail_on_call=None):
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("embedding service unavailable")
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0, 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0, 0.5]
+
+
+class TestEmbeddingPipeline:
+    """Tests for the batched embed-and-upsert build pipeline."""
+
+    def test_batch_documents_by_size(self):
+        """Batches close on either the character budget or the document limit."""
+        documents = [Document(page_content="x" * length) for length in [40, 40, 30, 200, 10, 10, 10]]
+
+        batches = batch_documents_by_size(documents, max_chars=100, max_documents=2)
+
+        assert batches == [[0, 1], [2], [3], [4, 5], [6]]
+
+    def test_interrupted_build_resumes_from_checkpoint(self, temp_dir):
+        """A failed build leaves a checkpoint, and the next build embeds only the remaining batches."""
+        documents = [
+            Document(page_content=f"requirement number {i}", metadata={"source": "spec.md", "domain": "requirements"})
+            for i in range(10)
+        ]
+        db_manager = DBManager(
+            persist_directory=os.path.join(temp_dir, "chroma_db"),
+            embedding_provider="huggingface",
+            embedding_model="BAAI/bge-large-en-v1.5"
+        )
+
+        failing_embeddings = FakeEmbeddings(fail_on_call=3)
+        with patch("app.embeddings.db_manager.EMBEDDING_BATCH_SIZE", 2), \
+             patch.object(db_manager, "_get_embeddings_function", return_value=failing_embeddings):
+            db, count = db_manager.create_db_from_documents(documents)
+
+        assert (db, count) == (None, 0)
+        assert db_manager._load_build_checkpoint()["completed_batches"] == 1
+        assert db_manager.initialize_db() is None
+
+        resumed_embeddings = FakeEmbeddings()
+        with patch("app.embeddings.db_manager.EMBEDDING_BATCH_SIZE", 2), \
+             patch.object(db_manager, "_get_embeddings_function", return_value=resumed_embeddings):
+            db, count = db_manager.create_db_from_documents(documents)
+
+        # Batch 0 is stored, and batch 1 is rewritten from the embedding cache without embedding it again
+        assert count == 10
+        assert resumed_embeddings.embedded == [doc.page_content for doc in documents[4:]]
+        assert db._collection.count() == 10
+        assert not os.path.exists(db_manager.build_checkpoint_path)
+
+    def test_search_resolves_trace_info_by_stored_id(self, temp_dir):
+        """Vectors carry their doc_id, so search results get trace info without re-hashing or copying."""
+        documents = [
+            Document(page_content=f"service {name} handles file transfer", metadata={"source": f"{name}.json", "domain": "services"})
+            for name in ["FileTransferAgent", "DiagnosticAgent"]
+        ]
+        db_manager = DBManager(
+            persist_directory=os.path.join(temp_dir, "chroma_db"),
+            embedding_provider="huggingface",
+            embedding_model="BAAI/bge-large-en-v1.5"
+        )
+        with patch.object(db_manager, "_get_embeddings_function", return_value=FakeEmbeddings()):
+            db_manager.create_db_from_documents(documents)
+
+        with patch("app.embeddings.db_manager.DocumentTraceability.from_document", side_effect=AssertionError("re-hashed")):
+            results = db_manager.similarity_search("file transfer", k=2)
+
+        assert len(results) == 2
+        for doc in results:
+            assert doc.metadata["trace_info"] == db_manager.get_document_trace(doc.metadata["doc_id"])
+            assert doc.metadata["trace_info"]["source_path"] == doc.metadata["source"]
+
+    def test_build_batches_chunks_of_similar_length(self, temp_dir):
+        """Chunks are embedded shortest first, so each embedding call holds similar lengths."""
+        lengths = [400, 10, 300, 20, 390, 15, 310, 25]
+        documents = [
+            Document(page_content=f"{i}" + "x" * length, metadata={"source": "catalogue.odx", "domain": "diagnostics"})
+            for i, length in enumerate(lengths)
+        ]
+        db_manager = DBManager(
+            persist_directory=os.path.join(temp_dir, "chroma_db"),
+            embedding_provider="huggingface",
+            embedding_model="BAAI/bge-large-en-v1.5"
+        )
+        embeddings = FakeEmbeddings()
+        with patch("app.embeddings.db_manager.EMBEDDING_BATCH_SIZE", 4), \
+             patch.object(db_manager, "_get_embeddings_function", return_value=embeddings):
+            db, count = db_manager.create_db_from_documents(documents)
+
+        assert count == 8
+        assert [len(text) for text in embeddings.embedded] == sorted(len(doc.page_content) for doc in documents)
+        assert db._collection.count() == 8
@@ -12,7 +12,10 @@ from app.api.huggingface_client import (
     HuggingFaceClient,
     ChatCompletion,
     ChatCompletionChoice,
-    ChatCompletionMessage
+    ChatCompletionMessage,
+    ChatCompletionChunk,
+    HuggingFaceAPIError,
+    iter_stream_text
 )
 
 # Remove the skip as we'll use mocking instead
@@ -129,8 +132,10 @@ class TestHuggingFaceClient:
             mock_response.headers = {"Date-Created": "1632546789"}
             mock_response.raise_for_status = MagicMock()
             
-            # Mock the requests.post method
-            with patch("requests.post", return_value=mock_response):
+            mock_response.status_code = 200
+            
+            # Mock the pooled session's post method
+            with patch("requests.Session.post", return_value=mock_response):
                 response = client.chat.create(
                     messages=[{"role": "user", "content": "Hello, who are you?"}],
                     model="meta-llama/Llama-3.3-70B-Instruct"
@@ -185,4 +190,62 @@ class TestHuggingFaceClient:
                 # Validate error response
                 assert isinstance(response, ChatCompletion)
                 assert response.choices[0].finish_reason == "error"
-                assert "API Error" in response.choices[0].message.content 
\ No newline at end of file
+                assert "API Error" in response.choices[0].message.content 
+
+    def _mock_stream_response(self, lines):
+        """Create a mocked streaming response yielding the given event lines."""
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.status_code = 200
+        mock_response.iter_lines.return_value = iter(lines)
+        return mock_response
+
+    def test_mock_streaming_chat_completion(self):
+        """Test that streamed tokens are exposed as OpenAI-style chunks."""
+        with patch.dict(os.environ, {"HUGGINGFACE_API_TOKEN": "mock-token"}):
+            client = get_huggingface_client()
+            lines = [
+                'data:{"token": {"id": 1, "text": "Hello", "special": false}, "generated_text": null}',
+                '',
+                'data:{"token": {"id": 2, "text": " world", "special": false}, "generated_text": null}',
+                '',
+                'data:{"token": {"id": 3, "text": "<|eot_id|>", "special": true}, '
+                '"generated_text": "Hello world", "details": {"finish_reason": "eos_token"}}',
+            ]
+
+            with patch("requests.Session.post", return_value=self._mock_stream_response(lines)) as mock_post:
+                stream = client.chat.create(
+                    messages=[{"role": "user", "content": "Hello"}],
+                    model="meta-llama/Llama-3.3-70B-Instruct",
+                    stream=True
+                )
+                chunks = list(stream)
+
+                # The request asks the API for a token stream
+                assert mock_post.call_args.kwargs["json"]["stream"] is True
+                assert mock_post.call_args.kwargs["stream"] is True
+
+            assert all(isinstance(chunk, ChatCompletionChunk) for chunk in chunks)
+            assert chunks[0].choices[0].delta.role == "assistant"
+            contents = [chunk.choices[0].delta.content for chunk in chunks if chunk.choices[0].delta.content]
+            assert contents == ["Hello", " world"]
+            assert chunks[-1].choices[0].finish_reason == "stop"
+
+    def test_streaming_error_event(self):
+        """Test that an error event ends the stream with an exception."""
+        with patch.dict(os.environ, {"HUGGINGFACE_API_TOKEN": "mock-token"}):
+            client = get_huggingface_client()
+            lines = [
+                'data:{"token": {"id": 1, "text": "Hel", "special": false}, "generated_text": null}',
+                'data:{"error": "Model is overloaded", "error_type": "overloaded"}',
+            ]
+
+            with patch("requests.Session.post", return_value=self._mock_stream_response(lines)):
+                stream = iter_stream_text(client.chat.create(
+                    messages=[{"role": "user", "content": "Hello"}],
+                    model="meta-llama/Llama-3.3-70B-Instruct",
+                    stream=True
+                ))
+                assert next(stream) == "Hel"
+                with pytest.raises(HuggingFaceAPIError, match="Model is overloaded"):
+                    next(stream)
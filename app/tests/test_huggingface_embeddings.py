@@ -10,7 +10,8 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from app.embeddings.huggingface_embeddings import (
     HuggingFaceEmbeddings, 
-    get_huggingface_embeddings
+    get_huggingface_embeddings,
+    encode_in_length_buckets
 )
 
 # Remove the skip as we'll use mocking instead
@@ -117,4 +118,59 @@ class TestHuggingFaceEmbeddings:
         
         # Test embedding
         result = embeddings.embed_query("Test query")
-        assert len(result) == 1024  # GTE-large also has 1024 dimensions 
\ No newline at end of file
+        assert len(result) == 1024  # GTE-large also has 1024 dimensions 
+
+class WordTokenizer:
+    """Tokenizer stand-in counting one token per word plus two special tokens."""
+
+    def __call__(self, texts, **kwargs):
+        return {"input_ids": [[0] * (len(text.split()) + 2) for text in texts]}
+
+
+class BucketRecordingModel:
+    """Model stand-in recording the texts of every encode call."""
+
+    def __init__(self, max_seq_length=8):
+        self.tokenizer = WordTokenizer()
+        self.max_seq_length = max_seq_length
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.batches.append(list(texts))
+        return np.array([[len(text.split()), batch_size] for text in texts], dtype=np.float32)
+
+
+class TestLengthBuckets:
+    """Tests for length-bucketed document encoding."""
+
+    def test_buckets_group_similar_lengths_and_keep_order(self):
+        """Texts are encoded shortest first in uniform batches, and vectors come back in input order."""
+        texts = ["word " * n for n in [1, 9, 2, 8, 1, 3, 20, 2]]
+        model = BucketRecordingModel(max_seq_length=8)
+        progress = []
+
+        vectors, stats = encode_in_length_buckets(model, texts, batch_size=3, progress=lambda done, total: progress.append(done))
+
+        assert vectors[:, 0].tolist() == [len(text.split()) for text in texts]
+        assert [len(batch) for batch in model.batches] == [3, 3, 2]
+        assert [len(text.split()) for text in model.batches[0]] == [1, 1, 2]
+        assert progress == [3, 6, 8]
+        # Lengths are capped at the sequence limit: 9, 8 and 20 words are all 8 tokens to the model
+        assert stats.truncated_texts == 3
+        assert stats.truncated_tokens == (11 - 8) + (10 - 8) + (22 - 8)
+        assert stats.tokens == 3 + 8 + 4 + 8 + 3 + 5 + 8 + 4
+        # Unsorted batches of 3 would process 64 tokens including padding
+        assert stats.padded_tokens == 12 + 24 + 16
+
+    def test_documents_are_encoded_in_buckets(self):
+        """embed_documents passes the configured bucket size to the model."""
+        model = BucketRecordingModel(max_seq_length=512)
+        with patch("app.embeddings.huggingface_embeddings.SentenceTransformer", return_value=model):
+            embeddings = HuggingFaceEmbeddings(model_name="test/bucketed", encode_batch_size=2, use_embedding_cache=False)
+            result = embeddings.embed_documents(["a b c", "a", "a b"])
+
+        assert [vector[0] for vector in result] == [3.0, 1.0, 2.0]
+        assert model.batches == [["a", "a b"], ["a b c"]]
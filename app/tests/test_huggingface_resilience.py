@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import threading
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.api.huggingface_client import HuggingFaceClient, HuggingFaceAPIError
+from app.api.resilience import RetryPolicy, CircuitBreaker, parse_retry_after
+
+MODEL = "meta-llama/Llama-3.3-70B-Instruct"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Inference API stub answering with the scripted responses of its server."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse can be observed
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append((self.path, self.client_address))
+        status, headers, body = self.server.responses.pop(0) if self.server.responses \
+            else (200, {}, [{"generated_text": "ok"}])
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """Run a local stub of the Inference API."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.responses = []
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub_server):
+    """Client pointed at the stub server with near-zero backoff."""
+    return HuggingFaceClient(
+        api_key="mock-token",
+        base_url=f"http://127.0.0.1:{stub_server.server_address[1]}/models",
+        retry_policy=RetryPolicy(max_retries=2, backoff_base=0.01, backoff_max=0.05),
+        failure_threshold=2,
+        reset_timeout=60
+    )
+
+
+def ask(client):
+    """Send one question through the client."""
+    return client.chat.create(messages=[{"role": "user", "content": "Hello"}], model=MODEL)
+
+
+class TestHuggingFaceResilience:
+    """Tests for retries, circuit breaking and connection pooling of the HuggingFace client."""
+
+    def test_connection_reused(self, client, stub_server):
+        """Test that consecutive questions share one keep-alive connection."""
+        for _ in range(3):
+            assert ask(client).choices[0].message.content == "ok"
+
+        assert len(stub_server.requests) == 3
+        assert stub_server.requests[0][0] == f"/models/{MODEL}"
+        assert len({address for _, address in stub_server.requests}) == 1
+
+    def test_retries_model_loading(self, client, stub_server):
+        """Test that 503 and 429 responses are retried until the model answers."""
+        stub_server.responses = [
+            (503, {}, {"error": "Model is currently loading", "estimated_time": 0.01}),
+            (429, {"Retry-After": "0"}, {"error": "Rate limit reached"}),
+            (200, {}, [{"generated_text": "loaded"}]),
+        ]
+
+        assert ask(client).choices[0].message.content == "loaded"
+        metrics = client.metrics.snapshot()[MODEL]
+        assert metrics["requests"] == 1
+        assert metrics["attempts"] == 3
+        assert metrics["retries"] == 2
+        assert "latency_p50" in metrics
+
+    def test_client_error_not_retried(self, client, stub_server):
+        """Test that a client error is raised without retrying."""
+        stub_server.responses = [(401, {}, {"error": "Invalid credentials"})]
+
+        with pytest.raises(HuggingFaceAPIError, match="Invalid credentials") as excinfo:
+            ask(client)
+        assert excinfo.value.status_code == 401
+        assert len(stub_server.requests) == 1
+
+    def test_circuit_opens_after_failures(self, client, stub_server):
+        """Test that a failing model is no longer called once its circuit opens."""
+        stub_server.responses = [(503, {}, {"error": "Service unavailable"})] * 6
+
+        for _ in range(2):
+            with pytest.raises(HuggingFaceAPIError):
+                ask(client)
+        assert len(stub_server.requests) == 6
+
+        with pytest.raises(HuggingFaceAPIError, match="unavailable after repeated failures"):
+            ask(client)
+        assert len(stub_server.requests) == 6
+        assert client.metrics.snapshot()[MODEL]["rejected"] == 1
+
+    def test_unexpected_request_error_releases_trial_call(self, client, stub_server, monkeypatch):
+        """Test that a request error that is not retried still reports the trial call of a half-open circuit."""
+        breaker = client.circuit_breaker(MODEL)
+        breaker.reset_timeout = 0
+        for _ in range(2):
+            breaker.record_failure()
+
+        def redirect_loop(*args, **kwargs):
+            raise requests.exceptions.TooManyRedirects("Exceeded 30 redirects")
+
+        monkeypatch.setattr(client.session, "post", redirect_loop)
+        with pytest.raises(HuggingFaceAPIError, match="redirects"):
+            ask(client)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # The next trial call is let through and closes the circuit
+        monkeypatch.undo()
+        assert ask(client).choices[0].message.content == "ok"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestResiliencePrimitives:
+    """Tests for the retry policy and circuit breaker."""
+
+    def test_retry_delay_honours_server(self):
+        """Test that the server's requested delay is a lower bound and backoff is capped."""
+        policy = RetryPolicy(max_retries=3, backoff_base=1.0, backoff_max=30.0)
+        assert 20.0 <= policy.delay(0, server_delay=20.0) <= 21.0
+        assert policy.delay(0, server_delay=120.0) == 30.0
+        assert all(0 <= policy.delay(10) <= 30.0 for _ in range(20))
+        assert parse_retry_after("7") == 7.0
+        assert parse_retry_after(None) is None
+
+    def test_circuit_half_open(self):
+        """Test that an open circuit lets one trial call through after the timeout."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
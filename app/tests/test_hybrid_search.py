@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+
+from app.retrieval.hybrid_search import build_metadata_filter, hybrid_search, reciprocal_rank_fusion, run_stages
+from app.retrieval.engine import RetrievalEngine
+from app.utils.event_sink import CollectingSink
+
+
+class TestHybridSearch:
+    """Tests for the metadata stage of hybrid search."""
+
+    def test_build_metadata_filter(self):
+        """All term/field pairs are combined into one $or filter, scoped by domain."""
+        metadata_filter, conditions = build_metadata_filter(["ReadDataByIdentifier", "DTC"], "standards")
+
+        assert len(conditions) == 16
+        assert ("normalized_name", "readdatabyidentifier") in conditions
+        assert ("service_name", "ReadDataByIdentifier") in conditions
+        or_clause, domain_clause = metadata_filter["$and"]
+        assert domain_clause == {"domain": "standards"}
+        assert {"service_name": {"$in": ["DTC"]}} in or_clause["$or"]
+
+    def test_metadata_stage_uses_one_search(self, temp_dir):
+        """One combined metadata search runs, ranked by the number of matched conditions."""
+        partial_match = Document(page_content="partial", metadata={"service_name": "ReadDataByIdentifier"})
+        full_match = Document(page_content="full", metadata={
+            "service_name": "ReadDataByIdentifier",
+            "normalized_service_name": "readdatabyidentifier"
+        })
+        semantic_only = Document(page_content="semantic", metadata={})
+
+        db = MagicMock()
+        # The stages run concurrently, so answer by filter rather than by call order
+        db.similarity_search_by_vector.side_effect = lambda vector, k, filter: (
+            [partial_match, full_match] if filter else [semantic_only, partial_match]
+        )
+
+        with patch("app.retrieval.hybrid_search.get_retrieval_logger"), \
+             patch("app.retrieval.hybrid_search.embed_query_cached", return_value=[0.1, 0.2]), \
+             patch("app.retrieval.hybrid_search.extract_technical_terms", return_value=["ReadDataByIdentifier"]):
+            results = hybrid_search(db, "readdatabyidentifier service", "ReadDataByIdentifier service", k=3)
+
+        # "partial" is ranked by both the metadata and the semantic search, so fusion puts it first
+        assert db.similarity_search_by_vector.call_count == 2
+        assert [doc.page_content for doc in results] == ["partial", "full", "semantic"]
+
+    def test_identifier_and_bm25_results_are_fused(self, temp_dir):
+        """Identifier matches and BM25 hits are fetched by ID and fused with the vector results."""
+        identifier_index = MagicMock()
+        identifier_index.lookup.return_value = ["id-2", "id-1"]
+
+        db = MagicMock()
+        db.get.return_value = {
+            "ids": ["id-1", "id-2"],
+            "documents": ["first", "second"],
+            "metadatas": [{"source": "a.json"}, None]
+        }
+        db.similarity_search_by_vector.return_value = [Document(page_content="semantic", metadata={})]
+        bm25_index = MagicMock()
+        bm25_index.search.return_value = [("id-1", 3.2)]
+
+        with patch("app.retrieval.hybrid_search.get_retrieval_logger"), \
+             patch("app.retrieval.hybrid_search.embed_query_cached", return_value=[0.1, 0.2]):
+            results = hybrid_search(db, "dtc b1a2f-11", "DTC B1A2F-11", k=5, identifier_index=identifier_index, bm25_index=bm25_index)
+
+        identifier_index.lookup.assert_called_once_with(["b1a2f-11"], limit=5)
+        db.get.assert_any_call(ids=["id-2", "id-1"], where=None, include=["documents", "metadatas"])
+        bm25_index.search.assert_called_once_with("dtc b1a2f-11", k=5)
+        assert [doc.page_content for doc in results] == ["first", "second", "semantic"]
+
+    def test_reciprocal_rank_fusion(self):
+        """Documents ranked by several lists outrank those found by one, ties keep first appearance."""
+        a, b, c = (Document(page_content=text, metadata={}) for text in ["a", "b", "c"])
+
+        fused = reciprocal_rank_fusion([[a, b], [c, b], [b, b]])
+
+        assert [doc.page_content for doc in fused] == ["b", "a", "c"]
+
+    def test_errors_go_to_sink(self):
+        """Search errors are reported to the sink and the domain filter is applied without session state."""
+        db = MagicMock()
+        db.similarity_search_by_vector.side_effect = [ValueError("bad filter"), [Document(page_content="semantic", metadata={})]]
+        sink = CollectingSink()
+
+        with patch("app.retrieval.hybrid_search.get_retrieval_logger"), \
+             patch("app.retrieval.hybrid_search.embed_query_cached", return_value=[0.1, 0.2]), \
+             patch("app.retrieval.hybrid_search.extract_technical_terms", return_value=[]):
+            results = hybrid_search(db, "query", "query", k=3, domain_filter="services", sink=sink)
+
+        assert db.similarity_search_by_vector.call_args_list[0].kwargs["filter"] == {"domain": "services"}
+        assert [doc.page_content for doc in results] == ["semantic"]
+        assert [level for level, _ in sink.messages] == ["warning"]
+        assert {name for name, _, _ in sink.metrics} == {"retrieval_stage_seconds", "retrieval_results", "retrieval_seconds"}
+
+
+class TestRetrievalStages:
+    """Tests for the concurrent execution of the retrieval stages."""
+
+    def test_stages_run_concurrently(self):
+        """Independent stages overlap, so the total time is that of the slowest stage."""
+        def stage(value):
+            def run():
+                time.sleep(0.3)
+                return value
+            return run
+
+        start_time = time.monotonic()
+        outcomes = run_stages({"a": stage(1), "b": stage(2), "c": stage(3)}, timeout=5)
+        elapsed = time.monotonic() - start_time
+
+        assert {name: result for name, (result, _, _) in outcomes.items()} == {"a": 1, "b": 2, "c": 3}
+        assert elapsed < 0.6
+
+    def test_stage_errors_are_returned(self):
+        """A failing stage is reported in its outcome without affecting the others."""
+        def fail():
+            raise ValueError("index unavailable")
+
+        outcomes = run_stages({"ok": lambda: [1], "broken": fail}, timeout=5)
+
+        assert outcomes["ok"][:2] == ([1], None)
+        assert isinstance(outcomes["broken"][1], ValueError)
+
+    def test_slow_stage_is_dropped_after_deadline(self):
+        """A stage missing its deadline contributes nothing and the search returns the other results."""
+        db = MagicMock()
+        db.similarity_search_by_vector.return_value = [Document(page_content="semantic", metadata={})]
+        bm25_index = MagicMock()
+        bm25_index.search.side_effect = lambda query, k: time.sleep(1) or []
+        sink = CollectingSink()
+
+        with patch("app.retrieval.hybrid_search.get_retrieval_logger"), \
+             patch("app.retrieval.hybrid_search.RETRIEVAL_STAGE_TIMEOUT", 0.2), \
+             patch("app.retrieval.hybrid_search.embed_query_cached", return_value=[0.1, 0.2]), \
+             patch("app.retrieval.hybrid_search.extract_technical_terms", return_value=[]):
+            start_time = time.monotonic()
+            results = hybrid_search(db, "query", "query", k=3, bm25_index=bm25_index, sink=sink)
+            elapsed = time.monotonic() - start_time
+
+        assert [doc.page_content for doc in results] == ["semantic"]
+        assert elapsed < 0.8
+        assert sink.messages == [("warning", "⚠️ The bm25 search timed out and was skipped.")]
+        assert {tags["stage"] for name, _, tags in sink.metrics if name == "retrieval_stage_seconds"} == {"semantic", "bm25"}
+
+
+class TestRetrievalEngine:
+    """Tests for the UI-independent retrieval engine."""
+
+    def test_search_runs_on_worker_threads(self):
+        """Concurrent searches pass their own domain filters through to hybrid search."""
+        engine = RetrievalEngine(MagicMock(), identifier_index="identifier", bm25_index="bm25")
+        with patch("app.retrieval.engine.hybrid_search", side_effect=lambda *args, **kwargs: [kwargs["domain_filter"]]) as mock_search, \
+             ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda domain: engine.search("Service ID?", domain_filter=domain), ["a", "b", "c", "d"]))
+
+        assert results == [["a"], ["b"], ["c"], ["d"]]
+        assert mock_search.call_count == 4
+        assert mock_search.call_args.kwargs["identifier_index"] == "identifier"
+        assert mock_search.call_args.kwargs["sink"] is engine.sink
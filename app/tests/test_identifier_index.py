@@ -0,0 +1,50 @@
+import os
+import sys
+import pytest
+from pathlib import Path
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+
+from app.embeddings.identifier_index import IdentifierIndex, extract_identifiers
+
+
+class TestIdentifierIndex:
+    """Tests for the identifier inverted index."""
+
+    def test_extract_identifiers(self):
+        """Identifier-like tokens are kept, plain words are not."""
+        text = "Service 0x22 ReadDataByIdentifier reports DTC B1A2F-11 for Vehicle_Speed in the body ECU"
+
+        assert extract_identifiers(text) == ["0x22", "readdatabyidentifier", "b1a2f-11", "vehicle_speed"]
+
+    def test_lookup_ranks_by_matched_terms(self, temp_dir):
+        """Chunks are found by metadata values and text identifiers, most matches first."""
+        index = IdentifierIndex(os.path.join(temp_dir, "identifier_index.json"))
+        index.add_documents(["chunk-1", "chunk-2", "chunk-3"], [
+            Document(page_content="Threat T-042 on the gateway", metadata={"tara_phase": "Threat Analysis", "threat_id": "T-042"}),
+            Document(page_content="DTC B1A2F-11 is set when T-042 occurs", metadata={"content_section": "DTCs"}),
+            Document(page_content="Plain prose without identifiers", metadata={"signal_names": "['VehicleSpeed', 'EngineRpm']"}),
+        ])
+
+        assert index.lookup(["T-042", "B1A2F-11"]) == ["chunk-2", "chunk-1"]
+        assert index.lookup(["threat analysis"]) == ["chunk-1"]
+        assert index.lookup(["EngineRpm"]) == ["chunk-3"]
+        assert index.lookup(["unknown"]) == []
+
+    def test_persistence_and_removal(self, temp_dir):
+        """The index survives a reload and removed chunks disappear from it."""
+        index_path = os.path.join(temp_dir, "identifier_index.json")
+        index = IdentifierIndex(index_path)
+        index.add_documents(["chunk-1", "chunk-2"], [
+            Document(page_content="P0420 catalyst efficiency", metadata={}),
+            Document(page_content="P0420 and P0430", metadata={}),
+        ])
+        index.remove_ids(["chunk-1"])
+        index.save()
+
+        reloaded = IdentifierIndex(index_path)
+        assert reloaded.lookup(["p0420"]) == ["chunk-2"]
+        assert reloaded.lookup(["P0430"]) == ["chunk-2"]
@@ -0,0 +1,202 @@
+import os
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+
+from app.embeddings.db_manager import DBManager
+from app.embeddings.document_tracking import SourceFingerprint, assign_chunk_ids
+
+
+def _write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic embeddings that record the texts they embed."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+class TestIncrementalSync:
+    """Tests for fingerprint-based incremental re-indexing."""
+
+    def test_fingerprint_reuses_hash_when_unchanged(self, temp_dir):
+        """An unchanged file keeps the previous hash without being re-read."""
+        file_path = os.path.join(temp_dir, "spec.md")
+        _write(file_path, "# Spec")
+
+        first = SourceFingerprint.from_file(file_path, domain="requirements")
+        previous = SourceFingerprint.from_dict({**first.to_dict(), "content_hash": "cached"})
+        second = SourceFingerprint.from_file(file_path, domain="requirements", previous=previous)
+
+        assert second.content_hash == "cached"
+        assert second.path == os.path.abspath(file_path)
+
+    def test_detect_source_changes(self, temp_dir):
+        """Added, changed, removed and unchanged files are classified correctly."""
+        data_dir = os.path.join(temp_dir, "data")
+        os.makedirs(data_dir)
+        unchanged_path = os.path.join(data_dir, "unchanged.md")
+        changed_path = os.path.join(data_dir, "changed.md")
+        removed_path = os.path.join(data_dir, "removed.md")
+        for path in [unchanged_path, changed_path, removed_path]:
+            _write(path, f"content of {os.path.basename(path)}")
+
+        db_manager = DBManager(
+            persist_directory=os.path.join(temp_dir, "chroma_db"),
+            embedding_provider="huggingface",
+            embedding_model="BAAI/bge-large-en-v1.5"
+        )
+        for path in [unchanged_path, changed_path, removed_path]:
+            fingerprint = SourceFingerprint.from_file(path, domain="requirements")
+            db_manager.tracking_index["source_fingerprints"][fingerprint.path] = fingerprint.to_dict()
+
+        os.unlink(removed_path)
+        _write(changed_path, "new content with a different size")
+        added_path = os.path.join(data_dir, "added.md")
+        _write(added_path, "brand new file")
+
+        source_files = [(path, "requirements") for path in [unchanged_path, changed_path, added_path]]
+        changes = db_manager.detect_source_changes(source_files)
+
+        assert [fp.path for fp in changes.added] == [os.path.abspath(added_path)]
+        assert [fp.path for fp in changes.changed] == [os.path.abspath(changed_path)]
+        assert [fp.path for fp in changes.removed] == [os.path.abspath(removed_path)]
+        assert [fp.path for fp in changes.unchanged] == [os.path.abspath(unchanged_path)]
+
+    def test_sync_sources_replaces_changed_source(self, temp_dir):
+        """Syncing deletes the stale vectors of a changed file and embeds only its new chunks."""
+        file_path = os.path.join(temp_dir, "spec.md")
+        _write(file_path, "v1")
+
+        db_manager = DBManager(
+            persist_directory=os.path.join(temp_dir, "chroma_db"),
+            embedding_provider="huggingface",
+            embedding_model="BAAI/bge-large-en-v1.5"
+        )
+        old_fingerprint = SourceFingerprint.from_file(file_path, domain="requirements")
+        old_fingerprint.attach_documents([Document(page_content="v1", metadata={"source": "spec.md"})])
+        db_manager.tracking_index["source_fingerprints"][old_fingerprint.path] = old_fingerprint.to_dict()
+
+        db_manager.db = MagicMock()
+        db_manager.db.get.return_value = {"ids": ["old-1", "old-2"]}
+        db_manager.add_documents = MagicMock(return_value=True)
+
+        _write(file_path, "version two")
+        changes = db_manager.detect_source_changes([(file_path, "requirements")])
+        new_docs = [Document(page_content="version two", metadata={"source": "spec.md", "domain": "requirements"})]
+        added, removed = db_manager.sync_sources(changes, {changes.changed[0].path: new_docs})
+
+        assert (added, removed) == (1, 2)
+        db_manager.db.delete.assert_called_once_with(ids=["old-1", "old-2"])
+        db_manager.add_documents.assert_called_once_with(new_docs)
+        stored = db_manager.tracking_index["source_fingerprints"][os.path.abspath(file_path)]
+        assert stored["content_hash"] == changes.changed[0].content_hash
+        assert stored["sources"] == ["spec.md"]
+
+
+class TestSourceUpserts:
+    """Tests for deterministic chunk IDs and per-source upserts."""
+
+    def _chunks(self, source, texts):
+        return [Document(page_content=text, metadata={"source": source, "domain": "requirements"}) for text in texts]
+
+    def test_assign_chunk_ids(self):
+        """IDs combine source, position and content hash; repeats are dropped only within a source."""
+        documents = self._chunks("a.md", ["intro", "body", "intro"]) + self._chunks("b.md", ["intro"])
+
+        unique_documents, ids = assign_chunk_ids(documents)
+
+        assert [doc.metadata["source"] for doc in unique_documents] == ["a.md", "a.md", "b.md"]
+        assert ids[0].startswith("a.md::0::") and ids[1].startswith("a.md::1::") and ids[2].startswith("b.md::0::")
+        assert ids[0].split("::")[2] == ids[2].split("::")[2]
+        assert assign_chunk_ids(documents)[1] == ids
+
+    def test_readding_a_source_replaces_its_chunks(self, temp_dir):
+        """Re-adding a changed source embeds only changed chunks and deletes the outdated ones."""
+        db_manager = DBManager(
+            persist_directory=os.path.join(temp_dir, "chroma_db"),
+            embedding_provider="huggingface",
+            embedding_model="BAAI/bge-large-en-v1.5"
+        )
+        embeddings = CountingEmbeddings()
+        with patch.object(db_manager, "_get_embeddings_function", return_value=embeddings):
+            db_manager.create_db_from_documents(self._chunks("spec.md", ["one", "two", "three"]) + self._chunks("other.md", ["four"]))
+            embeddings.embedded.clear()
+
+            assert db_manager.add_documents(self._chunks("spec.md", ["one", "two, revised"]))
+
+        assert embeddings.embedded == ["two, revised"]
+        assert db_manager.db._collection.count() == 3
+        assert sorted(db_manager.db.get(where={"source": "spec.md"})["documents"]) == ["one", "two, revised"]
+        assert len(db_manager.get_documents_by_source("spec.md")) == 2
+
+        assert db_manager.delete_source("spec.md") == 2
+        assert db_manager.db._collection.count() == 1
+        assert db_manager.get_source_documents() == ["other.md"]
+        assert db_manager.bm25_index.search("revised", k=5) == []
+
+    def test_same_named_files_are_removed_independently(self, temp_dir):
+        """Changing or deleting a file keeps the chunks of a same-named file in another domain."""
+        db_manager = DBManager(
+            persist_directory=os.path.join(temp_dir, "chroma_db"),
+            embedding_provider="huggingface",
+            embedding_model="BAAI/bge-large-en-v1.5"
+        )
+        paths = {domain: os.path.join(temp_dir, domain, "spec.md") for domain in ["requirements", "services"]}
+        documents = []
+        fingerprints = []
+        for domain, path in paths.items():
+            os.makedirs(os.path.dirname(path))
+            _write(path, f"{domain} v1")
+            chunks = [Document(page_content=f"{domain} {text}", metadata={"source": "spec.md", "source_file": path, "domain": domain})
+                      for text in ["intro", "body"]]
+            documents.extend(chunks)
+            fingerprints.append(SourceFingerprint.from_file(path, domain=domain).attach_documents(chunks))
+
+        with patch.object(db_manager, "_get_embeddings_function", return_value=CountingEmbeddings()):
+            db_manager.create_db_from_documents(documents, source_fingerprints=fingerprints)
+
+            _write(paths["requirements"], "requirements v2, longer")
+            changes = db_manager.detect_source_changes([(path, domain) for domain, path in paths.items()])
+            new_docs = [Document(page_content="requirements revised", metadata={"source": "spec.md", "source_file": paths["requirements"], "domain": "requirements"})]
+            added, removed = db_manager.sync_sources(changes, {paths["requirements"]: new_docs})
+
+        assert (added, removed) == (1, 2)
+        assert sorted(db_manager.db.get()["documents"]) == ["requirements revised", "services body", "services intro"]
+
+        assert db_manager.delete_source(paths["services"]) == 2
+        assert db_manager.db.get()["documents"] == ["requirements revised"]
+        assert list(db_manager.tracking_index["source_fingerprints"]) == [os.path.abspath(paths["requirements"])]
+
+    def test_chunk_logs_show_chunk_ids(self, temp_dir, monkeypatch):
+        """Chunk logs name chunks by the IDs they are stored under."""
+        monkeypatch.setattr("app.embeddings.db_manager.log_directory", os.path.join(temp_dir, "log"))
+        db_manager = DBManager(
+            persist_directory=os.path.join(temp_dir, "chroma_db"),
+            embedding_provider="huggingface",
+            embedding_model="BAAI/bge-large-en-v1.5"
+        )
+        with patch.object(db_manager, "_get_embeddings_function", return_value=CountingEmbeddings()):
+            db_manager.create_db_from_documents(self._chunks("spec.md", ["one", "two"]))
+
+        with open(os.path.join(temp_dir, "log", "requirements", "spec.md.log")) as f:
+            log = f.read()
+        for doc_id in db_manager.db.get()["ids"]:
+            assert f"ID: {doc_id})" in log
@@ -0,0 +1,49 @@
+import os
+import sys
+import pytest
+from pathlib import Path
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+
+from app.document_processors.ingestion import IngestionEngine, collect_source_files
+
+
+def _fake_process_file(file_path, domain):
+    """Module-level so it can be pickled into worker processes."""
+    if file_path.endswith("broken.md"):
+        raise ValueError("malformed file")
+    if file_path.endswith(".bin"):
+        return None
+    return [Document(page_content=os.path.basename(file_path), metadata={"domain": domain})]
+
+
+class TestIngestionEngine:
+    """Tests for the process-pool ingestion engine."""
+
+    def test_collect_source_files_sorted_and_skips_backups(self, temp_dir):
+        """Files are collected in a stable order and backup files are skipped."""
+        os.makedirs(os.path.join(temp_dir, "sub"))
+        for name in ["b.md", "a.md", "a.md.bak", os.path.join("sub", "c.md")]:
+            with open(os.path.join(temp_dir, name), "w") as f:
+                f.write(name)
+
+        source_files = collect_source_files(temp_dir, "requirements")
+
+        assert [os.path.relpath(path, temp_dir) for path, _ in source_files] == ["a.md", "b.md", os.path.join("sub", "c.md")]
+        assert all(domain == "requirements" for _, domain in source_files)
+
+    @pytest.mark.parametrize("max_workers", [1, 2])
+    def test_process_files_keeps_order_and_reports_errors(self, max_workers):
+        """Results follow the input order and a failing file does not abort the run."""
+        source_files = [("one.md", "standards"), ("broken.md", "standards"), ("blob.bin", "standards"), ("two.md", "catalogues")]
+
+        results = IngestionEngine(process_file=_fake_process_file, max_workers=max_workers).process_files(source_files)
+
+        assert [result.file_path for result in results] == [path for path, _ in source_files]
+        assert results[0].documents[0].page_content == "one.md"
+        assert results[1].documents is None and "malformed file" in results[1].error
+        assert results[2].documents is None and results[2].error is None
+        assert results[3].documents[0].metadata["domain"] == "catalogues"
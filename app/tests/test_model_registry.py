@@ -0,0 +1,85 @@
+import sys
+import time
+import threading
+import numpy as np
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.embeddings.model_registry import ModelRegistry, model_key, get_model_registry
+from app.embeddings.huggingface_embeddings import HuggingFaceEmbeddings
+
+
+class CountingSentenceTransformer:
+    """SentenceTransformer stand-in that counts how often a model is loaded."""
+    loads = 0
+
+    def __init__(self, model_name_or_path, device="cpu", cache_folder=None, **kwargs):
+        CountingSentenceTransformer.loads += 1
+        time.sleep(0.05)
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+    def encode(self, texts, **kwargs):
+        if isinstance(texts, list):
+            return np.ones((len(texts), 8), dtype=np.float32)
+        return np.ones(8, dtype=np.float32)
+
+
+class TestModelRegistry:
+    """Tests for the process-wide model registry."""
+
+    def test_concurrent_requests_share_one_load(self):
+        """Threads asking for the same model wait for a single load."""
+        registry = ModelRegistry()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(registry.get("model", loader))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert len({id(model) for model in models}) == 1
+
+    def test_warmup_loads_in_background(self):
+        """A warmup loads the model once; a failed warmup leaves the load to the first query."""
+        registry = ModelRegistry()
+        thread = registry.warmup("model", lambda: "loaded")
+        thread.join()
+
+        assert registry.is_loaded("model")
+        assert registry.warmup("model", lambda: "again") is None
+
+        registry.warmup("broken", lambda: 1 / 0).join()
+        assert not registry.is_loaded("broken")
+        assert registry.get("broken", lambda: "retried") == "retried"
+
+    def test_model_key_covers_load_options(self):
+        """Models loaded with different options are kept apart."""
+        assert model_key("bge", "cpu", None, {"a": 1, "b": 2}) == model_key("bge", "cpu", None, {"b": 2, "a": 1})
+        assert model_key("bge", "cpu") != model_key("bge", "cuda")
+
+    @patch("app.embeddings.huggingface_embeddings.SentenceTransformer", CountingSentenceTransformer)
+    def test_embeddings_instances_share_the_model(self):
+        """Every session's HuggingFaceEmbeddings uses the same loaded model."""
+        CountingSentenceTransformer.loads = 0
+        first = HuggingFaceEmbeddings(model_name="test/model", use_embedding_cache=False)
+        second = HuggingFaceEmbeddings(model_name="test/model", use_embedding_cache=False)
+
+        first.warmup()
+        second.embed_query("engine speed")
+
+        assert first._get_model() is second._get_model()
+        assert CountingSentenceTransformer.loads == 1
+        assert get_model_registry().is_loaded(second._model_key())
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import pytest
+import numpy as np
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.embeddings.query_cache import QueryEmbeddingCache, embed_query_cached, get_query_cache
+from app.embeddings.huggingface_embeddings import HuggingFaceEmbeddings
+
+
+class TestQueryEmbeddingCache:
+    """Tests for the process-wide query vector cache."""
+
+    def test_lru_eviction(self):
+        """Entries beyond the size limit are evicted least recently used first."""
+        cache = QueryEmbeddingCache(max_entries=2, ttl_seconds=60)
+        cache.put("a", [1.0])
+        cache.put("b", [2.0])
+        cache.get("a")
+        cache.put("c", [3.0])
+
+        assert cache.get("a") == [1.0]
+        assert cache.get("b") is None
+        assert cache.get("c") == [3.0]
+
+    def test_entries_expire(self):
+        """Expired entries are recomputed."""
+        cache = QueryEmbeddingCache(max_entries=10, ttl_seconds=0.01)
+        compute = MagicMock(side_effect=[[1.0], [2.0]])
+
+        assert cache.get_or_compute("query", compute) == [1.0]
+        time.sleep(0.02)
+        assert cache.get_or_compute("query", compute) == [2.0]
+        assert compute.call_count == 2
+
+    def test_embed_query_encodes_once(self):
+        """Repeated queries through HuggingFaceEmbeddings only hit the model once."""
+        get_query_cache().clear()
+        model = MagicMock()
+        model.encode.return_value = np.ones(4, dtype=np.float32)
+
+        with patch("app.embeddings.huggingface_embeddings.SentenceTransformer", return_value=model):
+            embeddings = HuggingFaceEmbeddings(model_name="test-model")
+            first = embed_query_cached(embeddings, "ReadDataByIdentifier")
+            second = embeddings.embed_query("ReadDataByIdentifier")
+
+        assert first == second == [1.0, 1.0, 1.0, 1.0]
+        assert model.encode.call_count == 1
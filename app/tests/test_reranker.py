@@ -0,0 +1,104 @@
+import sys
+import time
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+
+from app.retrieval.reranker import CrossEncoderReranker
+from app.retrieval.engine import RetrievalEngine
+from app.utils.event_sink import CollectingSink
+
+
+def make_model(delay=0.0):
+    """Fake cross-encoder scoring a pair by the number of "relevant" words in the chunk."""
+    model = MagicMock()
+
+    def predict(pairs, batch_size, show_progress_bar):
+        time.sleep(delay)
+        return [text.count("relevant") for _, text in pairs]
+
+    model.predict.side_effect = predict
+    return model
+
+
+class TestCrossEncoderReranker:
+    """Tests for the cross-encoder reranking stage."""
+
+    def test_rerank_orders_by_score(self):
+        """Documents are reordered by cross-encoder score and cut to top_n."""
+        documents = [Document(page_content=text, metadata={}) for text in ["noise", "relevant relevant", "relevant"]]
+        sink = CollectingSink()
+        with patch("app.retrieval.reranker.CrossEncoder", return_value=make_model()):
+            reranked = CrossEncoderReranker().rerank("query", documents, top_n=2, sink=sink)
+
+        assert [doc.page_content for doc in reranked] == ["relevant relevant", "relevant"]
+        assert ("rerank_scored", 3, {"candidates": 3}) in sink.metrics
+
+    def test_batches_group_similar_lengths(self):
+        """Pairs are sorted by length and batches stay within the padded token budget."""
+        reranker = CrossEncoderReranker(batch_tokens=1024, max_length=512)
+        documents = [Document(page_content="x" * length, metadata={}) for length in [4000, 40, 2000, 400, 40]]
+
+        batches = reranker.make_batches("q", documents)
+
+        assert [[i for i, _ in batch] for batch in batches] == [[1, 4, 3], [2, 0]]
+        assert all(len(batch) * batch[-1][1] <= 1024 for batch in batches)
+
+    def test_time_budget_leaves_rest_in_retrieval_order(self):
+        """Once the budget is used up, the remaining candidates keep their retrieval positions."""
+        reranker = CrossEncoderReranker(time_budget=0.05, batch_tokens=512, max_length=512)
+        documents = [Document(page_content=text * 300, metadata={}) for text in ["long ", "relevant ", "longer "]]
+        documents.insert(0, Document(page_content="relevant", metadata={}))
+
+        with patch("app.retrieval.reranker.CrossEncoder", return_value=make_model(delay=0.1)):
+            reranked = reranker.rerank("query", documents)
+
+        # Only the shortest chunk fits in the first batch before the budget is exhausted
+        assert reranked[0].page_content == "relevant"
+        assert [doc.page_content[:6] for doc in reranked[1:]] == ["long l", "releva", "longer"]
+
+    def test_time_budget_does_not_promote_short_low_ranked_chunks(self):
+        """Short chunks scored first are reordered among their own positions, not moved ahead of better retrieved ones."""
+        reranker = CrossEncoderReranker(time_budget=0.05, batch_tokens=512, max_length=512)
+        documents = [Document(page_content=text * 300, metadata={}) for text in ["long ", "longer "]]
+        documents += [Document(page_content=text, metadata={}) for text in ["noise", "relevant"]]
+
+        with patch("app.retrieval.reranker.CrossEncoder", return_value=make_model(delay=0.1)):
+            reranked = reranker.rerank("query", documents)
+
+        assert [doc.page_content[:6] for doc in reranked] == ["long l", "longer", "releva", "noise"]
+
+    def test_model_load_failure_keeps_order(self):
+        """If the model cannot be loaded, retrieval order is kept."""
+        documents = [Document(page_content=text, metadata={}) for text in ["a", "b", "c"]]
+        with patch("app.retrieval.reranker.CrossEncoder", side_effect=OSError("offline")):
+            assert CrossEncoderReranker().rerank("query", documents, top_n=2) == documents[:2]
+
+    def test_warmup_loads_model_once_for_all_instances(self):
+        """A query during or after the warmup uses the model it loaded, also from another instance."""
+        documents = [Document(page_content=text, metadata={}) for text in ["noise", "relevant"]]
+        with patch("app.retrieval.reranker.CrossEncoder", return_value=make_model()) as mock_cross_encoder:
+            CrossEncoderReranker().warmup()
+            reranked = CrossEncoderReranker().rerank("query", documents)
+
+        assert reranked[0].page_content == "relevant"
+        assert mock_cross_encoder.call_count == 1
+
+    def test_engine_reranks_wider_pool(self):
+        """The engine retrieves the reranker's candidate pool and returns the best k."""
+        documents = [Document(page_content=text, metadata={}) for text in ["noise"] * 10 + ["relevant"]]
+        reranker = CrossEncoderReranker(candidates=50)
+        engine = RetrievalEngine(MagicMock(), reranker=reranker)
+
+        with patch("app.retrieval.engine.hybrid_search", return_value=documents) as mock_search, \
+             patch("app.retrieval.reranker.CrossEncoder", return_value=make_model()):
+            results = engine.search("query", k=5, processed_query="query")
+
+        assert mock_search.call_args.kwargs["k"] == 50
+        assert len(results) == 5
+        assert results[0].page_content == "relevant"
@@ -0,0 +1,68 @@
+import os
+import sys
+import glob
+import gzip
+import json
+import pytest
+from pathlib import Path
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_core.documents.base import Document
+
+from app.retrieval.retrieval_logger import RetrievalLogger
+
+
+def _read_records(log_dir):
+    records = []
+    for path in sorted(glob.glob(os.path.join(log_dir, "retrieval_*.jsonl.gz"))):
+        with gzip.open(path, "rt") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+class TestRetrievalLogger:
+    """Tests for the background retrieval log writer."""
+
+    def test_session_written_as_one_record(self, temp_dir):
+        """All sections of a retrieval end up in one compressed JSONL record."""
+        logger = RetrievalLogger(log_dir=temp_dir, compression="gzip")
+        session = logger.session(original_query="What is 0x22?", k=5)
+        session.log_event("technical_terms", {"terms": ["0x22"]})
+        session.log_documents("final_combined_results", [Document(page_content="0x22 reads data", metadata={"source": "uds.md"})])
+        session.close()
+        logger.flush()
+
+        records = _read_records(temp_dir)
+        assert len(records) == 1
+        assert records[0]["original_query"] == "What is 0x22?"
+        assert records[0]["sections"]["final_combined_results"]["documents"][0] == {
+            "index": 0, "content": "0x22 reads data", "metadata": {"source": "uds.md"}
+        }
+        assert "duration" in records[0]["timing"]
+
+    def test_unsampled_sessions_keep_only_errors(self, temp_dir):
+        """With a sample rate of zero only error sections are written."""
+        logger = RetrievalLogger(log_dir=temp_dir, sample_rate=0.0, compression="gzip")
+        quiet = logger.session(original_query="ok")
+        quiet.log_event("technical_terms", {"terms": []})
+        quiet.close()
+        failing = logger.session(original_query="broken")
+        failing.log_event("error_standard_search", {"error": "boom"}, error=True)
+        failing.close()
+        logger.flush()
+
+        records = _read_records(temp_dir)
+        assert [record["original_query"] for record in records] == ["broken"]
+
+    def test_rotation_respects_disk_budget(self, temp_dir):
+        """Full files are rotated and the oldest are deleted beyond the disk budget."""
+        logger = RetrievalLogger(log_dir=temp_dir, max_file_bytes=1, max_total_bytes=200, compression="gzip")
+        for i in range(10):
+            logger.submit({"sections": {"query": {"text": f"question {i}" * 20}}})
+            logger.flush()
+
+        log_files = glob.glob(os.path.join(temp_dir, "retrieval_*.jsonl.gz"))
+        assert 1 < len(log_files) < 10
+        assert sum(os.path.getsize(path) for path in log_files) <= 200 + max(os.path.getsize(path) for path in log_files)
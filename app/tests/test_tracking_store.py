@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import pytest
+from pathlib import Path
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.embeddings.tracking_store import TrackingStore
+
+
+def trace(source, domain="services", file_type="json"):
+    """Traceability info as stored by DBManager._track_document."""
+    return {"source_path": source, "domain": domain, "file_type": file_type, "filename": os.path.basename(source)}
+
+
+class TestTrackingStore:
+    """Tests for the journaled document tracking index."""
+
+    def test_changes_are_appended_to_the_journal(self, temp_dir):
+        """After the first snapshot, saves only append the new changes."""
+        path = os.path.join(temp_dir, "tracking_index.json")
+        store = TrackingStore(path)
+        store.track("a", trace("a.json"))
+        store.save()
+        snapshot = Path(path).read_text()
+
+        store.track("b", trace("b.json", domain="signals"))
+        store.remove(["a"])
+        store.save()
+
+        assert Path(path).read_text() == snapshot
+        records = [json.loads(line) for line in Path(store.journal_path).read_text().splitlines()]
+        assert [record["op"] for record in records] == ["header", "track", "remove"]
+
+        reloaded = TrackingStore(path)
+        assert list(reloaded["documents"]) == ["b"]
+        assert list(reloaded["domains"]) == ["signals"]
+        assert reloaded["total_documents"] == 1
+
+    def test_secondary_indexes_follow_documents(self, temp_dir):
+        """Source, domain and file type indexes are updated on track, replace and remove."""
+        store = TrackingStore(os.path.join(temp_dir, "tracking_index.json"))
+        store.track("a", trace("a.json"))
+        store.track("b", trace("a.json"))
+        store.track("b", trace("a.json", domain="signals"))
+
+        assert store.ids_for("sources", "a.json") == ["a", "b"]
+        assert store.ids_for("domains", "services") == ["a"]
+        assert store.remove_source("a.json") == {"a", "b"}
+        assert store["sources"] == {}
+        assert store["domains"] == {}
+
+    def test_journal_is_compacted(self, temp_dir, monkeypatch):
+        """The journal is folded into a new snapshot once it outgrows it."""
+        monkeypatch.setattr("app.embeddings.tracking_store.MIN_COMPACTION_RECORDS", 3)
+        path = os.path.join(temp_dir, "tracking_index.json")
+        store = TrackingStore(path)
+        store.track("a", trace("a.json"))
+        store.save()
+        store.track("b", trace("b.json"))
+        store.remove(["a"])
+        store.save()
+        assert os.path.exists(store.journal_path)
+
+        store.track("c", trace("c.json"))
+        store.save()
+
+        assert not os.path.exists(store.journal_path)
+        assert set(TrackingStore(path)["documents"]) == {"b", "c"}
+
+    def test_stale_journal_is_ignored(self, temp_dir):
+        """A journal left behind by an interrupted compaction is not replayed."""
+        path = os.path.join(temp_dir, "tracking_index.json")
+        store = TrackingStore(path)
+        store.track("a", trace("a.json"))
+        store.save()
+        store.track("b", trace("b.json"))
+        store.save()
+        stale_journal = Path(store.journal_path).read_text()
+
+        store.remove(["b"])
+        store.compact()
+        Path(store.journal_path).write_text(stale_journal)
+
+        assert list(TrackingStore(path)["documents"]) == ["a"]
+
+    def test_fingerprints_and_legacy_index(self, temp_dir):
+        """Indexes written by older versions load, and fingerprint edits are persisted."""
+        path = os.path.join(temp_dir, "tracking_index.json")
+        with open(path, "w") as f:
+            json.dump({
+                "documents": {"a": trace("a.json")},
+                "sources": {"a.json": ["a"]},
+                "domains": {"services": ["a"]},
+                "file_types": {"json": ["a"]},
+                "source_fingerprints": {},
+                "total_documents": 1,
+                "created": "2024-01-01T00:00:00"
+            }, f, indent=2)
+
+        store = TrackingStore(path)
+        assert store.ids_for("file_types", "json") == ["a"]
+        store["source_fingerprints"]["/data/a.json"] = {"content_hash": "abc"}
+        store.save()
+
+        reloaded = TrackingStore(path)
+        assert reloaded["source_fingerprints"] == {"/data/a.json": {"content_hash": "abc"}}
+        assert reloaded["created"] == "2024-01-01T00:00:00"
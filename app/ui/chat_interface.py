@@ -3,7 +3,12 @@ from typing import List, Dict, Any, Optional
 from openai import OpenAI
 
 from retrieval.query_preprocessing import preprocess_query
-from retrieval.hybrid_search import hybrid_search
+from app.retrieval.engine import RetrievalEngine
+from app.retrieval.reranker import get_reranker
+from app.retrieval.answer_cache import get_answer_cache, chunk_id
+from app.embeddings.query_cache import embed_query_cached
+from app.utils.event_sink import StreamlitSink
+from app.utils.context_packing import pack_context
 from ui.styling import format_user_message, format_assistant_message
 
 
@@ -27,18 +32,20 @@ def display_chat_history():
             st.markdown(f"<div class='{role_class}'>{message['content']}</div>", unsafe_allow_html=True)
 
 
-def process_query(query: str, vector_db: Any) -> Optional[str]:
+def process_query(query: str, vector_db: Any, identifier_index: Any = None, bm25_index: Any = None) -> Optional[str]:
     """Process a user query and generate a response.
     
     This function:
     1. Preprocesses the query
     2. Retrieves relevant documents
     3. Formats the context
-    4. Generates a response using OpenAI
+    4. Generates a response using OpenAI, unless the answer is cached
 
     Args:
         query: User query text
         vector_db: Vector database for document retrieval
+        identifier_index: Optional IdentifierIndex for exact identifier matches
+        bm25_index: Optional BM25Index for keyword search
         
     Returns:
         Generated response text or None if processing fails
@@ -46,18 +53,48 @@ def process_query(query: str, vector_db: Any) -> Optional[str]:
     if not vector_db:
         return "❌ No document database available. Please rebuild the index."
 
+    # Model parameters
+    model_params = {
+        'model': 'gpt-4o-mini',  # Use the specified model
+        'temperature': 0.3,  # Lower temperature for more deterministic responses
+        'max_tokens': 4000,
+        'top_p': 0.85,
+        'frequency_penalty': 0.5,
+        'presence_penalty': 0.1
+    }
+    answer_cache = get_answer_cache()
+    answer_model = f"openai:{model_params['model']}"
+    
     # Preprocess the query
     processed_query = preprocess_query(query)
     
+    # A near-duplicate of an earlier question skips retrieval and the LLM call
+    query_vector = None
+    if answer_cache.similarity_threshold is not None:
+        query_vector = embed_query_cached(vector_db.embeddings, processed_query)
+        cached_answer = answer_cache.find_similar(query, query_vector, answer_model, model_params)
+        if cached_answer is not None:
+            return cached_answer
+    
     # Retrieve relevant documents
-    retrieved_docs = hybrid_search(vector_db, processed_query, query, k=20)
+    retrieval_engine = RetrievalEngine(vector_db, identifier_index, bm25_index, sink=StreamlitSink(), reranker=get_reranker())
+    retrieved_docs = retrieval_engine.search(query, k=20, domain_filter=st.session_state.get("domain_filter"), processed_query=processed_query)
     
     if not retrieved_docs:
         return "❌ No relevant information found in the knowledge base."
     
+    # Pack the most relevant chunks into the context token budget of the model
+    packed = pack_context(retrieved_docs, model=model_params['model'])
+    
+    # The same question over the same chunks was answered before
+    answer_chunk_ids = [chunk_id(doc) for doc in packed.documents]
+    cached_answer = answer_cache.get(query, answer_chunk_ids, answer_model, model_params)
+    if cached_answer is not None:
+        return cached_answer
+    
     # Format source information
     source_info_list = []
-    for i, doc in enumerate(retrieved_docs[:5]):
+    for i, doc in enumerate(packed.documents):
         source_type = doc.metadata.get('source_type', 'Unknown')
         source = doc.metadata.get('source', 'Unknown')
         
@@ -79,7 +116,7 @@ def process_query(query: str, vector_db: Any) -> Optional[str]:
     source_info = "\n".join(source_info_list)
     
     # Combine context from top documents
-    context_text = "\n\n---\n\n".join([doc.page_content for doc in retrieved_docs[:5]])
+    context_text = packed.text
     
     # Create a prompt for the model
     # System message to set context and expectations
@@ -122,16 +159,6 @@ def process_query(query: str, vector_db: Any) -> Optional[str]:
         
         client = OpenAI(api_key=api_key)
         
-        # Model parameters
-        model_params = {
-            'model': 'gpt-4o-mini',  # Use the specified model
-            'temperature': 0.3,  # Lower temperature for more deterministic responses
-            'max_tokens': 4000,
-            'top_p': 0.85,
-            'frequency_penalty': 0.5,
-            'presence_penalty': 0.1
-        }
-        
         # Create the message list
         messages = [{'role': 'user', 'content': prompt}]
         
@@ -149,6 +176,7 @@ def process_query(query: str, vector_db: Any) -> Optional[str]:
         if not answer.lower().endswith("sources:") and "sources:" not in answer.lower():
             answer += f"\n\n**Sources:**\n{source_info}"
         
+        answer_cache.put(query, answer_chunk_ids, answer_model, model_params, answer, query_vector=query_vector)
         return answer
     
     except Exception as e:
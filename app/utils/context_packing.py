@@ -0,0 +1,174 @@
+import os
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from langchain_core.documents.base import Document
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Tokens of retrieved text placed in the prompt
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+
+# Separator between chunks in the prompt
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+# Encoding used for models tiktoken does not know, e.g. HuggingFace models
+FALLBACK_ENCODING = "cl100k_base"
+
+# Rough estimate when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+_encodings: Dict[Optional[str], Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def _get_encoding(model: Optional[str]) -> Any:
+    """Get the tiktoken encoding of a model, or None if tiktoken cannot provide one."""
+    with _encodings_lock:
+        if model not in _encodings:
+            encoding = None
+            if tiktoken is not None:
+                try:
+                    encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(FALLBACK_ENCODING)
+                except KeyError:
+                    encoding = _get_fallback_encoding()
+                except Exception as e:
+                    # The encoding files are downloaded on first use and may be unavailable offline
+                    logger.warning(f"Could not load tokenizer for {model}, estimating token counts: {str(e)}")
+            _encodings[model] = encoding
+        return _encodings[model]
+
+
+def _get_fallback_encoding() -> Any:
+    """Get the fallback encoding, or None if it cannot be loaded."""
+    try:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer {FALLBACK_ENCODING}, estimating token counts: {str(e)}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count the tokens of a text for an LLM.
+
+    Args:
+        text: Text to count
+        model: LLM name. Models unknown to tiktoken are counted with cl100k_base
+
+    Returns:
+        Number of tokens
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Cut a text to at most max_tokens tokens."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def split_blocks(text: str) -> List[str]:
+    """Split a chunk into blank-line separated blocks."""
+    return [block.strip() for block in text.split("\n\n") if block.strip()]
+
+
+def strip_seen_header(text: str, seen_blocks: Set[str]) -> str:
+    """Remove the leading blocks of a chunk that are already in the context.
+
+    Processors prefix chunks with a summary of their document (e.g. every signal
+    chunk repeats the signal database summary), so the first chunk of a document
+    keeps the header and later chunks of it only add their own content.
+
+    Args:
+        text: Chunk text
+        seen_blocks: Blocks of the chunks packed so far
+
+    Returns:
+        Chunk text without the repeated header, empty if nothing new remains
+    """
+    blocks = split_blocks(text)
+    start = 0
+    while start < len(blocks) and blocks[start] in seen_blocks:
+        start += 1
+    return "\n\n".join(blocks[start:]) if start else text.strip()
+
+
+@dataclass
+class PackedContext:
+    """Chunks selected for the prompt within a token budget."""
+    text: str
+    documents: List[Document] = field(default_factory=list)
+    tokens: int = 0
+    skipped: int = 0  # Chunks left out because they did not fit
+    duplicate_header_tokens: int = 0  # Tokens saved by removing repeated headers
+
+
+def get_context_token_budget() -> int:
+    """Token budget of the prompt context, read from CONTEXT_TOKEN_BUDGET."""
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", DEFAULT_CONTEXT_TOKEN_BUDGET))
+
+
+def pack_context(documents: List[Document], token_budget: Optional[int] = None,
+                 model: Optional[str] = None) -> PackedContext:
+    """Fill a token budget with retrieved chunks in order of relevance.
+
+    Chunks are taken best first with their repeated headers removed. A chunk that
+    does not fit is skipped and smaller, less relevant chunks may still fill the
+    rest of the budget. The best chunk is truncated rather than dropped if it
+    alone exceeds the budget.
+
+    Args:
+        documents: Retrieved documents, best first
+        token_budget: Maximum tokens of the packed text. Defaults to CONTEXT_TOKEN_BUDGET
+        model: LLM the tokens are counted for
+
+    Returns:
+        PackedContext with the text and the documents it contains
+    """
+    token_budget = get_context_token_budget() if token_budget is None else token_budget
+    separator_tokens = count_tokens(CHUNK_SEPARATOR, model)
+    packed = PackedContext(text="")
+    parts = []
+    seen_blocks: Set[str] = set()
+    seen_texts: Set[str] = set()
+
+    for doc in documents:
+        if doc.page_content in seen_texts:
+            continue
+        text = strip_seen_header(doc.page_content, seen_blocks)
+        if not text:
+            continue
+        tokens = count_tokens(text, model)
+        header_tokens = count_tokens(doc.page_content.strip(), model) - tokens if text != doc.page_content.strip() else 0
+        cost = tokens + (separator_tokens if parts else 0)
+
+        if packed.tokens + cost > token_budget:
+            if parts:
+                packed.skipped += 1
+                continue
+            text = truncate_to_tokens(text, token_budget, model)
+            tokens = cost = count_tokens(text, model)
+
+        packed.duplicate_header_tokens += header_tokens
+        parts.append(text)
+        packed.documents.append(doc)
+        packed.tokens += cost
+        seen_texts.add(doc.page_content)
+        seen_blocks.update(split_blocks(doc.page_content))
+
+    packed.text = CHUNK_SEPARATOR.join(parts)
+    return packed
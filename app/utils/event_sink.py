@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import logging
+import subprocess
+import threading
+from typing import Any, Dict, List, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class EventSink:
+    """Receiver of user-facing messages and metrics from indexing and retrieval code.
+
+    Library code reports through a sink instead of calling Streamlit, so it can
+    run on worker threads, in the HTTP API or in scripts. The base class
+    discards everything; subclasses decide where messages go.
+    """
+
+    def info(self, message: str):
+        """Report progress or a neutral notice."""
+
+    def success(self, message: str):
+        """Report a completed operation."""
+
+    def warning(self, message: str):
+        """Report a recoverable problem."""
+
+    def error(self, message: str):
+        """Report a failed operation."""
+
+    def restart_required(self, message: str):
+        """Report that the application must be restarted to recover."""
+        self.error(message)
+
+    def metric(self, name: str, value: float, **tags: Any):
+        """Record a numeric measurement, e.g. the duration of a retrieval step."""
+
+
+class LoggingSink(EventSink):
+    """Sink writing messages to the Python log. Safe to use from any thread."""
+
+    def __init__(self, log: logging.Logger = logger):
+        self.log = log
+
+    def info(self, message: str):
+        self.log.info(message)
+
+    def success(self, message: str):
+        self.log.info(message)
+
+    def warning(self, message: str):
+        self.log.warning(message)
+
+    def error(self, message: str):
+        self.log.error(message)
+
+    def metric(self, name: str, value: float, **tags: Any):
+        self.log.debug(f"metric {name}={value} {tags}")
+
+
+class CollectingSink(LoggingSink):
+    """Sink that also keeps messages and metrics in memory, e.g. for an API response or tests."""
+
+    def __init__(self, log: logging.Logger = logger):
+        super().__init__(log)
+        self.messages: List[Tuple[str, str]] = []
+        self.metrics: List[Tuple[str, float, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    def _add(self, level: str, message: str):
+        with self._lock:
+            self.messages.append((level, message))
+
+    def info(self, message: str):
+        super().info(message)
+        self._add("info", message)
+
+    def success(self, message: str):
+        super().success(message)
+        self._add("success", message)
+
+    def warning(self, message: str):
+        super().warning(message)
+        self._add("warning", message)
+
+    def error(self, message: str):
+        super().error(message)
+        self._add("error", message)
+
+    def metric(self, name: str, value: float, **tags: Any):
+        super().metric(name, value, **tags)
+        with self._lock:
+            self.metrics.append((name, value, tags))
+
+
+class StreamlitSink(LoggingSink):
+    """Sink rendering messages in the Streamlit app. Use it from the script thread only."""
+
+    def __init__(self, log: logging.Logger = logger):
+        super().__init__(log)
+        import streamlit as st
+        self.st = st
+
+    def info(self, message: str):
+        self.st.info(message)
+
+    def success(self, message: str):
+        self.st.success(message)
+
+    def warning(self, message: str):
+        self.st.warning(message)
+
+    def error(self, message: str):
+        self.st.error(message)
+
+    def restart_required(self, message: str):
+        """Show the message with a button that restarts the Streamlit app."""
+        self.st.warning(message)
+        if not self.st.button("🔄 Restart Application"):
+            return
+
+        # Get the full path to the main.py file
+        main_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "main.py"))
+
+        # Start a new process to run the Streamlit app
+        print(f"Restarting app using: {sys.executable} -m streamlit run {main_path}")
+        try:
+            # Start a new process directly with the current Python executable
+            # which already has the conda environment activated
+            subprocess.Popen([sys.executable, "-m", "streamlit", "run", main_path])
+
+            # Add a sleep to ensure the new process has time to start
+            print("Waiting for new process to start...")
+            time.sleep(2)
+
+            # Exit the current process with success code
+            print("Exiting current process...")
+            os._exit(0)
+        except Exception as e:
+            print(f"Error in restart process: {str(e)}")
+            # If something goes wrong, we should still exit
+            os._exit(1)
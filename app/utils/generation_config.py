@@ -47,6 +47,7 @@ class ConfigDict(TypedDict, total=False):
     provider: str
     embedding_provider: str
     embedding_model: str
+    embedding_backend: str
     llm_provider: str
     llm_model: str
     default_configs: ProviderConfigs
@@ -64,6 +65,15 @@ EMBEDDING_PROVIDERS = {
     }
 }
 
+# Inference backends for local (HuggingFace) embedding models
+EMBEDDING_BACKENDS = {
+    "torch": "PyTorch, float32",
+    "onnx": "ONNX Runtime, float32",
+    "int8": "ONNX Runtime, int8 dynamic quantization",
+    "torch-fp16-weights": "PyTorch, float16 weights (CUDA only, no speedup on CPU)"
+}
+DEFAULT_EMBEDDING_BACKEND = "torch"
+
 LLM_PROVIDERS = {
     "openai": {
         "display_name": "OpenAI",
@@ -80,7 +90,8 @@ DEFAULT_GENERATION_PARAMS = {
     "huggingface": {
         "temperature": 0.3,
         "max_tokens": 4000,
-        "top_p": 0.85
+        "top_p": 0.85,
+        "stream": True
     },
     "openai": {
         "temperature": 0.3,
@@ -101,6 +112,7 @@ DEFAULT_CONFIG: ConfigDict = {
     "provider": "huggingface",
     "embedding_provider": "huggingface",
     "embedding_model": "BAAI/bge-large-en-v1.5",
+    "embedding_backend": DEFAULT_EMBEDDING_BACKEND,
     "llm_provider": "huggingface",
     "llm_model": "meta-llama/Llama-3.3-70B-Instruct",
     "default_configs": {
@@ -252,6 +264,13 @@ class ModelConfigManager:
             else:
                 result["embedding_model"] = embedding_model
         
+        # Handle embedding backend
+        embedding_backend = config.get("embedding_backend", DEFAULT_EMBEDDING_BACKEND)
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            logger.warning(f"Invalid embedding backend '{embedding_backend}'. Using default: {DEFAULT_EMBEDDING_BACKEND}")
+            embedding_backend = DEFAULT_EMBEDDING_BACKEND
+        result["embedding_backend"] = embedding_backend
+        
         # Handle LLM provider
         if "llm_provider" not in config:
             result["llm_provider"] = result["provider"]
@@ -310,7 +329,7 @@ class ModelConfigManager:
                     logger.warning(f"Could not read existing config file: {str(e)}. Creating new file.")
             
             # Update only the necessary fields while preserving the rest
-            for field in ["provider", "embedding_provider", "embedding_model", "llm_provider", "llm_model", "default_configs"]:
+            for field in ["provider", "embedding_provider", "embedding_model", "embedding_backend", "llm_provider", "llm_model", "default_configs"]:
                 if field in config:
                     existing_config[field] = config[field]
             
@@ -359,6 +378,14 @@ class ModelConfigManager:
         """
         return self._config["embedding_model"]
     
+    def get_embedding_backend(self) -> str:
+        """Get the inference backend of local embedding models.
+        
+        Returns:
+            Embedding backend name
+        """
+        return self._config.get("embedding_backend", DEFAULT_EMBEDDING_BACKEND)
+    
     def get_llm_provider(self) -> str:
         """Get the LLM provider.
         
@@ -469,6 +496,7 @@ def get_model_config() -> Dict[str, str]:
         "provider": config["provider"],
         "embedding_provider": config["embedding_provider"],
         "embedding_model": config["embedding_model"],
+        "embedding_backend": config.get("embedding_backend", DEFAULT_EMBEDDING_BACKEND),
         "llm_provider": config["llm_provider"],
         "llm_model": config["llm_model"]
     }
@@ -527,7 +555,7 @@ if __name__ == "__main__":
     
     print("Current model configuration:")
     print(f"Provider: {config_manager.get_provider()}")
-    print(f"Embedding: {config_manager.get_embedding_provider()} / {config_manager.get_embedding_model()}")
+    print(f"Embedding: {config_manager.get_embedding_provider()} / {config_manager.get_embedding_model()} ({config_manager.get_embedding_backend()} backend)")
     print(f"LLM: {config_manager.get_llm_provider()} / {config_manager.get_llm_model()}")
     
     print("\nGeneration parameters:")
@@ -25,6 +25,8 @@ from app.utils.generation_config import (
     get_available_providers as get_available_providers_v2,
     save_config_to_file as save_config_to_file_v2,
     EMBEDDING_PROVIDERS,
+    EMBEDDING_BACKENDS,
+    DEFAULT_EMBEDDING_BACKEND,
     LLM_PROVIDERS
 )
 
@@ -36,6 +38,7 @@ DEFAULT_CONFIG = {
     "provider": "huggingface",
     "embedding_provider": "huggingface",
     "embedding_model": "BAAI/bge-large-en-v1.5",
+    "embedding_backend": DEFAULT_EMBEDDING_BACKEND,
     "llm_provider": "huggingface",
     "llm_model": "meta-llama/Llama-3.3-70B-Instruct"
 }
@@ -88,7 +91,7 @@ def save_config_to_file(config: Dict[str, str]) -> bool:
         
         # Update only the necessary fields while preserving the rest
         # Core configuration values
-        for field in ["provider", "embedding_provider", "embedding_model", "llm_provider", "llm_model"]:
+        for field in ["provider", "embedding_provider", "embedding_model", "embedding_backend", "llm_provider", "llm_model"]:
             if field in config:
                 existing_config[field] = config[field]
         
@@ -143,7 +146,7 @@ def get_model_config() -> Dict[str, str]:
     config = validate_config(config)
     
     # Log the active configuration
-    logger.info(f"Active model configuration: embedding={config['embedding_provider']}:{config['embedding_model']}, llm={config['llm_provider']}:{config['llm_model']}")
+    logger.info(f"Active model configuration: embedding={config['embedding_provider']}:{config['embedding_model']} ({config['embedding_backend']}), llm={config['llm_provider']}:{config['llm_model']}")
     
     return config
 
@@ -191,6 +194,12 @@ def validate_config(config: Dict[str, str]) -> Dict[str, str]:
         logger.warning(f"Invalid embedding model for provider '{config['embedding_provider']}'. Using default: {default_model}")
         config["embedding_model"] = default_model
     
+    # Check embedding backend (only used by local HuggingFace models)
+    if config.get("embedding_backend") not in EMBEDDING_BACKENDS:
+        if "embedding_backend" in config:
+            logger.warning(f"Invalid embedding backend '{config['embedding_backend']}'. Using default: {DEFAULT_EMBEDDING_BACKEND}")
+        config["embedding_backend"] = DEFAULT_EMBEDDING_BACKEND
+    
     # Check LLM provider
     if "llm_provider" not in config:
         config["llm_provider"] = config["provider"]
@@ -237,6 +246,7 @@ if __name__ == "__main__":
     print(f"Provider: {config['provider']}")
     print(f"Embedding Provider: {config['embedding_provider']}")
     print(f"Embedding Model: {config['embedding_model']}")
+    print(f"Embedding Backend: {config['embedding_backend']}")
     print(f"LLM Provider: {config['llm_provider']}")
     print(f"LLM Model: {config['llm_model']}")
     
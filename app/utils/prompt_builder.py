@@ -0,0 +1,135 @@
+from typing import List, Optional, Tuple
+
+from langchain_core.documents.base import Document
+
+from app.api.document_tracing import format_trace_info
+from app.utils.context_packing import pack_context
+
+NO_DOCUMENTS_SOURCE_INFO = "❌ **No relevant information found.**"
+NO_DATABASE_SOURCE_INFO = "❌ **No document database available.**"
+NO_CONTEXT_TEXT = "No context available."
+
+
+def format_source_info(documents: List[Document]) -> str:
+    """Format the deduplicated source list of the given documents.
+
+    Args:
+        documents: Documents placed in the prompt
+
+    Returns:
+        Markdown bullet list with one line per distinct source
+    """
+    source_info_dict = {}  # Use a dictionary to deduplicate sources
+    for doc in documents:
+        # Use trace info if available
+        trace_info = doc.metadata.get("trace_info", None)
+        if trace_info:
+            source_info = format_trace_info(trace_info)
+            source_info_dict[source_info] = f"- {source_info}"
+        else:
+            # Fall back to standard metadata
+            source_type = doc.metadata.get('source_type', 'Unknown')
+            source = doc.metadata.get('source', 'Unknown')
+
+            if source_type == 'pdf':
+                page = doc.metadata.get('page', 'N/A')
+                source_info_dict[f"{source}:{page}"] = f"- {source}, Page: {page}"
+            else:
+                # For JSON, add relevant metadata details
+                service_id = doc.metadata.get('service_id', '')
+                service_name = doc.metadata.get('service_name', '')
+                instance_id = doc.metadata.get('instance_id', '')
+
+                # Create a unique key for each source combination
+                if instance_id:
+                    key = f"{source}:{service_name}:{service_id}:{instance_id}"
+                    source_info_dict[key] = f"- {source} (Service: {service_name}, Service ID: {service_id}, Instance ID: {instance_id})"
+                elif service_id or service_name:
+                    key = f"{source}:{service_name}:{service_id}"
+                    source_info_dict[key] = f"- {source} (Service: {service_name}, ID: {service_id})"
+                else:
+                    source_info_dict[source] = f"- {source}"
+
+    # Convert the deduplicated dictionary values to a list
+    return "\n".join(source_info_dict.values())
+
+
+def build_context(retrieved_docs: List[Document], model: Optional[str] = None,
+                  token_budget: Optional[int] = None) -> Tuple[str, str, List[Document]]:
+    """Build the context text and source list from retrieved documents.
+
+    The most relevant documents are packed into the context token budget, see
+    pack_context, and the source list only cites the documents that were packed.
+
+    Args:
+        retrieved_docs: Retrieved documents, best first
+        model: LLM the tokens are counted for
+        token_budget: Maximum tokens of the context text. Defaults to CONTEXT_TOKEN_BUDGET
+
+    Returns:
+        A tuple of the context text, the formatted source info and the packed documents
+    """
+    if not retrieved_docs:
+        return NO_CONTEXT_TEXT, NO_DOCUMENTS_SOURCE_INFO, []
+
+    packed = pack_context(retrieved_docs, token_budget=token_budget, model=model)
+    return packed.text, format_source_info(packed.documents), packed.documents
+
+
+def build_prompt(user_question: str, context_text: str, source_info: str) -> str:
+    """Build the LLM prompt for a question over the retrieved context.
+
+    Args:
+        user_question: Question as asked by the user
+        context_text: Text of the retrieved documents
+        source_info: Formatted source list the answer must cite
+
+    Returns:
+        Prompt text
+    """
+    return f"""
+        ## SYSTEM ROLE
+        You are an AI assistant specializing in automotive development documentation. Provide concise, accurate answers based only on the given context. Your expertise covers interface communications, system architectures, protocols, and automotive standards.
+
+        ## USER QUESTION
+        "{user_question}"
+
+        ## CONTEXT
+        '''
+        {context_text}
+        '''
+
+        ## INSTRUCTIONS
+        - Focus on technical details present in the provided context
+        - Pay special attention to exact IDs, especially Instance IDs, Service IDs, and other numerical identifiers
+        - Do not try to infer values - only respond with information explicitly stated in the context
+        - Be precise with numerical values - never substitute one ID for another
+        - If asked about an ID or value and it's explicitly shown in the context, quote the exact value
+        - If the information isn't present in the context, clearly state so
+        - Explain automotive terms and concepts when relevant
+        - For JSON interface definitions, precisely report attribute values as they appear in the data
+        - When dealing with file transfer or management services, pay special attention to the service name, ID and methods
+        - For technical terms like "FileTransferAgent", ensure you connect it to natural language terms like "file transfer service"
+        - Make direct connections between technical identifiers and their functional descriptions
+        - When asked about a specific service, verify you're using information from the correct service definition
+        - ALWAYS include source attribution in your response exactly as formatted in the Sources section
+        - Copy the entire Sources section with all bullet points intact, without modification
+
+        ## RESPONSE FORMAT
+
+           **Answer:** [Concise response]
+
+        📌 **Key Insights:**
+        - Bullet point 1
+        - Bullet point 2
+        - Bullet point 3
+
+        📖 **Sources:**
+        Important: List each source once, with no duplications. Copy and preserve the exact format below:
+
+        Example:
+        - example.pdf, Page: 42
+        - example.json (Service: ExampleService, ID: SVC-123)
+
+        {source_info}
+        """
@@ -10,7 +10,6 @@ import time
 import logging
 import subprocess
 import json
-from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 # Add project root to Python path
@@ -38,15 +37,7 @@ def initialize_database():
         from dotenv import load_dotenv
         from app.embeddings import DBManager
         from app.utils.model_config import get_model_config
-        from langchain_core.documents.base import Document
-        
-        # Import document processors
-        from app.document_processors import (
-            PDFProcessor, JSONProcessor, MarkdownProcessor, 
-            ExcelProcessor, CSVProcessor, ARXMLProcessor, 
-            ODXProcessor, FMEAProcessor, SignalDatabaseProcessor, 
-            TARAProcessor
-        )
+        from app.document_processors.ingestion import collect_source_files
         
         # Load environment variables
         load_dotenv()
@@ -66,6 +57,7 @@ def initialize_database():
         
         if vector_db:
             logger.info("✅ SUCCESS: Existing database found and loaded successfully")
+            sync_database(db_manager)
             return True
         
         logger.info("No existing database found - creating new database...")
@@ -78,9 +70,10 @@ def initialize_database():
         domains = ["requirements", "catalogues", "standards"]
         logger.info(f"Processing domains: {domains}")
         
-        # Process documents from each domain
+        # Collect files from each domain, so a single worker pool processes all of them
         all_documents = []
-        files_processed = 0
+        source_fingerprints = []
+        source_files = []
         
         for domain in domains:
             domain_dir = os.path.join(data_dir, domain)
@@ -88,18 +81,18 @@ def initialize_database():
                 logger.warning(f"Domain directory not found: {domain_dir}")
                 continue
             
-            logger.info(f"Processing domain directory: {domain_dir}")
-            domain_files_processed = process_directory(domain_dir, domain, all_documents)
-            files_processed += domain_files_processed
-            logger.info(f"Processed {domain_files_processed} files in {domain} domain")
+            domain_files = collect_source_files(domain_dir, domain)
+            source_files.extend(domain_files)
+            logger.info(f"Found {len(domain_files)} files in {domain} domain")
         
+        files_processed = process_source_files(source_files, all_documents, source_fingerprints)
         logger.info(f"Total files processed: {files_processed}")
         logger.info(f"Total document chunks created: {len(all_documents)}")
         
         # Create database from documents
         if all_documents:
             logger.info("Creating database from processed documents...")
-            vector_db, unique_doc_count = db_manager.create_db_from_documents(all_documents)
+            vector_db, unique_doc_count = db_manager.create_db_from_documents(all_documents, source_fingerprints)
             
             if vector_db:
                 logger.info(f"✅ SUCCESS: Database created with {unique_doc_count} unique documents")
@@ -117,79 +110,88 @@ def initialize_database():
         logger.error(f"Traceback: {traceback.format_exc()}")
         return False
 
-def process_directory(directory_path, domain, all_documents):
+def sync_database(db_manager):
     """
-    Process all files in a directory and add documents to the list.
-    Returns the number of files processed.
+    Incrementally re-index the files that were added, changed or removed since the last build.
+    Returns the SourceChangeSet that was applied.
     """
-    files_processed = 0
+    from app.document_processors.ingestion import collect_source_files
     
-    try:
-        for root, dirs, files in os.walk(directory_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                
-                try:
-                    processor = get_processor_for_file(file_path, domain)
-                    if processor:
-                        logger.info(f"Processing file: {file_path}")
-                        documents = processor.process_file(file_path)  # FIXED: Changed from process() to process_file()
-                        if documents:
-                            all_documents.extend(documents)
-                            files_processed += 1
-                            logger.info(f"Added {len(documents)} chunks from {file}")
-                        else:
-                            logger.warning(f"No documents extracted from {file}")
-                    else:
-                        logger.info(f"No processor available for file: {file}")
-                        
-                except Exception as e:
-                    logger.error(f"Error processing file {file_path}: {str(e)}")
-                    continue
-                    
-    except Exception as e:
-        logger.error(f"Error processing directory {directory_path}: {str(e)}")
+    data_dir = os.path.join(project_root, "data")
+    domains = ["requirements", "catalogues", "standards"]
     
-    return files_processed
+    source_files = []
+    for domain in domains:
+        domain_dir = os.path.join(data_dir, domain)
+        if os.path.exists(domain_dir):
+            source_files.extend(collect_source_files(domain_dir, domain))
+    
+    logger.info(f"Checking {len(source_files)} source files for changes...")
+    changes = db_manager.detect_source_changes(source_files)
+    if not changes.has_changes:
+        logger.info("Database is up to date with the document directories")
+        return changes
+    
+    from app.document_processors.ingestion import IngestionEngine, process_file
+    
+    documents_by_path = {}
+    to_process = list(changes.to_process)
+    results = IngestionEngine(process_file=process_file).process_files(
+        [(fingerprint.path, fingerprint.domain) for fingerprint in to_process]
+    )
+    for fingerprint, result in zip(to_process, results):
+        if result.error:
+            logger.error(f"Error processing file {fingerprint.path}: {result.error}")
+            # Leave the file out of this sync so it is retried next time
+            if fingerprint in changes.added:
+                changes.added.remove(fingerprint)
+            else:
+                changes.changed.remove(fingerprint)
+            continue
+        documents_by_path[fingerprint.path] = result.documents or []
+    
+    added_count, removed_count = db_manager.sync_sources(changes, documents_by_path)
+    logger.info(f"Synced {len(changes.added)} added, {len(changes.changed)} changed and {len(changes.removed)} removed files "
+                f"({added_count} chunks submitted, {removed_count} vectors removed)")
+    return changes
 
-def get_processor_for_file(file_path, domain):
+def process_source_files(source_files, all_documents, source_fingerprints=None):
     """
-    Get the appropriate processor for a file based on its extension.
+    Process files in worker processes and add their documents to the list, in input file order.
+    Optionally appends a fingerprint of every processed file to source_fingerprints.
+    Returns the number of files processed.
     """
-    from app.document_processors import (
-        PDFProcessor, JSONProcessor, MarkdownProcessor, 
-        ExcelProcessor, CSVProcessor, ARXMLProcessor, 
-        ODXProcessor, FMEAProcessor, SignalDatabaseProcessor, 
-        TARAProcessor
-    )
+    from app.document_processors.ingestion import IngestionEngine, process_file
+    from app.embeddings.document_tracking import SourceFingerprint
     
-    file_extension = Path(file_path).suffix.lower()
-    filename = Path(file_path).name.lower()
+    files_processed = 0
     
-    # Map file extensions to processors
-    if file_extension == '.pdf':
-        return PDFProcessor(domain=domain)
-    elif file_extension == '.json':
-        if 'fmea' in filename:
-            return FMEAProcessor(domain=domain)
-        elif 'tara' in filename or 'threat' in filename or 'risk' in filename:
-            return TARAProcessor(domain=domain)
-        elif 'signal' in filename or 'database' in filename:
-            return SignalDatabaseProcessor(domain=domain)
+    for result in IngestionEngine(process_file=process_file).process_files(source_files):
+        file = os.path.basename(result.file_path)
+        
+        if result.error:
+            logger.error(f"Error processing file {result.file_path}: {result.error}")
+            continue
+        
+        documents = result.documents
+        if documents:
+            all_documents.extend(documents)
+            files_processed += 1
+            logger.info(f"Added {len(documents)} chunks from {file} in {result.duration:.2f}s")
+        elif documents is not None:
+            logger.warning(f"No documents extracted from {file}")
         else:
-            return JSONProcessor(domain=domain)
-    elif file_extension == '.md':
-        return MarkdownProcessor(domain=domain)
-    elif file_extension in ['.xlsx', '.xls']:
-        return ExcelProcessor(domain=domain)
-    elif file_extension == '.csv':
-        return CSVProcessor(domain=domain)
-    elif file_extension == '.arxml':
-        return ARXMLProcessor(domain=domain)
-    elif file_extension in ['.odx', '.odx-c']:
-        return ODXProcessor(domain=domain)
-    else:
-        return None
+            logger.info(f"No processor available for file: {file}")
+        
+        # Record every file, so files without a processor are not re-examined on sync
+        if source_fingerprints is not None:
+            try:
+                fingerprint = SourceFingerprint.from_file(result.file_path, domain=result.domain)
+                source_fingerprints.append(fingerprint.attach_documents(documents or []))
+            except OSError as e:
+                logger.error(f"Could not fingerprint file {result.file_path}: {str(e)}")
+    
+    return files_processed
 
 def start_streamlit():
     """